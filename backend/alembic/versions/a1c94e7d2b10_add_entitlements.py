@@ -0,0 +1,32 @@
+"""Add entitlements
+
+Revision ID: a1c94e7d2b10
+Revises: 32298309fcd3
+Create Date: 2026-10-18 09:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1c94e7d2b10'
+down_revision: Union[str, None] = '32298309fcd3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('entitlements',
+    sa.Column('user_id', sa.String(), nullable=False),
+    sa.Column('product_id', sa.String(), nullable=False),
+    sa.Column('paid_until', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('user_id', 'product_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('entitlements')
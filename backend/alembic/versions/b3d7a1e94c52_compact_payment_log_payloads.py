@@ -0,0 +1,42 @@
+"""Compact payment log payloads
+
+Revision ID: b3d7a1e94c52
+Revises: e5b81c3f6a27
+Create Date: 2026-10-18 15:02:41.318207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3d7a1e94c52'
+down_revision: Union[str, None] = 'e5b81c3f6a27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Rewrites payment_logs; JSONB drops insignificant whitespace and duplicate keys
+    op.alter_column(
+        'payment_logs', 'event_data',
+        type_=postgresql.JSONB(astext_type=sa.Text()),
+        existing_type=sa.JSON(),
+        existing_nullable=True,
+        postgresql_using='event_data::jsonb'
+    )
+    op.add_column('payment_logs', sa.Column('raw_payload', sa.LargeBinary(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('payment_logs', 'raw_payload')
+    op.alter_column(
+        'payment_logs', 'event_data',
+        type_=sa.JSON(),
+        existing_type=postgresql.JSONB(astext_type=sa.Text()),
+        existing_nullable=True,
+        postgresql_using='event_data::json'
+    )
@@ -0,0 +1,51 @@
+"""Add orders access path indexes
+
+Revision ID: c7e2f5a0d913
+Revises: a1c94e7d2b10
+Create Date: 2026-10-18 11:02:17.540963
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e2f5a0d913'
+down_revision: Union[str, None] = 'a1c94e7d2b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Built concurrently so large orders tables stay writable during the migration
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_orders_user_id_created_at_id', 'orders',
+            ['user_id', 'created_at', 'id'],
+            unique=False, postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_orders_fulfilled_user_product_created_at', 'orders',
+            ['user_id', 'product_id', 'created_at'],
+            unique=False, postgresql_where=sa.text('fulfilled'), postgresql_concurrently=True
+        )
+        # Covered by the leading column of ix_orders_user_id_created_at_id
+        op.drop_index('ix_orders_user_id', table_name='orders', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_orders_user_id', 'orders', ['user_id'],
+            unique=False, postgresql_concurrently=True
+        )
+        op.drop_index(
+            'ix_orders_fulfilled_user_product_created_at', table_name='orders',
+            postgresql_concurrently=True
+        )
+        op.drop_index(
+            'ix_orders_user_id_created_at_id', table_name='orders',
+            postgresql_concurrently=True
+        )
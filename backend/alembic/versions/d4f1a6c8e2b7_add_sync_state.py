@@ -0,0 +1,31 @@
+"""Add sync state
+
+Revision ID: d4f1a6c8e2b7
+Revises: b3d7a1e94c52
+Create Date: 2026-10-18 16:21:07.441930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4f1a6c8e2b7'
+down_revision: Union[str, None] = 'b3d7a1e94c52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('sync_state',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('position', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('sync_state')
@@ -0,0 +1,31 @@
+"""Add payment log processing state
+
+Revision ID: e5b81c3f6a27
+Revises: c7e2f5a0d913
+Create Date: 2026-10-18 13:25:04.871552
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b81c3f6a27'
+down_revision: Union[str, None] = 'c7e2f5a0d913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('payment_logs', sa.Column('attempts', sa.Integer(), server_default=sa.text('0'), nullable=False))
+    op.create_index(
+        'ix_payment_logs_unprocessed', 'payment_logs', ['created_at'],
+        unique=False, postgresql_where=sa.text('NOT processed')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_payment_logs_unprocessed', table_name='payment_logs')
+    op.drop_column('payment_logs', 'attempts')
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Local fake of the Stripe REST endpoints used by StripeService
+
+Every request sleeps for a configurable latency to mimic a Stripe round-trip,
+which makes it possible to benchmark the Stripe client transports offline.
+
+Usage:
+    FAKE_STRIPE_LATENCY_MS=400 uvicorn benchmarks.fake_stripe_server:app --port 12111
+    STRIPE_API_BASE=http://localhost:12111 uvicorn main:app
+
+FAKE_STRIPE_PAYMENT_INTENTS=n serves n succeeded PaymentIntents, one a
+minute up to startup, for users user_0 to user_9 and products 1 and 2.
+"""
+import asyncio
+import os
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+LATENCY_SECONDS = float(os.getenv("FAKE_STRIPE_LATENCY_MS", "400")) / 1000
+PAYMENT_INTENT_COUNT = int(os.getenv("FAKE_STRIPE_PAYMENT_INTENTS", "0"))
+
+app = FastAPI(title="Fake Stripe")
+
+
+async def _simulate_latency() -> None:
+    await asyncio.sleep(LATENCY_SECONDS)
+
+
+def _list(object_type: str, prefix: str, count: int = 2) -> dict:
+    return {
+        "object": "list",
+        "url": f"/v1/{object_type}s",
+        "has_more": False,
+        "data": [{"id": f"{prefix}_{i}", "object": object_type} for i in range(1, count + 1)],
+    }
+
+
+@app.post("/v1/checkout/sessions")
+async def create_checkout_session(request: Request):
+    await _simulate_latency()
+    form = await request.form()
+    session_id = f"cs_test_{uuid.uuid4().hex}"
+    return {
+        "id": session_id,
+        "object": "checkout.session",
+        "url": f"https://checkout.stripe.com/c/pay/{session_id}",
+        "client_reference_id": form.get("client_reference_id"),
+        "mode": form.get("mode"),
+        "payment_status": "unpaid",
+        "created": int(time.time()),
+    }
+
+
+@app.get("/v1/checkout/sessions/{session_id}")
+async def retrieve_checkout_session(session_id: str):
+    await _simulate_latency()
+    return {
+        "id": session_id,
+        "object": "checkout.session",
+        "payment_status": "paid",
+        "amount_total": 1000,
+        "currency": "usd",
+        "line_items": {
+            "object": "list",
+            "has_more": False,
+            "data": [{
+                "id": "li_1",
+                "object": "item",
+                "quantity": 1,
+                "price": {"id": "price_1", "object": "price", "product": "prod_1"},
+            }],
+        },
+    }
+
+
+@app.get("/v1/products")
+async def list_products():
+    await _simulate_latency()
+    return _list("product", "prod")
+
+
+@app.get("/v1/prices")
+async def list_prices():
+    await _simulate_latency()
+    return _list("price", "price")
+
+
+def _retrieve(object_type: str, object_id: str, prefix: str, count: int = 2):
+    if object_id not in {f"{prefix}_{i}" for i in range(1, count + 1)}:
+        return JSONResponse(status_code=404, content={"error": {
+            "type": "invalid_request_error",
+            "code": "resource_missing",
+            "message": f"No such {object_type}: '{object_id}'",
+        }})
+    return {"id": object_id, "object": object_type, "active": True}
+
+
+@app.get("/v1/products/{product_id}")
+async def retrieve_product(product_id: str):
+    await _simulate_latency()
+    return _retrieve("product", product_id, "prod")
+
+
+@app.get("/v1/prices/{price_id}")
+async def retrieve_price(price_id: str):
+    await _simulate_latency()
+    return _retrieve("price", price_id, "price")
+
+
+def _payment_intents(count: int) -> list:
+    """Newest first, as Stripe lists them"""
+    now = int(time.time())
+    return [
+        {
+            "id": f"pi_{i:08d}",
+            "object": "payment_intent",
+            "status": "succeeded",
+            "amount": 1999,
+            "currency": "eur",
+            "created": now - 60 * i,
+            "metadata": {"user_id": f"user_{i % 10}", "product_id": str(i % 2 + 1)},
+        }
+        for i in range(count)
+    ]
+
+
+PAYMENT_INTENTS = _payment_intents(PAYMENT_INTENT_COUNT)
+
+
+@app.get("/v1/payment_intents")
+async def list_payment_intents(request: Request):
+    await _simulate_latency()
+    params = request.query_params
+    limit = int(params.get("limit", "10"))
+    created_gte = int(params.get("created[gte]", "0"))
+    matching = [intent for intent in PAYMENT_INTENTS if intent["created"] >= created_gte]
+    starting_after = params.get("starting_after")
+    if starting_after:
+        position = next(i for i, intent in enumerate(matching) if intent["id"] == starting_after)
+        matching = matching[position + 1:]
+    return {
+        "object": "list",
+        "url": "/v1/payment_intents",
+        "has_more": len(matching) > limit,
+        "data": matching[:limit],
+    }
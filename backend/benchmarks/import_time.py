@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Import-time benchmark for the application module
+
+Imports `main` in fresh interpreters with `python -X importtime`, reports the
+median total and the slowest modules, and checks that importing built no
+shared resources (engines, API clients). Passing --baseline compares the
+median with a previous report and exits non-zero if it is slower by more than
+--tolerance.
+
+Usage:
+    python benchmarks/import_time.py --runs 10 --output import_time.json
+    python benchmarks/import_time.py --baseline import_time.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Printed by the child after importing main: resources built as a side effect
+PROBE = "import json, main; from utils.resources import registry; print(json.dumps(sorted(registry._instances)))"
+
+
+def import_once() -> dict:
+    """Import main in a fresh interpreter and parse its -X importtime output"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = (part.strip() for part in line.replace("import time:", "|").split("|"))
+        modules[name.strip()] = {"self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000}
+
+    return {
+        "total_ms": modules["main"]["cumulative_ms"],
+        "modules": modules,
+        "built_resources": json.loads(result.stdout.strip().splitlines()[-1]),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest modules to print")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--baseline", help="Fail if the median import time regresses against this JSON report")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="Allowed slowdown factor")
+    args = parser.parse_args()
+
+    # First run warms the filesystem and bytecode caches
+    import_once()
+    runs = [import_once() for _ in range(args.runs)]
+
+    totals = [run["total_ms"] for run in runs]
+    median_run = sorted(runs, key=lambda run: run["total_ms"])[len(runs) // 2]
+    slowest = sorted(
+        median_run["modules"].items(), key=lambda item: item[1]["self_ms"], reverse=True
+    )[:args.top]
+
+    report = {
+        "runs": args.runs,
+        "median_ms": statistics.median(totals),
+        "min_ms": min(totals),
+        "max_ms": max(totals),
+        "built_resources": median_run["built_resources"],
+        "slowest_modules": {name: timing for name, timing in slowest},
+    }
+
+    print(f"import main: median {report['median_ms']:.1f} ms "
+          f"(min {report['min_ms']:.1f}, max {report['max_ms']:.1f}) over {args.runs} runs")
+    print("\nSlowest modules by self time:")
+    for name, timing in slowest:
+        print(f"  {timing['self_ms']:8.1f} ms  {name}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+    problems = []
+    if report["built_resources"]:
+        problems.append(f"resources built at import: {', '.join(report['built_resources'])}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        limit = baseline["median_ms"] * args.tolerance
+        if report["median_ms"] > limit:
+            problems.append(
+                f"median {report['median_ms']:.1f} ms exceeds {limit:.1f} ms "
+                f"(baseline {baseline['median_ms']:.1f} ms x {args.tolerance})"
+            )
+
+    if problems:
+        print("\n❌ Import-time regressions detected:")
+        for problem in problems:
+            print(f"   {problem}")
+        sys.exit(1)
+    print("\n✅ No import-time regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Logging pipeline benchmark
+
+Compares the cost of a log call on the calling thread for the previous setup
+(f-string messages formatted and written by a StreamHandler on the caller)
+with the queue pipeline from utils.logger (lazy %-args, records handed to a
+background writer). The sink can be slowed down to mimic a blocked stderr
+pipe under a log collector.
+
+Usage:
+    python benchmarks/logging_pipeline.py --calls 20000 --threads 8
+    python benchmarks/logging_pipeline.py --sink-latency-us 200
+"""
+import argparse
+import io
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.logger as pipeline  # noqa: E402
+from utils.logger import configure_logging, stop_logging  # noqa: E402
+
+
+class SlowSink(io.TextIOBase):
+    """Discards output, sleeping on every write to mimic a slow consumer"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def write(self, text: str) -> int:
+        if self.latency:
+            time.sleep(self.latency)
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+
+def run_threads(log_call, calls: int, threads: int) -> dict:
+    """Run log_call `calls` times on each thread and time every call"""
+    latencies = [[] for _ in range(threads)]
+
+    def worker(index: int) -> None:
+        timings = latencies[index]
+        for i in range(calls):
+            start = time.perf_counter()
+            log_call(i)
+            timings.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    merged = sorted(t for timings in latencies for t in timings)
+    return {
+        "calls_per_s": len(merged) / elapsed,
+        "p50_us": statistics.median(merged) * 1e6,
+        "p99_us": merged[int(len(merged) * 0.99) - 1] * 1e6,
+    }
+
+
+def bench_direct(sink: SlowSink, calls: int, threads: int) -> dict:
+    """Previous setup: basicConfig-style handler writing on the calling thread"""
+    root = logging.getLogger()
+    root.handlers.clear()
+    handler = logging.StreamHandler(sink)
+    handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(name)s - %(message)s"))
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    logger = logging.getLogger("bench.direct")
+
+    def log_call(i: int) -> None:
+        logger.info(f"Order {i} fulfilled for user kp_{i:08d}")
+
+    try:
+        return run_threads(log_call, calls, threads)
+    finally:
+        root.removeHandler(handler)
+
+
+def bench_queue(sink: SlowSink, calls: int, threads: int, log_format: str) -> dict:
+    """Queue pipeline: lazy args, formatting and writes on the listener thread"""
+    configure_logging(level="INFO", log_format=log_format, sample_rates={})
+    # Point the listener's stream handler at the benchmark sink
+    for listener_handler in pipeline._listener.handlers:
+        listener_handler.setStream(sink)
+    logger = logging.getLogger("bench.queue")
+
+    def log_call(i: int) -> None:
+        logger.info("Order %s fulfilled for user %s", i, f"kp_{i:08d}")
+
+    try:
+        result = run_threads(log_call, calls, threads)
+        drain_start = time.perf_counter()
+        stop_logging()
+        result["drain_s"] = time.perf_counter() - drain_start
+        return result
+    finally:
+        logging.getLogger().handlers.clear()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20000, help="Log calls per thread")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--sink-latency-us", type=float, default=0.0, help="Sleep per write to the sink")
+    parser.add_argument("--format", choices=("json", "text"), default="json", help="Queue pipeline output format")
+    args = parser.parse_args()
+
+    sink = SlowSink(args.sink_latency_us / 1e6)
+    results = {
+        "direct (f-string, caller writes)": bench_direct(sink, args.calls, args.threads),
+        f"queue ({args.format}, listener writes)": bench_queue(sink, args.calls, args.threads, args.format),
+    }
+
+    print(f"{args.threads} threads x {args.calls} calls, sink latency {args.sink_latency_us} us\n")
+    print(f"{'setup':40} {'calls/s':>12} {'p50 us':>10} {'p99 us':>10} {'drain s':>9}")
+    for name, result in results.items():
+        drain = f"{result['drain_s']:9.2f}" if "drain_s" in result else f"{'-':>9}"
+        print(f"{name:40} {result['calls_per_s']:12.0f} {result['p50_us']:10.1f} {result['p99_us']:10.1f} {drain}")
+
+
+if __name__ == "__main__":
+    main()
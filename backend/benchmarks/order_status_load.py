@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for the order-status endpoint
+
+Fires concurrent GET /api/v1/payments/order-status/{product_id} requests at a
+running backend and reports latency percentiles. Run it once against the
+current build and once against a reference build to compare p99 latency.
+
+Usage:
+    BENCH_TOKEN=<kinde access token> python benchmarks/order_status_load.py \\
+        --base-url http://localhost:8000 --requests 2000 --concurrency 200
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Return the pct-th percentile of the sorted samples"""
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+    return samples[index]
+
+
+async def run(base_url: str, token: str, product_id: str, total: int, concurrency: int) -> None:
+    """Run the benchmark and print a latency summary"""
+    url = f"{base_url}/api/v1/payments/order-status/{product_id}"
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies: list[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(headers=headers, limits=limits, timeout=30.0) as client:
+
+        async def one_request() -> None:
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(url)
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one_request() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"requests:    {total} (concurrency {concurrency}, errors {errors})")
+    print(f"throughput:  {total / elapsed:.1f} req/s")
+    print(f"mean:        {statistics.fmean(latencies):.2f} ms")
+    for pct in (50, 90, 95, 99):
+        print(f"p{pct}:         {percentile(latencies, pct):.2f} ms")
+    print(f"max:         {latencies[-1]:.2f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=os.getenv("BENCH_BASE_URL", "http://localhost:8000"))
+    parser.add_argument("--token", default=os.getenv("BENCH_TOKEN"))
+    parser.add_argument("--product-id", default="1")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    args = parser.parse_args()
+
+    if not args.token:
+        parser.error("a bearer token is required (--token or BENCH_TOKEN)")
+
+    asyncio.run(run(args.base_url, args.token, args.product_id, args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Shared helpers for the PostgreSQL benchmarks
+
+Everything runs inside a dedicated "bench" schema so the benchmarks never touch
+application tables. Point BENCH_DATABASE_URL at a scratch database anyway.
+"""
+import os
+import statistics
+import sys
+import time
+from typing import Any, Dict, Iterable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection, Engine
+
+from database import Base
+import models  # noqa: F401  (registers every table on Base.metadata)
+
+BENCH_SCHEMA = "bench"
+
+
+def bench_engine(url: str) -> Engine:
+    """Create an engine whose connections use the benchmark schema"""
+    admin = create_engine(url)
+    with admin.begin() as conn:
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {BENCH_SCHEMA}"))
+    admin.dispose()
+    return create_engine(url, connect_args={"options": f"-csearch_path={BENCH_SCHEMA}"})
+
+
+def reset_tables(engine: Engine) -> None:
+    """Drop and recreate every model table in the benchmark schema"""
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+
+def seed_orders(engine: Engine, total: int, users: int, batch_size: int = 1_000_000) -> None:
+    """
+    Insert synthetic orders with generate_series
+
+    Orders are spread over `users` users, two products and the last 90 days;
+    one in ten orders is left unfulfilled.
+    """
+    for start in range(1, total + 1, batch_size):
+        end = min(start + batch_size - 1, total)
+        with engine.begin() as conn:
+            conn.execute(text("""
+                INSERT INTO orders (id, session_id, user_id, product_id, fulfilled,
+                                    payment_status, created_at, updated_at)
+                SELECT gen_random_uuid(),
+                       'cs_bench_' || g,
+                       'user_' || (g % :users),
+                       ((g % 2) + 1)::text,
+                       g % 10 <> 0,
+                       'paid',
+                       now() - ((g * 7919) % (90 * 24)) * interval '1 hour',
+                       now()
+                FROM generate_series(CAST(:start AS bigint), CAST(:end AS bigint)) AS g
+            """), {"users": users, "start": start, "end": end})
+        print(f"  seeded {end:,} / {total:,} orders")
+
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE orders"))
+
+
+def time_query(conn: Connection, sql: str, params: Iterable[Dict[str, Any]]) -> List[float]:
+    """Run sql once per parameter set and return latencies in milliseconds"""
+    statement = text(sql)
+    latencies = []
+    for values in params:
+        start = time.perf_counter()
+        conn.execute(statement, values).all()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def explain(conn: Connection, sql: str, params: Dict[str, Any]) -> str:
+    """Return the EXPLAIN ANALYZE plan for sql"""
+    rows = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}"), params).all()
+    return "\n".join(row[0] for row in rows)
+
+
+def summarize(name: str, latencies: List[float]) -> Dict[str, float]:
+    """Print and return latency percentiles"""
+    ordered = sorted(latencies)
+    summary = {
+        "mean": statistics.fmean(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p99": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+    }
+    print(f"{name:<28} mean {summary['mean']:8.3f} ms   p50 {summary['p50']:8.3f} ms   p99 {summary['p99']:8.3f} ms")
+    return summary
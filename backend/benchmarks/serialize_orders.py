@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Order serialization microbenchmark
+
+Serializes N in-memory orders the way GET /api/v1/payments/orders used to
+(Order.to_dict, response_model validation against list[Dict[str, Any]],
+jsonable_encoder, stdlib json) and the way it does now (RowSerializer dicts
+rendered by FastJSONResponse). Both bodies are decoded and compared before
+timing. No database is needed.
+
+Usage:
+    python benchmarks/serialize_orders.py --orders 10000 --repeat 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_model_field  # noqa: E402
+
+from models.orders import Order, order_serializer  # noqa: E402
+from utils import serialization  # noqa: E402
+from utils.serialization import FastJSONResponse  # noqa: E402
+
+
+def make_orders(count: int) -> list:
+    """Build fully loaded transient orders, as a query would return them"""
+    now = datetime.now(timezone.utc)
+    return [
+        Order(
+            id=uuid.uuid4(),
+            session_id=f"cs_test_{i:08d}",
+            user_id="kp_bench_user",
+            items={"price": "price_1", "quantity": 1},
+            customer_id=f"cus_{i:08d}",
+            product_id=str(i % 2 + 1),
+            stripe_product_id=f"prod_{i % 2 + 1}",
+            fulfilled=True,
+            payment_status="paid",
+            amount_total="1999",
+            currency="eur",
+            created_at=now - timedelta(minutes=i),
+            updated_at=now - timedelta(minutes=i),
+        )
+        for i in range(count)
+    ]
+
+
+RESPONSE_FIELD = create_model_field(name="Response_get_user_orders", type_=list[Dict[str, Any]], mode="serialization")
+
+
+def previous_path(orders: list) -> bytes:
+    content = [order.to_dict() for order in orders]
+    validated = asyncio.run(serialize_response(field=RESPONSE_FIELD, response_content=content))
+    return JSONResponse(validated).body
+
+
+def fast_path(orders: list) -> bytes:
+    return FastJSONResponse(order_serializer.many(orders)).body
+
+
+def measure(func, orders: list, repeat: int) -> Dict[str, float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(orders)
+        timings.append(time.perf_counter() - start)
+    return {"median_ms": statistics.median(timings) * 1000, "min_ms": min(timings) * 1000}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    orders = make_orders(args.orders)
+    if json.loads(previous_path(orders)) != json.loads(fast_path(orders)):
+        sys.exit("❌ The fast path produced a different document")
+
+    results = {"previous (to_dict + validation + json)": measure(previous_path, orders, args.repeat)}
+    results[f"fast ({'orjson' if serialization.orjson else 'stdlib json'})"] = measure(fast_path, orders, args.repeat)
+
+    print(f"{args.orders} orders, {args.repeat} runs\n")
+    print(f"{'path':42} {'median ms':>10} {'min ms':>10}")
+    for name, result in results.items():
+        print(f"{name:42} {result['median_ms']:10.2f} {result['min_ms']:10.2f}")
+
+    previous, fast = (result["median_ms"] for result in results.values())
+    print(f"\nSpeedup: {previous / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark for Stripe checkout session creation
+
+Starts the fake Stripe server in a background thread and creates N checkout
+sessions concurrently through each client transport. The "blocking" row calls
+the synchronous SDK directly from the event loop, which is what the service did
+before the transports existed, so requests are serialised.
+
+Usage:
+    python benchmarks/stripe_checkout_concurrency.py --requests 50 --latency-ms 400
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import stripe
+import uvicorn
+
+PORT = 12111
+API_BASE = f"http://127.0.0.1:{PORT}"
+CHECKOUT_PARAMS = {
+    "line_items": [{"price": "price_1", "quantity": 1}],
+    "mode": "subscription",
+    "client_reference_id": "bench-user",
+    "success_url": "http://localhost/success",
+    "cancel_url": "http://localhost/cancel",
+}
+
+
+def start_fake_stripe() -> None:
+    """Run the fake Stripe server on a daemon thread and wait until it is up"""
+    from benchmarks.fake_stripe_server import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+
+async def bench_blocking(total: int) -> float:
+    """Synchronous SDK calls made directly inside coroutines"""
+    stripe.api_key = "sk_test_fake"
+    stripe.api_base = API_BASE
+
+    async def one() -> None:
+        stripe.checkout.Session.create(**CHECKOUT_PARAMS)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return time.perf_counter() - start
+
+
+async def bench_transport(transport_name: str, total: int) -> float:
+    """Concurrent calls through a StripeClient transport"""
+    from services.stripe_client import HttpxStripeTransport, SdkStripeTransport, StripeClient
+
+    if transport_name == "sdk":
+        transport = SdkStripeTransport("sk_test_fake", api_base=API_BASE)
+    else:
+        transport = HttpxStripeTransport("sk_test_fake", api_base=API_BASE, max_connections=total)
+    client = StripeClient(transport)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client.create_checkout_session(**CHECKOUT_PARAMS) for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    await client.aclose()
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency-ms", type=int, default=400)
+    args = parser.parse_args()
+
+    os.environ["FAKE_STRIPE_LATENCY_MS"] = str(args.latency_ms)
+    start_fake_stripe()
+
+    print(f"{args.requests} concurrent checkout sessions, {args.latency_ms} ms simulated Stripe latency")
+    for name, runner in (
+        ("blocking", lambda: bench_blocking(args.requests)),
+        ("sdk", lambda: bench_transport("sdk", args.requests)),
+        ("httpx", lambda: bench_transport("httpx", args.requests)),
+    ):
+        elapsed = asyncio.run(runner())
+        print(f"{name:<10} {elapsed:8.2f} s   {args.requests / elapsed:8.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,13 @@
 """
 Configuration settings for the FastAPI backend
 """
+import logging
 import os
+from functools import lru_cache
+from typing import Any
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
 
 class Settings:
     """Application settings"""
@@ -14,6 +18,13 @@ class Settings:
         
         # Database
         self.database_url = os.getenv("DATABASE_URL", "postgresql://dev:devPassword@db:5432/postgres")
+        self.db_pool_size = int(os.getenv("DB_POOL_SIZE", "5"))  # Per engine and per worker process
+        self.db_max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+        self.db_pool_timeout = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # Seconds to wait for a free connection
+        self.db_pool_recycle = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # Seconds, -1 disables
+        self.db_pool_pre_ping = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+        self.db_statement_cache_size = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))  # Prepared statements per asyncpg connection
+        self.db_pgbouncer = os.getenv("DB_PGBOUNCER", "false").lower() == "true"  # Disable prepared statement caching
         
         # CORS
         self.allowed_origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000,http://localhost:5173")
@@ -30,6 +41,36 @@ class Settings:
         self.stripe_product_2 = os.getenv("STRIPE_PRODUCT_2")
         self.stripe_price_1 = os.getenv("STRIPE_PRICE_1")
         self.stripe_price_2 = os.getenv("STRIPE_PRICE_2")
+        self.catalog_refresh_interval = float(os.getenv("CATALOG_REFRESH_INTERVAL", "30"))  # Seconds between products table checks
+        self.entitlement_period_days = int(os.getenv("ENTITLEMENT_PERIOD_DAYS", "30"))  # Access granted per fulfilled order
+        self.entitlement_cache_backend = os.getenv("ENTITLEMENT_CACHE_BACKEND", "memory")  # memory or redis
+        self.entitlement_cache_size = int(os.getenv("ENTITLEMENT_CACHE_SIZE", "100000"))
+        self.entitlement_cache_ttl = float(os.getenv("ENTITLEMENT_CACHE_TTL", "300"))
+        self.entitlement_cache_negative_ttl = float(os.getenv("ENTITLEMENT_CACHE_NEGATIVE_TTL", "10"))
+        self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        self.stripe_api_base = os.getenv("STRIPE_API_BASE", "https://api.stripe.com")
+        self.stripe_transport = os.getenv("STRIPE_TRANSPORT", "httpx")  # httpx or sdk
+        self.stripe_http2 = os.getenv("STRIPE_HTTP2", "true").lower() == "true"
+        self.stripe_max_connections = int(os.getenv("STRIPE_MAX_CONNECTIONS", "100"))
+        self.stripe_timeout = float(os.getenv("STRIPE_TIMEOUT", "30"))
+        
+        # Webhook processing
+        self.webhook_workers = int(os.getenv("WEBHOOK_WORKERS", "4"))
+        self.webhook_queue_size = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))  # Per worker
+        self.webhook_sweep_interval = float(os.getenv("WEBHOOK_SWEEP_INTERVAL", "30"))
+        self.webhook_max_attempts = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "5"))
+        self.webhook_retry_delay = float(os.getenv("WEBHOOK_RETRY_DELAY", "1"))  # Seconds before the first retry of a failed event
+        self.webhook_dedup_cache_size = int(os.getenv("WEBHOOK_DEDUP_CACHE_SIZE", "50000"))
+        self.webhook_dedup_ttl = float(os.getenv("WEBHOOK_DEDUP_TTL", "86400"))  # Stripe retries for up to 3 days
+        self.webhook_payload_storage = os.getenv("WEBHOOK_PAYLOAD_STORAGE", "full")  # "full", "compact" or "compressed"
+        self.payment_log_batch_size = int(os.getenv("PAYMENT_LOG_BATCH_SIZE", "100"))
+        self.payment_log_flush_interval_ms = float(os.getenv("PAYMENT_LOG_FLUSH_INTERVAL_MS", "10"))
+        self.payment_log_queue_size = int(os.getenv("PAYMENT_LOG_QUEUE_SIZE", "1000"))
+        self.stripe_validation_cache_ttl = float(os.getenv("STRIPE_VALIDATION_CACHE_TTL", "300"))  # Seconds /validate results are reused
+        self.stripe_validation_concurrency = int(os.getenv("STRIPE_VALIDATION_CONCURRENCY", "8"))  # Parallel retrieves while validating
+        self.payment_reconcile_interval = float(os.getenv("PAYMENT_RECONCILE_INTERVAL", "300"))  # Seconds between PaymentIntent reconciliations
+        self.payment_reconcile_batch_size = int(os.getenv("PAYMENT_RECONCILE_BATCH_SIZE", "100"))  # PaymentIntents per page and transaction
+        self.payment_reconcile_max_pending_age = float(os.getenv("PAYMENT_RECONCILE_MAX_PENDING_AGE", "604800"))  # Seconds an unfinished PaymentIntent holds back the high-water mark
         
         # Kinde Configuration
         self.kinde_domain = os.getenv("KINDE_DOMAIN")
@@ -43,11 +84,22 @@ class Settings:
         # JWT Configuration
         self.jwt_algorithm = os.getenv("JWT_ALGORITHM", "RS256")
         self.jwt_audience = os.getenv("JWT_AUDIENCE")
+        self.auth_token_cache_size = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+        self.auth_token_cache_ttl = float(os.getenv("AUTH_TOKEN_CACHE_TTL", "3600"))  # Upper bound, tokens also expire at exp
+        self.jwks_default_max_age = float(os.getenv("JWKS_DEFAULT_MAX_AGE", "3600"))  # Used when Cache-Control has no max-age
+        self.jwks_min_refetch_interval = float(os.getenv("JWKS_MIN_REFETCH_INTERVAL", "30"))
+        
+        # Health checks
+        self.health_check_interval = float(os.getenv("HEALTH_CHECK_INTERVAL", "5"))  # Seconds between background checks
+        self.health_check_timeout = float(os.getenv("HEALTH_CHECK_TIMEOUT", "2"))
+        self.health_jwks_max_staleness = float(os.getenv("HEALTH_JWKS_MAX_STALENESS", "300"))  # Seconds past JWKS expiry
         
         # Development Settings
         self.environment = os.getenv("ENVIRONMENT", "development")
         self.debug = os.getenv("DEBUG", "true").lower() == "true"
         self.log_level = os.getenv("LOG_LEVEL", "INFO")
+        self.log_format = os.getenv("LOG_FORMAT", "json")  # "json" or "text"
+        self.log_sample_rates = os.getenv("LOG_SAMPLE_RATES", "")  # e.g. "utils.auth=0.01,routers.payments=0.1"
 
 
 # Global settings instance
@@ -71,8 +123,10 @@ def validate_stripe_config():
             missing_vars.append(var)
     
     if missing_vars:
-        print(f"⚠️  Warning: Missing Stripe configuration: {', '.join(missing_vars)}")
-        print("   Stripe functionality will be disabled until configured.")
+        logger.warning(
+            "Missing Stripe configuration: %s. Stripe functionality will be disabled until configured.",
+            ", ".join(missing_vars)
+        )
         return False
     
     return True
@@ -93,12 +147,30 @@ def validate_kinde_config():
             missing_vars.append(var)
     
     if missing_vars:
-        print(f"⚠️  Warning: Missing Kinde configuration: {', '.join(missing_vars)}")
-        print("   Kinde authentication will be disabled until configured.")
+        logger.warning(
+            "Missing Kinde configuration: %s. Kinde authentication will be disabled until configured.",
+            ", ".join(missing_vars)
+        )
         return False
     
     return True
 
-# Validate configurations on import
-stripe_configured = validate_stripe_config()
-kinde_configured = validate_kinde_config()
+@lru_cache(maxsize=None)
+def is_stripe_configured() -> bool:
+    """Whether Stripe is configured; validated once, on first use"""
+    return validate_stripe_config()
+
+
+@lru_cache(maxsize=None)
+def is_kinde_configured() -> bool:
+    """Whether Kinde is configured; validated once, on first use"""
+    return validate_kinde_config()
+
+
+def __getattr__(name: str) -> Any:
+    # Keeps `from config import stripe_configured, kinde_configured` working
+    if name == "stripe_configured":
+        return is_stripe_configured()
+    if name == "kinde_configured":
+        return is_kinde_configured()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
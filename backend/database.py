@@ -1,36 +1,138 @@
-import os
+import uuid
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from dotenv import load_dotenv
-from typing import AsyncGenerator
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
+from typing import Any, AsyncGenerator, Dict
 
-load_dotenv()
+from config import settings
+from utils.metrics import instrument_queries
+from utils.pool_usage import TimedAsyncAdaptedQueuePool, TimedQueuePool, get_pool_stats, instrument_pool
+from utils.resources import registry
 
 # Database URL - support both sync and async
-DATABASE_URL = os.getenv("DATABASE_URL")
+DATABASE_URL = settings.database_url
 if DATABASE_URL and DATABASE_URL.startswith("postgresql://"):
     ASYNC_DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
 else:
     ASYNC_DATABASE_URL = DATABASE_URL
 
-# Sync engine (for migrations)
-engine = create_engine(DATABASE_URL, echo=False)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Pool sizing applies per engine and per worker process
+POOL_OPTIONS: Dict[str, Any] = {
+    "pool_size": settings.db_pool_size,
+    "max_overflow": settings.db_max_overflow,
+    "pool_timeout": settings.db_pool_timeout,
+    "pool_recycle": settings.db_pool_recycle,
+    "pool_pre_ping": settings.db_pool_pre_ping,
+}
 
-# Async engine (for main application)
-async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=False)
-AsyncSessionLocal = async_sessionmaker(
-    async_engine, 
-    class_=AsyncSession, 
-    expire_on_commit=False
+
+def asyncpg_connect_args() -> Dict[str, Any]:
+    """Statement cache options for asyncpg connections"""
+    if settings.db_pgbouncer:
+        # PgBouncer in transaction mode may run each statement on a different
+        # server connection, so nothing can rely on statements prepared earlier
+        return {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        }
+    return {
+        "statement_cache_size": settings.db_statement_cache_size,
+        "prepared_statement_cache_size": settings.db_statement_cache_size,
+    }
+
+
+def _build_engine() -> Engine:
+    engine = create_engine(DATABASE_URL, echo=False, poolclass=TimedQueuePool, **POOL_OPTIONS)
+    # Count connections held per request and per webhook event
+    instrument_pool(engine)
+    instrument_queries(engine)
+    return engine
+
+
+def _build_async_engine() -> AsyncEngine:
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        echo=False,
+        poolclass=TimedAsyncAdaptedQueuePool,
+        connect_args=asyncpg_connect_args() if ASYNC_DATABASE_URL.startswith("postgresql+asyncpg://") else {},
+        **POOL_OPTIONS
+    )
+    instrument_pool(async_engine.sync_engine)
+    instrument_queries(async_engine.sync_engine)
+    return async_engine
+
+
+# Engines and sessionmakers are built on first use, not at import
+registry.register("engine", _build_engine, close=lambda engine: engine.dispose())
+registry.register("async_engine", _build_async_engine, close=lambda engine: engine.dispose())
+registry.register(
+    "session_factory",
+    lambda: sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
 )
+registry.register(
+    "async_session_factory",
+    lambda: async_sessionmaker(get_async_engine(), class_=AsyncSession, expire_on_commit=False)
+)
+
+
+def get_engine() -> Engine:
+    """Sync engine (for migrations and scripts)"""
+    return registry.get("engine")
+
+
+def get_async_engine() -> AsyncEngine:
+    """Async engine (for main application)"""
+    return registry.get("async_engine")
+
+
+def get_sessionmaker() -> sessionmaker:
+    """Factory for sync sessions"""
+    return registry.get("session_factory")
+
+
+def get_async_sessionmaker() -> async_sessionmaker:
+    """Factory for async sessions"""
+    return registry.get("async_session_factory")
+
+
+def async_session() -> AsyncSession:
+    """Open a new async session, for work outside a request, e.g. `async with async_session() as db:`"""
+    return get_async_sessionmaker()()
+
+
+_LAZY_ATTRIBUTES = {
+    "engine": get_engine,
+    "async_engine": get_async_engine,
+    "SessionLocal": get_sessionmaker,
+    "AsyncSessionLocal": get_async_sessionmaker,
+}
+
+
+def __getattr__(name: str) -> Any:
+    # Keeps `from database import engine, SessionLocal, ...` working
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 Base = declarative_base()
 
+
+def get_db_pool_stats() -> Dict[str, Any]:
+    """Return live pool statistics for the engines built so far"""
+    stats = {}
+    if registry.is_built("engine"):
+        stats["sync"] = get_pool_stats(get_engine())
+    if registry.is_built("async_engine"):
+        stats["async"] = get_pool_stats(get_async_engine().sync_engine)
+    return stats
+
+
 def get_db():
     """Sync database dependency for legacy compatibility"""
-    db = SessionLocal()
+    db = get_sessionmaker()()
     try:
         yield db
     finally:
@@ -38,7 +140,7 @@ def get_db():
 
 async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
     """Async database dependency - recommended for new code"""
-    async with AsyncSessionLocal() as session:
+    async with async_session() as session:
         try:
             yield session
         finally:
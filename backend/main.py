@@ -1,36 +1,90 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from contextlib import asynccontextmanager
-from database import engine, get_db
+from database import get_async_engine, get_db_pool_stats
 from models import users as user_models
 from routers.users import router as user_router
 from routers import payments
 from models import orders
-from config import settings
+from config import settings, is_stripe_configured, is_kinde_configured
+from services.catalog import get_product_catalog
+from services.catalog_validation import get_catalog_validator
+from services.health import get_health_monitor
+from services.payment_reconciliation import get_payment_reconciler
+from services.stripe_client import get_stripe_client
+from services.payment_log_writer import get_payment_log_writer
+from services.webhook_queue import get_webhook_queue
+from utils.auth import get_auth_cache_stats, get_jwks_manager
+from utils.http_cache import CachedJSON
+from utils.metrics import CONTENT_TYPE, MetricsMiddleware, StatsGauge, render_metrics
+from utils.pagination import NEXT_CURSOR_HEADER
+from utils.pool_usage import PoolUsageMiddleware, get_pool_usage_stats
+from utils.logger import configure_logging, stop_logging
+from utils.resources import registry
+from utils.serialization import FastJSONResponse
 import os
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan events"""
     # Startup
-    print("🚀 Starting up the application...")
+    configure_logging()
     logger.info("Application starting up...")
     
     # Log configuration status
-    from config import stripe_configured, kinde_configured
-    logger.info(f"Stripe configured: {stripe_configured}")
-    logger.info(f"Kinde configured: {kinde_configured}")
+    stripe_configured = is_stripe_configured()
+    kinde_configured = is_kinde_configured()
+    logger.info("Stripe configured: %s", stripe_configured)
+    logger.info("Kinde configured: %s", kinde_configured)
+    
+    # Build shared resources now rather than on the first request
+    get_async_engine()
+    
+    # Load products from the database, falling back to the settings products
+    catalog = get_product_catalog()
+    try:
+        await catalog.reload()
+    except Exception as e:
+        logger.warning("Product catalog could not be loaded, serving settings products: %s", e)
+    catalog.start()
+    
+    # Keep the Kinde key set fresh in the background
+    if kinde_configured:
+        get_jwks_manager().start()
+    
+    # Store and apply webhook events in the background
+    if stripe_configured:
+        get_stripe_client()
+        get_payment_log_writer().start()
+        get_webhook_queue().start()
+        # Validate the catalog against Stripe before /validate is first called
+        get_catalog_validator().start()
+        # Grant entitlements for payments whose webhooks never arrived
+        get_payment_reconciler().start()
+    
+    # Check dependencies once before serving, then in the background
+    health_monitor = get_health_monitor()
+    await health_monitor.refresh()
+    health_monitor.start()
     
     yield
     # Shutdown
-    print("🛑 Shutting down the application...")
     logger.info("Application shutting down...")
+    await registry.close("health_monitor")
+    await registry.close("catalog_validator")
+    await registry.close("payment_reconciler")
+    if stripe_configured:
+        # Flush buffered payment logs first; their events go to the webhook queue
+        await get_payment_log_writer().stop()
+        await get_webhook_queue().stop()
+    # Engines, the Stripe client and the JWKS manager
+    await registry.aclose()
+    stop_logging()
 
 app = FastAPI(
     title="Modular Template API",
@@ -39,6 +93,7 @@ app = FastAPI(
     docs_url="/docs",
     redoc_url="/redoc",
     redirect_slashes=False,
+    default_response_class=FastJSONResponse,
     lifespan=lifespan
 )
 
@@ -55,27 +110,72 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
 )
 
+# Connections held per request, reported by /metrics
+app.add_middleware(PoolUsageMiddleware)
+
+# Per-route latency and status counts, reported by /metrics
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(user_router, prefix="/api/v1/users", tags=["users"])
 app.include_router(payments.router)
 
-# Health check endpoint
+# Health check endpoint; always 200 while serving, for existing probes.
+# Dependency checks are reported by /health/ready, statistics by /metrics
+_HEALTH_BODY = CachedJSON({"status": "healthy", "version": "2.0.0"})
+
 @app.get("/health")
-async def health_check():
+async def health_check(request: Request):
     """Health check endpoint"""
-    return {"status": "healthy", "version": "2.0.0"}
+    return _HEALTH_BODY.response(request)
+
+# Liveness probe: the process is serving requests
+_LIVENESS_BODY = CachedJSON({"status": "alive"})
+
+@app.get("/health/live")
+async def liveness(request: Request):
+    """Liveness probe; checks no dependencies"""
+    return _LIVENESS_BODY.response(request)
+
+# Readiness probe: dependencies as of the last background check
+@app.get("/health/ready")
+async def readiness():
+    """Readiness probe; 503 while any dependency check is failing"""
+    ready, checks = get_health_monitor().readiness()
+    return FastJSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not_ready", "checks": checks},
+    )
+
+# Cache, pool and background job counters, read on every scrape
+StatsGauge("app_stats", "Internal cache, connection pool and background job statistics", lambda: {
+    "auth_cache": get_auth_cache_stats(),
+    "catalog": get_product_catalog().stats(),
+    "payment_reconciliation": get_payment_reconciler().stats(),
+    "db_pool": get_db_pool_stats(),
+    "db_connections": get_pool_usage_stats(),
+})
+
+# Prometheus metrics endpoint
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Metrics in the Prometheus text format"""
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE)
+
+# Root endpoint, rendered once
+_ROOT_BODY = CachedJSON({
+    "message": "Welcome to Modular Template API",
+    "version": "2.0.0",
+    "docs": "/docs",
+    "health": "/health"
+})
 
-# Root endpoint
 @app.get("/")
-async def root():
+async def root(request: Request):
     """Root endpoint with API information"""
-    return {
-        "message": "Welcome to Modular Template API",
-        "version": "2.0.0",
-        "docs": "/docs",
-        "health": "/health"
-    }
-
-# user_models.Base.metadata.create_all(bind=engine) enable this if you don't want to use migrations
+    return _ROOT_BODY.response(request)
+
+# user_models.Base.metadata.create_all(bind=get_engine()) enable this if you don't want to use migrations
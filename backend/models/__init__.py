@@ -1,4 +1,4 @@
 from .users import User
-from .orders import Order, PaymentLog, Product
+from .orders import Order, PaymentLog, Product, Entitlement
 
-__all__ = ["User", "Order", "PaymentLog", "Product"]
\ No newline at end of file
+__all__ = ["User", "Order", "PaymentLog", "Product", "Entitlement"]
\ No newline at end of file
@@ -1,10 +1,11 @@
 """
 Database models for orders and payments
 """
-from sqlalchemy import Column, String, Boolean, DateTime, JSON, Text
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import BigInteger, Column, String, Boolean, DateTime, Integer, JSON, LargeBinary, Text, Index, text
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.sql import func
 from database import Base
+from utils.serialization import RowSerializer
 import uuid
 from datetime import datetime
 from typing import Optional, Dict, Any
@@ -14,10 +15,20 @@ class Order(Base):
     """Order model for tracking Stripe payments"""
     
     __tablename__ = "orders"
+    __table_args__ = (
+        # Order history per user, newest first, with id as keyset tiebreaker
+        Index("ix_orders_user_id_created_at_id", "user_id", "created_at", "id"),
+        # Paid-order lookups per user and product over a time window
+        Index(
+            "ix_orders_fulfilled_user_product_created_at",
+            "user_id", "product_id", "created_at",
+            postgresql_where=text("fulfilled")
+        ),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     session_id = Column(String, unique=True, index=True, nullable=False)
-    user_id = Column(String, index=True, nullable=False)
+    user_id = Column(String, nullable=False)
     items = Column(JSON, nullable=True)  # Store line items from Stripe
     customer_id = Column(String, nullable=True)  # Stripe customer ID
     product_id = Column(String, nullable=False)  # Our product ID (1 or 2)
@@ -55,14 +66,20 @@ class PaymentLog(Base):
     """Log model for tracking payment events and webhooks"""
     
     __tablename__ = "payment_logs"
+    __table_args__ = (
+        # Webhook events still waiting for a worker, oldest first
+        Index("ix_payment_logs_unprocessed", "created_at", postgresql_where=text("NOT processed")),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     event_type = Column(String, nullable=False, index=True)  # Stripe event type
     event_id = Column(String, unique=True, nullable=False, index=True)  # Stripe event ID
     session_id = Column(String, nullable=True, index=True)  # Related session ID
     user_id = Column(String, nullable=True, index=True)  # Related user ID
-    event_data = Column(JSON, nullable=True)  # Full event data
+    event_data = Column(JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), "postgresql"), nullable=True)  # Full or compact event data, see WEBHOOK_PAYLOAD_STORAGE
+    raw_payload = Column(LargeBinary, nullable=True)  # Compressed webhook body in "compressed" storage mode
     processed = Column(Boolean, default=False, nullable=False)
+    attempts = Column(Integer, default=0, server_default=text("0"), nullable=False)  # Processing attempts so far
     error_message = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     
@@ -79,6 +96,7 @@ class PaymentLog(Base):
             "user_id": self.user_id,
             "event_data": self.event_data,
             "processed": self.processed,
+            "attempts": self.attempts,
             "error_message": self.error_message,
             "created_at": self.created_at.isoformat() if self.created_at else None
         }
@@ -117,3 +135,45 @@ class Product(Base):
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None
         }
+
+
+class Entitlement(Base):
+    """Paid access of a user to a product, maintained from fulfilled orders"""
+    
+    __tablename__ = "entitlements"
+    
+    user_id = Column(String, primary_key=True)
+    product_id = Column(String, primary_key=True)  # Our product ID (1, 2, etc.)
+    paid_until = Column(DateTime(timezone=True), nullable=False)  # Access expires after this instant
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+    
+    def __repr__(self):
+        return f"<Entitlement(user_id={self.user_id}, product_id={self.product_id}, paid_until={self.paid_until})>"
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert entitlement to dictionary"""
+        return {
+            "user_id": self.user_id,
+            "product_id": self.product_id,
+            "paid_until": self.paid_until.isoformat() if self.paid_until else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class SyncState(Base):
+    """High-water mark of a job that pages through a Stripe list incrementally"""
+    
+    __tablename__ = "sync_state"
+    
+    name = Column(String, primary_key=True)  # Job name, e.g. "payment_intents"
+    position = Column(BigInteger, nullable=False)  # Unix time of the newest object seen
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+    
+    def __repr__(self):
+        return f"<SyncState(name={self.name}, position={self.position})>"
+
+
+# Column values with native UUIDs and datetimes, for FastJSONResponse
+order_serializer = RowSerializer(Order)
+payment_log_serializer = RowSerializer(PaymentLog, exclude=("raw_payload",))
+product_serializer = RowSerializer(Product)
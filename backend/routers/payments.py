@@ -1,29 +1,45 @@
 """
 Payment API endpoints for Stripe integration
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
-from typing import Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Any, Optional
+from functools import lru_cache
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
 import logging
 
-from database import get_db
+from database import get_async_db
 from utils.auth import get_current_user_id, get_current_user_info
 from services.stripe_service import StripeService
+from services.catalog import get_product_catalog
+from services.catalog_validation import get_catalog_validator
+from services.entitlements import get_active_entitlements
+from services.webhook_queue import enqueue_event
 from schemas.orders import (
     CheckoutRequest, 
     CheckoutResponse, 
     OrderStatusResponse, 
+    EntitlementsResponse,
     WebhookResponse,
     StripeValidationResponse,
     ErrorResponse
 )
-from models.orders import Order, PaymentLog
-from config import stripe_configured
+from models.orders import Order, order_serializer
+from config import is_stripe_configured, settings
+from utils.http_cache import CachedJSON, ResponseMemo, etag_matches, not_modified, set_etag, weak_etag
+from utils.serialization import FastJSONResponse
+from utils.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, stream_ndjson
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1/payments", tags=["payments"])
 
+# Rendered /validate responses, keyed by the validation they were rendered from
+_validation_memo = ResponseMemo(ttl=settings.stripe_validation_cache_ttl)
+
 
 @router.post("/checkout/{product_id}", response_model=CheckoutResponse)
 @router.post("/checkout/{product_id}/", response_model=CheckoutResponse)
@@ -31,13 +47,13 @@ async def create_checkout(
     product_id: str,
     checkout_request: CheckoutRequest,
     user_id: str = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Create a Stripe checkout session for a product
     
     Args:
-        product_id: Product ID (1 or 2)
+        product_id: Product ID from the catalog
         checkout_request: Checkout request with quantity
         user_id: Current user ID from authentication
         db: Database session
@@ -45,17 +61,17 @@ async def create_checkout(
     Returns:
         Checkout session URL
     """
-    if not stripe_configured:
+    if not is_stripe_configured():
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Stripe not configured"
         )
     
     # Validate product ID
-    if product_id not in ["1", "2"]:
+    if get_product_catalog().get(product_id) is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Product ID must be 1 or 2"
+            detail=f"Unknown product ID: {product_id}"
         )
     
     try:
@@ -68,116 +84,141 @@ async def create_checkout(
             quantity=checkout_request.quantity
         )
         
-        logger.info(f"Checkout session created for user {user_id}, product {product_id}")
+        logger.info("Checkout session created for user %s, product %s", user_id, product_id)
         return CheckoutResponse(url=result["url"])
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error creating checkout: {e}")
+        logger.error("Unexpected error creating checkout: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to create checkout session"
         )
 
 
-@router.get("/order-status/{product_id}", response_model=OrderStatusResponse)
-@router.get("/order-status/{product_id}/", response_model=OrderStatusResponse)
-async def check_order_status(
-    product_id: str,
+@router.get("/entitlements", response_model=EntitlementsResponse)
+async def get_entitlements(
+    products: str = Query(..., description="Comma-separated product IDs from the catalog, e.g. 1,2"),
     user_id: str = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Check if user has paid for a product
+    Check which products the user has paid for, in one request
     
     Args:
-        product_id: Product ID to check (1 or 2)
+        products: Comma-separated product IDs
         user_id: Current user ID from authentication
         db: Database session
         
     Returns:
-        Order status with hasPaid boolean
+        hasPaid per requested product ID
     """
-    if not stripe_configured:
+    if not is_stripe_configured():
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Stripe not configured"
         )
     
-    # Validate product ID
-    if product_id not in ["1", "2"]:
+    # Validate product IDs, keeping request order and dropping duplicates
+    product_ids = list(dict.fromkeys(part.strip() for part in products.split(",") if part.strip()))
+    if not product_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="At least one product ID is required"
+        )
+    catalog = get_product_catalog()
+    unknown = [product_id for product_id in product_ids if catalog.get(product_id) is None]
+    if unknown:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Product ID must be 1 or 2"
+            detail=f"Unknown product IDs: {', '.join(unknown)}"
         )
     
     try:
-        # Check if user has paid for this product in the last month
-        from datetime import datetime, timedelta
-        
-        one_month_ago = datetime.utcnow() - timedelta(days=30)
+        # Entitlements are kept up to date when orders are fulfilled
+        entitlements = await get_active_entitlements(db, user_id, product_ids)
         
-        # Query for fulfilled orders for this user and product within the last month
-        existing_order = db.query(Order).filter(
-            Order.user_id == user_id,
-            Order.product_id == product_id,
-            Order.fulfilled == True,
-            Order.created_at >= one_month_ago
-        ).first()
+        logger.info("Entitlement check for user %s: %s", user_id, entitlements)
         
-        # Return whether user has paid
-        has_paid = existing_order is not None
-        
-        logger.info(f"Order status check for user {user_id}, product {product_id}: hasPaid={has_paid}")
-        
-        return OrderStatusResponse(hasPaid=has_paid)
+        return EntitlementsResponse(entitlements=entitlements)
         
     except Exception as e:
-        logger.error(f"Error checking order status: {str(e)}")
+        logger.error("Error checking entitlements: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error checking order status"
         )
 
 
+@router.get("/order-status/{product_id}", response_model=OrderStatusResponse)
+@router.get("/order-status/{product_id}/", response_model=OrderStatusResponse)
+async def check_order_status(
+    product_id: str,
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Check if user has paid for a product
+    
+    Single-product form of GET /entitlements, kept for existing clients.
+    
+    Args:
+        product_id: Product ID from the catalog
+        user_id: Current user ID from authentication
+        db: Database session
+        
+    Returns:
+        Order status with hasPaid boolean
+    """
+    result = await get_entitlements(products=product_id, user_id=user_id, db=db)
+    if len(result.entitlements) != 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown product ID: {product_id}"
+        )
+    
+    (has_paid,) = result.entitlements.values()
+    return OrderStatusResponse(hasPaid=has_paid)
+
+
 @router.get("/order-status-test/{product_id}", response_model=OrderStatusResponse)
 async def check_order_status_test(
     product_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Test endpoint to check order status without authentication
     """
     # Validate product ID
-    if product_id not in ["1", "2"]:
+    if get_product_catalog().get(product_id) is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Product ID must be 1 or 2"
+            detail=f"Unknown product ID: {product_id}"
         )
     
     try:
         # Check if there are any fulfilled orders for this product in the last month
-        from datetime import datetime, timedelta
-        
-        one_month_ago = datetime.utcnow() - timedelta(days=30)
+        one_month_ago = datetime.now(timezone.utc) - timedelta(days=30)
         
         # Query for fulfilled orders for this product within the last month
-        existing_order = db.query(Order).filter(
-            Order.product_id == product_id,
-            Order.fulfilled == True,
-            Order.created_at >= one_month_ago
-        ).first()
+        result = await db.execute(
+            select(Order.id).where(
+                Order.product_id == product_id,
+                Order.fulfilled.is_(True),
+                Order.created_at >= one_month_ago
+            ).limit(1)
+        )
         
         # Return whether there are any paid orders for this product
-        has_paid = existing_order is not None
+        has_paid = result.first() is not None
         
-        logger.info(f"Test order status check for product {product_id}: hasPaid={has_paid}")
+        logger.info("Test order status check for product %s: hasPaid=%s", product_id, has_paid)
         
         return OrderStatusResponse(hasPaid=has_paid)
         
     except Exception as e:
-        logger.error(f"Error checking test order status: {str(e)}")
+        logger.error("Error checking test order status: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error checking order status"
@@ -185,21 +226,21 @@ async def check_order_status_test(
 
 
 @router.post("/webhook", response_model=WebhookResponse)
-async def stripe_webhook(
-    request: Request,
-    db: Session = Depends(get_db)
-):
+async def stripe_webhook(request: Request):
     """
-    Handle Stripe webhook events
+    Receive Stripe webhook events
+    
+    The event is verified, stored in payment_logs with processed=False and
+    acknowledged once the batched insert commits; webhook queue workers apply
+    it in the background.
     
     Args:
         request: FastAPI request object
-        db: Database session
         
     Returns:
         Webhook received confirmation
     """
-    if not stripe_configured:
+    if not is_stripe_configured():
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Stripe not configured"
@@ -216,38 +257,22 @@ async def stripe_webhook(
                 detail="Missing Stripe signature"
             )
         
-        # Process webhook
+        # Verify the signature before anything is stored
         stripe_service = StripeService()
-        result = await stripe_service.handle_webhook(body, signature)
+        event = stripe_service.construct_event(body, signature)
         
-        # Log the webhook event
-        try:
-            import json
-            event_data = json.loads(body.decode('utf-8'))
-            
-            payment_log = PaymentLog(
-                event_type=event_data.get("type", "unknown"),
-                event_id=event_data.get("id", ""),
-                session_id=event_data.get("data", {}).get("object", {}).get("id"),
-                user_id=event_data.get("data", {}).get("object", {}).get("client_reference_id"),
-                event_data=event_data,
-                processed=True
-            )
-            
-            db.add(payment_log)
-            db.commit()
-            
-        except Exception as log_error:
-            logger.error(f"Failed to log webhook event: {log_error}")
-            # Don't fail the webhook for logging errors
+        # Store the event durably; the webhook queue workers apply it
+        if await enqueue_event(event, body):
+            logger.info("Webhook event %s queued", event.get('id'))
+        else:
+            logger.info("Webhook event %s already received", event.get('id'))
         
-        logger.info("Webhook processed successfully")
         return WebhookResponse(received=True)
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error processing webhook: {e}")
+        logger.error("Unexpected error processing webhook: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Webhook processing failed"
@@ -256,64 +281,134 @@ async def stripe_webhook(
 
 @router.get("/validate", response_model=StripeValidationResponse)
 async def validate_stripe_config(
+    request: Request,
     user_info: Dict[str, Any] = Depends(get_current_user_info)
 ):
     """
     Validate Stripe configuration and products
     
+    Serves the catalog validator's cached result, which is refreshed in the
+    background every STRIPE_VALIDATION_CACHE_TTL seconds, with an ETag. The
+    first request after a catalog change validates the new catalog.
+    
     Args:
+        request: Incoming request, for If-None-Match
         user_info: Current user information from authentication
         
     Returns:
         Validation results for Stripe products and prices
     """
-    if not stripe_configured:
+    if not is_stripe_configured():
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Stripe not configured"
         )
     
     try:
-        stripe_service = StripeService()
-        result = await stripe_service.validate_products()
+        validator = get_catalog_validator()
+        result = await validator.get()
         
-        logger.info(f"Stripe validation completed: {result['all_valid']}")
-        return StripeValidationResponse(**result)
+        key = (validator.key, validator.validated_at)
+        cached = _validation_memo.get(key)
+        if cached is not None:
+            return cached.response(request)
+        
+        content = StripeValidationResponse(**result).model_dump()
+        return _validation_memo.set(key, content).response(request)
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error validating Stripe config: {e}")
+        logger.error("Unexpected error validating Stripe config: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Stripe validation failed"
         )
 
 
+def _orders_query(user_id: str, cursor: Optional[str]) -> Select:
+    """Orders of a user, newest first, starting after the cursor if given"""
+    query = select(Order).where(Order.user_id == user_id)
+    
+    if cursor:
+        created_at, order_id = decode_cursor(cursor, 2)
+        try:
+            after = tuple_(Order.created_at, Order.id) < tuple_(
+                datetime.fromisoformat(created_at), UUID(order_id)
+            )
+        except (AttributeError, TypeError, ValueError):
+            # UUID() raises AttributeError for non-string values
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        query = query.where(after)
+    
+    return query.order_by(Order.created_at.desc(), Order.id.desc())
+
+
 @router.get("/orders", response_model=list[Dict[str, Any]])
 async def get_user_orders(
+    request: Request,
+    limit: int = Query(default=50, ge=1, le=500, description="Maximum orders per page"),
+    cursor: Optional[str] = Query(default=None, description="Cursor from the X-Next-Cursor header"),
+    stream: bool = Query(default=False, description="Stream every order as NDJSON"),
     user_id: str = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Get all orders for the current user
+    Get orders for the current user, newest first
+    
+    Results are paginated with a keyset cursor on (created_at, id): when more
+    orders exist, the cursor for the next page is returned in the
+    X-Next-Cursor header. With stream=true every remaining order is streamed
+    as NDJSON instead, in constant memory.
+    
+    Pages carry a weak ETag built from the (id, updated_at) of their rows, so
+    a matching If-None-Match is answered with 304 before any serialization.
     
     Args:
+        request: Incoming request, for If-None-Match
+        limit: Maximum number of orders to return
+        cursor: Cursor of the page to fetch
+        stream: Stream all orders as NDJSON instead of returning a page
         user_id: Current user ID from authentication
         db: Database session
         
     Returns:
-        List of user orders
+        List of user orders, or an NDJSON stream
     """
+    query = _orders_query(user_id, cursor)
+    
+    if stream:
+        return StreamingResponse(
+            stream_ndjson(query, order_serializer),
+            media_type="application/x-ndjson"
+        )
+    
     try:
-        orders = db.query(Order).filter(
-            Order.user_id == user_id
-        ).order_by(Order.created_at.desc()).all()
+        result = await db.execute(query.limit(limit + 1))
+        orders = result.scalars().all()
+        
+        # The extra row is included, so the ETag also changes with has-more
+        etag = weak_etag("orders", user_id, *((order.id, order.updated_at) for order in orders))
         
-        return [order.to_dict() for order in orders]
+        headers = {}
+        if len(orders) > limit:
+            orders = orders[:limit]
+            last = orders[-1]
+            headers[NEXT_CURSOR_HEADER] = encode_cursor(last.created_at.isoformat(), str(last.id))
+        
+        if etag_matches(request, etag):
+            return not_modified(etag, headers)
+        
+        # Trusted ORM output: skip response_model validation and jsonable_encoder
+        response = FastJSONResponse(order_serializer.many(orders), headers=headers)
+        set_etag(response, etag)
+        return response
         
     except Exception as e:
-        logger.error(f"Unexpected error getting user orders: {e}")
+        logger.error("Unexpected error getting user orders: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to retrieve orders"
@@ -321,15 +416,21 @@ async def get_user_orders(
 
 
 @router.get("/health")
-async def payments_health():
+async def payments_health(request: Request):
     """
     Health check for payments service
     
     Returns:
         Service health status
     """
-    return {
+    # Stripe configuration is fixed for the life of the process
+    return _payments_health_body().response(request)
+
+
+@lru_cache
+def _payments_health_body() -> CachedJSON:
+    return CachedJSON({
         "status": "healthy",
-        "stripe_configured": stripe_configured,
+        "stripe_configured": is_stripe_configured(),
         "service": "payments"
-    }
+    })
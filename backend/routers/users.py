@@ -1,32 +1,78 @@
 import logging
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select, text
 from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, get_async_db
 from utils.auth import verify_kinde_token, get_current_user_id
 from models import users as models
 from schemas import users as schemas
+from utils.http_cache import etag_matches, not_modified, set_etag, weak_etag
 from utils.logger import logger
+from utils.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, stream_ndjson
 
 router = APIRouter()
 
+# Below this estimate the exact count is cheap enough to compute
+EXACT_COUNT_THRESHOLD = 10000
+
 @router.get("", response_model=list[schemas.User],include_in_schema=False)
 @router.get("/", response_model=list[schemas.User])
-async def get_all_users(db: Session = Depends(get_db), user_id: str = Depends(get_current_user_id)):
+async def get_all_users(
+    response: Response,
+    limit: int = Query(default=100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+    user_id: str = Depends(get_current_user_id)
+):
+    query = select(models.User.id).order_by(models.User.id)
+    if cursor:
+        (after_id,) = decode_cursor(cursor, 1)
+        if not isinstance(after_id, str):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(models.User.id > after_id)
+
+    if stream:
+        return StreamingResponse(stream_ndjson(query, lambda id: {"id": id}), media_type="application/x-ndjson")
+
     try:
-        users = db.query(models.User).all()
-        if not users:
-            return []
-        return users
+        result = await db.execute(query.limit(limit + 1))
+        user_ids = result.scalars().all()
+        if len(user_ids) > limit:
+            user_ids = user_ids[:limit]
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(user_ids[-1])
+        return [{"id": id} for id in user_ids]
     except Exception as e:
-        logger.error(f"Error retrieving users: {str(e)}")
+        logger.error("Error retrieving users: %s", e)
         raise HTTPException(status_code=500, detail=f"Error retrieving users: {str(e)}")
 
+@router.get("/count")
+async def count_users(db: AsyncSession = Depends(get_async_db), user_id: str = Depends(get_current_user_id)):
+    try:
+        # Planner statistics avoid a full scan; reltuples is -1 before the first ANALYZE
+        result = await db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"),
+            {"table": models.User.__tablename__}
+        )
+        estimate = result.scalar_one_or_none()
+        if estimate is not None and estimate >= EXACT_COUNT_THRESHOLD:
+            return {"count": estimate, "estimated": True}
+
+        result = await db.execute(select(func.count()).select_from(models.User))
+        return {"count": result.scalar_one(), "estimated": False}
+    except Exception as e:
+        logger.error("Error counting users: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error counting users: {str(e)}")
+
 @router.post("", response_model=schemas.User, status_code=201,include_in_schema=False)
 @router.post("/", response_model=schemas.User, status_code=201)
 async def create_user(db: Session = Depends(get_db), user_id: str = Depends(get_current_user_id)):
     existing_user = db.query(models.User).filter(models.User.id == user_id).first()
     if existing_user:
-        logger.warning(f"User with ID {user_id} already exists")
+        logger.warning("User with ID %s already exists", user_id)
         raise HTTPException(status_code=409, detail="User with this ID already exists")
 
     db_user = models.User(id=user_id)
@@ -37,22 +83,28 @@ async def create_user(db: Session = Depends(get_db), user_id: str = Depends(get_
         return db_user
     except Exception as e:
         db.rollback()
-        logger.error(f"Error creating user: {str(e)}")
+        logger.error("Error creating user: %s", e)
         raise HTTPException(status_code=500, detail=f"Error creating user: {str(e)}")
 
 @router.get("/{user_id}", response_model=schemas.User)
-async def get_user(user_id: str, db: Session = Depends(get_db), current_user_id: str = Depends(get_current_user_id)):
+async def get_user(request: Request, response: Response, user_id: str, db: Session = Depends(get_db), current_user_id: str = Depends(get_current_user_id)):
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
-        logger.warning(f"User with ID {user_id} not found")
+        logger.warning("User with ID %s not found", user_id)
         raise HTTPException(status_code=404, detail="User not found")
+
+    # The id is the user's only column, so it is also the row version
+    etag = weak_etag("user", user.id)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
     return user
 
 @router.put("/{user_id}", response_model=schemas.User)
 async def update_user(user_id: str, user: schemas.UserCreate, db: Session = Depends(get_db), current_user_id: str = Depends(get_current_user_id)):
     db_user = db.query(models.User).filter(models.User.id == user_id).first()
     if not db_user:
-        logger.warning(f"User with ID {user_id} not found for update")
+        logger.warning("User with ID %s not found for update", user_id)
         raise HTTPException(status_code=404, detail="User not found")
 
     db_user.id = user.id
@@ -62,14 +114,14 @@ async def update_user(user_id: str, user: schemas.UserCreate, db: Session = Depe
         return db_user
     except Exception as e:
         db.rollback()
-        logger.error(f"Error updating user: {str(e)}")
+        logger.error("Error updating user: %s", e)
         raise HTTPException(status_code=500, detail=f"Error updating user: {str(e)}")
 
 @router.delete("/{user_id}")
 async def delete_user(user_id: str, db: Session = Depends(get_db), current_user_id: str = Depends(get_current_user_id)):
     db_user = db.query(models.User).filter(models.User.id == user_id).first()
     if not db_user:
-        logger.warning(f"User with ID {user_id} not found for deletion")
+        logger.warning("User with ID %s not found for deletion", user_id)
         raise HTTPException(status_code=404, detail="User not found")
     
     try:
@@ -78,5 +130,5 @@ async def delete_user(user_id: str, db: Session = Depends(get_db), current_user_
         return {"message": "User deleted successfully"}
     except Exception as e:
         db.rollback()
-        logger.error(f"Error deleting user: {str(e)}")
+        logger.error("Error deleting user: %s", e)
         raise HTTPException(status_code=500, detail=f"Error deleting user: {str(e)}")
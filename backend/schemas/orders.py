@@ -49,6 +49,11 @@ class OrderStatusResponse(BaseModel):
     hasPaid: bool
 
 
+class EntitlementsResponse(BaseModel):
+    """Schema for bulk entitlement check response"""
+    entitlements: Dict[str, bool]
+
+
 class CheckoutRequest(BaseModel):
     """Schema for checkout request"""
     quantity: int = Field(default=1, ge=1, le=10, description="Quantity to purchase")
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Backfill the entitlements table from existing fulfilled orders
+
+Safe to re-run: entitlements are only ever extended, never shortened.
+
+Usage:
+    python scripts/backfill_entitlements.py --batch-size 10000
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import SessionLocal
+from services.entitlements import backfill_entitlements
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backfill entitlements from fulfilled orders")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Users per transaction")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        written = backfill_entitlements(db, batch_size=args.batch_size)
+    finally:
+        db.close()
+
+    print(f"✅ Backfilled {written} entitlements in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Product catalog: active products indexed by our ID, Stripe product ID and Stripe price ID
+"""
+import asyncio
+import logging
+from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from config import settings
+from database import async_session
+from models.orders import Product
+from utils.resources import registry
+
+logger = logging.getLogger(__name__)
+
+# Webhook events after which the catalog is reloaded
+CATALOG_EVENTS = frozenset({"product.created", "product.updated", "product.deleted", "price.updated"})
+
+
+class CatalogProduct(NamedTuple):
+    """A sellable product and its Stripe identifiers"""
+    id: str
+    name: str
+    stripe_product_id: str
+    stripe_price_id: str
+    price_amount: Optional[str] = None
+    currency: Optional[str] = None
+
+
+class CatalogIndex:
+    """
+    Immutable lookup tables over one snapshot of the catalog
+
+    A reload builds a new index and swaps it in with a single assignment, so
+    readers always see one consistent snapshot without locking.
+    """
+
+    __slots__ = ("products", "by_id", "by_stripe_product_id", "by_stripe_price_id", "version", "source")
+
+    def __init__(self, products: Iterable[CatalogProduct], version: Any = None, source: str = "settings"):
+        self.products: Tuple[CatalogProduct, ...] = tuple(sorted(products, key=lambda product: product.id))
+        self.by_id: Mapping[str, CatalogProduct] = MappingProxyType(
+            {product.id: product for product in self.products}
+        )
+        self.by_stripe_product_id: Mapping[str, CatalogProduct] = MappingProxyType(
+            {product.stripe_product_id: product for product in self.products}
+        )
+        self.by_stripe_price_id: Mapping[str, CatalogProduct] = MappingProxyType(
+            {product.stripe_price_id: product for product in self.products}
+        )
+        self.version = version
+        self.source = source
+
+
+def settings_products() -> List[CatalogProduct]:
+    """Products 1 and 2 from STRIPE_PRODUCT_n/STRIPE_PRICE_n, used while the products table is empty"""
+    configured = [
+        ("1", settings.stripe_product_1, settings.stripe_price_1),
+        ("2", settings.stripe_product_2, settings.stripe_price_2),
+    ]
+    return [
+        CatalogProduct(id=product_id, name=f"Product {product_id}", stripe_product_id=stripe_product_id, stripe_price_id=stripe_price_id)
+        for product_id, stripe_product_id, stripe_price_id in configured
+        if stripe_product_id and stripe_price_id
+    ]
+
+
+class ProductCatalog:
+    """
+    Serves product lookups from an in-memory index of the products table
+
+    The index starts from settings, is loaded from the database at startup
+    and is reloaded when the table's version (row count and latest
+    updated_at) changes, checked every refresh_interval seconds, or right
+    away after a product or price webhook. Active rows of the products table
+    replace the settings products entirely; only while the table has no rows
+    at all are the settings products served, so deactivating every row leaves
+    nothing for sale.
+    """
+
+    def __init__(self, refresh_interval: float = 30):
+        self.refresh_interval = refresh_interval
+        self.index = CatalogIndex(settings_products())
+        self.reloads = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def get(self, product_id: str) -> Optional[CatalogProduct]:
+        """Return the product with our ID product_id, if it is sold"""
+        return self.index.by_id.get(product_id)
+
+    def by_stripe_product_id(self, stripe_product_id: str) -> Optional[CatalogProduct]:
+        """Return the product with this Stripe product ID"""
+        return self.index.by_stripe_product_id.get(stripe_product_id)
+
+    def by_stripe_price_id(self, stripe_price_id: str) -> Optional[CatalogProduct]:
+        """Return the product sold at this Stripe price ID"""
+        return self.index.by_stripe_price_id.get(stripe_price_id)
+
+    @property
+    def products(self) -> Tuple[CatalogProduct, ...]:
+        """Every product, ordered by ID"""
+        return self.index.products
+
+    async def _version(self, db: Any) -> Tuple[int, Optional[datetime]]:
+        result = await db.execute(select(func.count(), func.max(Product.updated_at)).select_from(Product))
+        count, updated_at = result.one()
+        return count, updated_at
+
+    async def reload(self, force: bool = True) -> bool:
+        """
+        Rebuild the index from the products table
+
+        Args:
+            force: Reload even if the table's version has not changed
+
+        Returns:
+            True if a new index was swapped in
+        """
+        async with async_session() as db:
+            version = await self._version(db)
+            if not force and version == self.index.version:
+                return False
+
+            result = await db.execute(select(Product).where(Product.active.is_(True)))
+            rows = result.scalars().all()
+
+        count, _ = version
+        if count:
+            products = [
+                CatalogProduct(
+                    id=row.id,
+                    name=row.name,
+                    stripe_product_id=row.stripe_product_id,
+                    stripe_price_id=row.stripe_price_id,
+                    price_amount=row.price_amount,
+                    currency=row.currency,
+                )
+                for row in rows
+            ]
+            index = CatalogIndex(products, version, source="database")
+        else:
+            index = CatalogIndex(settings_products(), version)
+
+        self.index = index
+        self.reloads += 1
+        logger.info("Product catalog loaded from %s: %s products", index.source, len(index.products))
+        return True
+
+    def start(self) -> None:
+        """Start polling the products table for changes"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._poll_loop())
+
+    async def _poll_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.reload(force=False)
+            except Exception as e:
+                # Keep serving the current index
+                logger.warning("Product catalog refresh failed: %s", e)
+
+    async def aclose(self) -> None:
+        """Stop polling"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the index source, size and reload count"""
+        return {"source": self.index.source, "products": len(self.index.products), "reloads": self.reloads}
+
+
+registry.register(
+    "product_catalog",
+    lambda: ProductCatalog(refresh_interval=settings.catalog_refresh_interval),
+    close=lambda catalog: catalog.aclose(),
+)
+
+
+def get_product_catalog() -> ProductCatalog:
+    """Return the shared product catalog, creating it on first use"""
+    return registry.get("product_catalog")
@@ -0,0 +1,122 @@
+"""
+Cached validation of the product catalog against Stripe
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from config import settings
+from services.catalog import get_product_catalog
+from services.stripe_service import StripeService
+from utils.resources import registry
+
+logger = logging.getLogger(__name__)
+
+# Seconds before retrying after a failed background validation
+RETRY_INTERVAL = 30
+
+
+def catalog_key() -> Tuple[Tuple[str, str, str], ...]:
+    """The catalog entries validate_products() checks against Stripe"""
+    return tuple(
+        (product.id, product.stripe_product_id, product.stripe_price_id)
+        for product in get_product_catalog().products
+    )
+
+
+class CatalogValidator:
+    """
+    Serves the last validate_products() result for the current catalog
+
+    A result is reused for ttl seconds, as long as the catalog has not changed
+    since it was computed. The background task validates once at startup and
+    again before the result expires, so requests normally never wait on
+    Stripe. Concurrent callers that do find no fresh result share a single
+    validation.
+    """
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self.result: Optional[Dict[str, Any]] = None
+        self.key: Optional[tuple] = None
+        self.validated_at = 0.0
+        self._validation: Optional[asyncio.Task] = None
+        self._validation_key: Optional[tuple] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def cached(self) -> Optional[Dict[str, Any]]:
+        """Return the last result if it is fresh and for the current catalog"""
+        if self.result is None or self.key != catalog_key():
+            return None
+        if time.monotonic() - self.validated_at >= self.ttl:
+            return None
+        return self.result
+
+    async def get(self) -> Dict[str, Any]:
+        """Return a fresh result, validating first if there is none"""
+        result = self.cached()
+        if result is not None:
+            return result
+        return await self.refresh()
+
+    async def refresh(self) -> Dict[str, Any]:
+        """
+        Validate the current catalog against Stripe and cache the result
+
+        Joins a validation already in progress for the same catalog.
+
+        Returns:
+            Dictionary with validation results
+        """
+        key = catalog_key()
+        if self._validation is None or self._validation.done() or self._validation_key != key:
+            self._validation_key = key
+            self._validation = asyncio.get_running_loop().create_task(self._validate(key))
+        # Shielded so one cancelled caller does not cancel the others' validation
+        return await asyncio.shield(self._validation)
+
+    async def _validate(self, key: tuple) -> Dict[str, Any]:
+        result = await StripeService().validate_products()
+        self.result, self.key, self.validated_at = result, key, time.monotonic()
+        return result
+
+    def start(self) -> None:
+        """Start validating in the background"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+                delay = self.ttl * 0.8
+            except Exception as e:
+                # Requests validate on demand until this succeeds
+                logger.warning("Background Stripe catalog validation failed: %s", getattr(e, "detail", e))
+                delay = min(self.ttl, RETRY_INTERVAL)
+            await asyncio.sleep(delay)
+
+    async def aclose(self) -> None:
+        """Stop validating in the background"""
+        for task in (self._task, self._validation):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._task = None
+        self._validation = None
+
+
+registry.register(
+    "catalog_validator",
+    lambda: CatalogValidator(ttl=settings.stripe_validation_cache_ttl),
+    close=lambda validator: validator.aclose(),
+)
+
+
+def get_catalog_validator() -> CatalogValidator:
+    """Return the shared catalog validator, creating it on first use"""
+    return registry.get("catalog_validator")
@@ -0,0 +1,241 @@
+"""
+Entitlement maintenance and lookups for paid product access
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence
+import logging
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import Insert
+
+from config import settings
+from models.orders import Entitlement, Order
+from utils.cache import CacheBackend, MemoryCacheBackend, RedisCacheBackend
+
+logger = logging.getLogger(__name__)
+
+ENTITLEMENT_PERIOD = timedelta(days=settings.entitlement_period_days)
+
+
+def _extend_on_conflict(stmt: Insert) -> Insert:
+    """Turn an entitlements insert into an upsert that never shortens access"""
+    return stmt.on_conflict_do_update(
+        index_elements=[Entitlement.user_id, Entitlement.product_id],
+        set_={
+            "paid_until": func.greatest(Entitlement.paid_until, stmt.excluded.paid_until),
+            "updated_at": func.now()
+        }
+    )
+
+
+def grant_entitlement(user_id: str, product_id: str, paid_at: datetime) -> Insert:
+    """
+    Build the upsert that grants a user access to a product for one period
+
+    Args:
+        user_id: User ID
+        product_id: Our product ID
+        paid_at: When the order was paid
+
+    Returns:
+        Insert statement to execute in the order's transaction
+    """
+    stmt = pg_insert(Entitlement).values(
+        user_id=user_id,
+        product_id=product_id,
+        paid_until=paid_at + ENTITLEMENT_PERIOD
+    )
+    return _extend_on_conflict(stmt)
+
+
+class EntitlementCache:
+    """
+    Caches order-status answers per (user, product)
+
+    Positive answers live for at most `ttl` and never past paid_until. Negative
+    answers use the shorter `negative_ttl`, since with per-worker memory
+    backends only the worker handling the webhook sees the invalidation.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float, negative_ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(user_id: str, product_id: str) -> str:
+        return f"entitlement:{user_id}:{product_id}"
+
+    async def get(self, user_id: str, product_id: str) -> Optional[bool]:
+        """Return the cached answer, or None on a miss"""
+        value = await self.backend.get(self._key(user_id, product_id))
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value == "1"
+
+    async def get_many(self, user_id: str, product_ids: Sequence[str]) -> Dict[str, Optional[bool]]:
+        """Return the cached answer per product, None for misses, in one backend call"""
+        values = await self.backend.get_many([self._key(user_id, product_id) for product_id in product_ids])
+        answers = {}
+        for product_id, value in zip(product_ids, values):
+            if value is None:
+                self.misses += 1
+                answers[product_id] = None
+            else:
+                self.hits += 1
+                answers[product_id] = value == "1"
+        return answers
+
+    async def set(self, user_id: str, product_id: str, has_paid: bool, paid_until: Optional[datetime] = None) -> None:
+        """Cache an answer, bounded by paid_until for positive answers"""
+        ttl = self.ttl if has_paid else self.negative_ttl
+        if has_paid and paid_until is not None:
+            ttl = min(ttl, (paid_until - datetime.now(timezone.utc)).total_seconds())
+        await self.backend.set(self._key(user_id, product_id), "1" if has_paid else "0", ttl)
+
+    async def invalidate(self, user_id: str, product_id: str) -> None:
+        """Drop the cached answer, e.g. after a checkout is fulfilled"""
+        await self.backend.delete(self._key(user_id, product_id))
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters"""
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def build_cache_backend() -> CacheBackend:
+    """Build the backend selected by settings.entitlement_cache_backend"""
+    if settings.entitlement_cache_backend == "redis":
+        return RedisCacheBackend.from_url(settings.redis_url, prefix="modular:")
+    if settings.entitlement_cache_backend == "memory":
+        return MemoryCacheBackend(
+            maxsize=settings.entitlement_cache_size,
+            ttl=settings.entitlement_cache_ttl
+        )
+    raise ValueError(f"Unknown entitlement cache backend: {settings.entitlement_cache_backend}")
+
+
+_entitlement_cache: Optional[EntitlementCache] = None
+
+
+def get_entitlement_cache() -> EntitlementCache:
+    """Return the shared entitlement cache, creating it on first use"""
+    global _entitlement_cache
+
+    if _entitlement_cache is None:
+        _entitlement_cache = EntitlementCache(
+            build_cache_backend(),
+            ttl=settings.entitlement_cache_ttl,
+            negative_ttl=settings.entitlement_cache_negative_ttl
+        )
+    return _entitlement_cache
+
+
+async def get_active_entitlements(db: AsyncSession, user_id: str, product_ids: Sequence[str]) -> Dict[str, bool]:
+    """
+    Check which of several products a user currently has paid access to
+
+    Answers come from the entitlement cache in one call; the misses are
+    looked up together with a single query on the entitlements primary key.
+
+    Args:
+        db: Database session
+        user_id: User ID
+        product_ids: Our product IDs
+
+    Returns:
+        Whether each product's entitlement has not expired yet
+    """
+    cache = get_entitlement_cache()
+    answers = await cache.get_many(user_id, product_ids)
+    missing: List[str] = [product_id for product_id, has_paid in answers.items() if has_paid is None]
+    if not missing:
+        return answers
+
+    result = await db.execute(
+        select(Entitlement.product_id, Entitlement.paid_until).where(
+            Entitlement.user_id == user_id,
+            Entitlement.product_id.in_(missing)
+        )
+    )
+    paid_until_by_product = dict(result.all())
+    now = datetime.now(timezone.utc)
+
+    for product_id in missing:
+        paid_until = paid_until_by_product.get(product_id)
+        has_paid = paid_until is not None and paid_until >= now
+        answers[product_id] = has_paid
+        await cache.set(user_id, product_id, has_paid, paid_until)
+    return answers
+
+
+async def has_active_entitlement(db: AsyncSession, user_id: str, product_id: str) -> bool:
+    """
+    Check whether a user currently has paid access to a product
+
+    Args:
+        db: Database session
+        user_id: User ID
+        product_id: Our product ID
+
+    Returns:
+        True if the user's entitlement has not expired yet
+    """
+    return (await get_active_entitlements(db, user_id, [product_id]))[product_id]
+
+
+def backfill_entitlements(db: Session, batch_size: int = 10000) -> int:
+    """
+    Build entitlements from existing fulfilled orders
+
+    Users are processed in keyset batches of batch_size, each committed in
+    its own transaction, so the backfill can run against a live database.
+
+    Args:
+        db: Database session
+        batch_size: Number of users per batch
+
+    Returns:
+        Number of entitlement rows written
+    """
+    total = 0
+    last_user_id = ""
+
+    while True:
+        user_ids = db.execute(
+            select(Order.user_id).where(
+                Order.fulfilled.is_(True),
+                Order.user_id > last_user_id
+            ).group_by(Order.user_id).order_by(Order.user_id).limit(batch_size)
+        ).scalars().all()
+
+        if not user_ids:
+            break
+
+        latest_paid = select(
+            Order.user_id,
+            Order.product_id,
+            (func.max(Order.created_at) + ENTITLEMENT_PERIOD).label("paid_until")
+        ).where(
+            Order.fulfilled.is_(True),
+            Order.product_id != "unknown",
+            Order.user_id.between(user_ids[0], user_ids[-1])
+        ).group_by(Order.user_id, Order.product_id)
+
+        stmt = pg_insert(Entitlement).from_select(
+            ["user_id", "product_id", "paid_until"], latest_paid
+        )
+        result = db.execute(_extend_on_conflict(stmt))
+        db.commit()
+
+        total += result.rowcount
+        last_user_id = user_ids[-1]
+        logger.info("Backfilled entitlements up to user %s (%s rows)", last_user_id, total)
+
+    return total
@@ -0,0 +1,160 @@
+"""
+Dependency health checks behind the readiness probe
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import text
+
+from config import is_kinde_configured, is_stripe_configured, settings
+from database import get_async_engine
+from services.payment_log_writer import get_payment_log_writer
+from services.webhook_queue import get_webhook_queue
+from utils.auth import get_jwks_manager
+from utils.resources import registry
+
+logger = logging.getLogger(__name__)
+
+# A check returns (healthy, detail)
+HealthCheck = Callable[[], Awaitable[Tuple[bool, str]]]
+
+
+async def check_database() -> Tuple[bool, str]:
+    """Check out a pooled connection and run a trivial query"""
+    async with get_async_engine().connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    return True, "ok"
+
+
+async def check_jwks() -> Tuple[bool, str]:
+    """Check that the Kinde key set is loaded and not long past its expiry"""
+    if not is_kinde_configured():
+        return True, "disabled"
+    manager = get_jwks_manager()
+    if not manager.is_loaded:
+        return False, "key set not loaded"
+    overdue = time.monotonic() - manager.expires_at
+    if overdue > settings.health_jwks_max_staleness:
+        return False, f"key set expired {overdue:.0f}s ago"
+    return True, "ok"
+
+
+async def check_stripe() -> Tuple[bool, str]:
+    """Check the Stripe configuration and that webhook processing is running"""
+    if not is_stripe_configured():
+        return True, "disabled"
+    if not get_payment_log_writer().is_running:
+        return False, "payment log writer stopped"
+    if not get_webhook_queue().is_running:
+        return False, "webhook workers stopped"
+    return True, "ok"
+
+
+class HealthMonitor:
+    """
+    Runs dependency checks in the background and serves their last results
+
+    Probes only read the cached results, so they cost no I/O however often
+    they are called. All checks run concurrently every interval seconds, each
+    bounded by timeout. A result older than three intervals counts as failed,
+    so a stalled monitor cannot keep reporting ready.
+    """
+
+    def __init__(self, checks: Dict[str, HealthCheck], interval: float = 5, timeout: float = 2):
+        self.checks = checks
+        self.interval = interval
+        self.timeout = timeout
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def refresh(self) -> None:
+        """Run every check once and replace the cached results"""
+        names = list(self.checks)
+        outcomes = await asyncio.gather(*(self._run(name) for name in names))
+        self.results = dict(zip(names, outcomes))
+
+    async def _run(self, name: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            healthy, detail = await asyncio.wait_for(self.checks[name](), self.timeout)
+        except asyncio.TimeoutError:
+            healthy, detail = False, f"timed out after {self.timeout}s"
+        except Exception as e:
+            healthy, detail = False, str(e) or type(e).__name__
+
+        previous = self.results.get(name)
+        if previous is not None and previous["healthy"] != healthy:
+            log = logger.info if healthy else logger.warning
+            log("Health check %s is now %s: %s", name, "passing" if healthy else "failing", detail)
+
+        return {
+            "healthy": healthy,
+            "detail": detail,
+            "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+            "checked_at": time.monotonic(),
+        }
+
+    def readiness(self) -> Tuple[bool, Dict[str, Dict[str, Any]]]:
+        """
+        Return whether every check passed recently, with per-check results
+
+        Returns:
+            (ready, {check name: {"healthy", "detail", "duration_ms", "age"}})
+        """
+        now = time.monotonic()
+        max_age = self.interval * 3
+        report = {}
+        for name in self.checks:
+            result = self.results.get(name)
+            if result is None:
+                report[name] = {"healthy": False, "detail": "not checked yet"}
+                continue
+            age = now - result["checked_at"]
+            report[name] = {
+                "healthy": result["healthy"] and age <= max_age,
+                "detail": result["detail"] if age <= max_age else f"stale result ({age:.0f}s old)",
+                "duration_ms": result["duration_ms"],
+                "age": round(age, 3),
+            }
+        return all(check["healthy"] for check in report.values()), report
+
+    def start(self) -> None:
+        """Start the background check loop"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error("Health checks failed to run: %s", e)
+
+    async def aclose(self) -> None:
+        """Stop the background check loop"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+registry.register(
+    "health_monitor",
+    lambda: HealthMonitor(
+        {"database": check_database, "jwks": check_jwks, "stripe": check_stripe},
+        interval=settings.health_check_interval,
+        timeout=settings.health_check_timeout,
+    ),
+    close=lambda monitor: monitor.aclose(),
+)
+
+
+def get_health_monitor() -> HealthMonitor:
+    """Return the shared health monitor, creating it on first use"""
+    return registry.get("health_monitor")
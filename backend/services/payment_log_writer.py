@@ -0,0 +1,199 @@
+"""
+Batched inserts of webhook events into payment_logs
+"""
+import asyncio
+import logging
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from config import settings
+from database import async_session
+from models.orders import PaymentLog
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class PaymentLogWriter:
+    """
+    Group-commits payment_logs rows written by concurrent webhook requests
+
+    Callers await write(), which resolves once their row is committed, so a
+    webhook is still only acknowledged after a durable write. A single flusher
+    collects up to batch_size rows, or whatever arrives within flush_interval
+    seconds of the first one, and inserts them with one multi-row INSERT and
+    one commit. The queue holds at most maxsize rows; when it is full, write()
+    waits, which slows webhook responses instead of growing memory.
+    """
+
+    def __init__(self, batch_size: int = 100, flush_interval: float = 0.01, maxsize: int = 1000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.maxsize = maxsize
+        self.batches = 0
+        self.rows = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    @property
+    def is_running(self) -> bool:
+        """Whether the flusher task is alive and accepting writes"""
+        return self._task is not None and not self._task.done() and not self._closing
+
+    async def write(self, values: Dict[str, Any]) -> Optional[UUID]:
+        """
+        Insert a payment log row as part of the next batch
+
+        Args:
+            values: Column values; event_id must be set
+
+        Returns:
+            The new row ID, or None if a row with the same event_id already exists
+
+        Raises:
+            RuntimeError: If the writer is not running
+        """
+        if self._task is None or self._closing:
+            raise RuntimeError("Payment log writer is not running")
+
+        values = {**values, "id": values.get("id") or uuid.uuid4()}
+        future = asyncio.get_running_loop().create_future()
+        queue, task = self._queue, self._task
+        await queue.put((values, future))
+        if task.done():
+            # The flusher exited while this write waited for queue space
+            _fail_queued(queue)
+        return await future
+
+    def start(self) -> None:
+        """Start the flusher"""
+        if self._task is not None:
+            return
+        self._closing = False
+        self._queue = asyncio.Queue(self.maxsize)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info("Payment log writer started (batch size %s)", self.batch_size)
+
+    async def stop(self, timeout: float = 10) -> None:
+        """Flush every queued row, then stop the flusher"""
+        if self._task is None:
+            return
+        self._closing = True
+        try:
+            # Queueing the marker can wait too, if the queue is full
+            await asyncio.wait_for(self._stop_after_queued(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Payment log writer stopped before flushing every queued row")
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _stop_after_queued(self) -> None:
+        await self._queue.put((_STOP, None))
+        await self._task
+
+    async def _run(self) -> None:
+        batch: List[Tuple[Any, Optional[asyncio.Future]]] = []
+        try:
+            await self._drain(batch)
+        finally:
+            # Rows of a cancelled flush and rows queued behind the stop
+            # marker would otherwise never be answered
+            error = RuntimeError("Payment log writer stopped")
+            for _, future in batch:
+                if future is not None and not future.done():
+                    future.set_exception(error)
+            _fail_queued(self._queue)
+
+    async def _drain(self, batch: List[Tuple[Any, Optional[asyncio.Future]]]) -> None:
+        """Flush batches until the stop marker; batch is filled in place"""
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            batch.clear()
+            batch.append(await self._queue.get())
+            deadline = loop.time() + self.flush_interval
+
+            while len(batch) < self.batch_size and batch[-1][0] is not _STOP:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            if batch[-1][0] is _STOP:
+                batch.pop()
+                stopping = True
+            if batch:
+                await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]) -> None:
+        try:
+            stmt = pg_insert(PaymentLog).values(
+                [values for values, _ in batch]
+            ).on_conflict_do_nothing(index_elements=[PaymentLog.event_id]).returning(PaymentLog.id)
+
+            async with async_session() as db:
+                result = await db.execute(stmt)
+                inserted = set(result.scalars().all())
+                await db.commit()
+        except Exception as e:
+            logger.error("Failed to write %s payment logs: %s", len(batch), e)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.rows += len(inserted)
+        for values, future in batch:
+            if not future.done():
+                future.set_result(values["id"] if values["id"] in inserted else None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth and batch counters"""
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self.batches,
+            "rows": self.rows,
+        }
+
+
+def _fail_queued(queue: asyncio.Queue) -> None:
+    """Fail the writes still in queue once its flusher has exited"""
+    error = RuntimeError("Payment log writer stopped")
+    while True:
+        try:
+            _, future = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        if future is not None and not future.done():
+            future.set_exception(error)
+
+
+_payment_log_writer: Optional[PaymentLogWriter] = None
+
+
+def get_payment_log_writer() -> PaymentLogWriter:
+    """Return the shared payment log writer, creating it on first use"""
+    global _payment_log_writer
+
+    if _payment_log_writer is None:
+        _payment_log_writer = PaymentLogWriter(
+            batch_size=settings.payment_log_batch_size,
+            flush_interval=settings.payment_log_flush_interval_ms / 1000,
+            maxsize=settings.payment_log_queue_size,
+        )
+    return _payment_log_writer
@@ -0,0 +1,204 @@
+"""
+Reconciliation of the entitlements table with Stripe PaymentIntents
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from config import settings
+from database import async_session
+from models.orders import SyncState
+from services.entitlements import ENTITLEMENT_PERIOD, get_entitlement_cache, grant_entitlement
+from services.stripe_client import StripeClient, get_stripe_client
+from services.stripe_service import payment_intent_entitlement
+from utils.resources import registry
+
+logger = logging.getLogger(__name__)
+
+# sync_state row holding the creation time of the newest PaymentIntent seen
+SYNC_NAME = "payment_intents"
+
+# PaymentIntent statuses that never change again
+FINAL_STATUSES = frozenset({"succeeded", "canceled"})
+
+
+class PaymentReconciler:
+    """
+    Grants the entitlements of succeeded PaymentIntents that webhooks missed
+
+    Each run pages through the PaymentIntents created since the stored
+    high-water mark, grants entitlements in transactions of batch_size
+    intents and only then advances the mark, so an interrupted run is simply
+    repeated. The mark is compared with >=, and re-granting an entitlement
+    from the same payment leaves it unchanged, so intents created in the same
+    second as the mark are never missed. Without a mark, the first run starts
+    one entitlement period back, since older payments grant nothing active.
+
+    The mark never passes an intent that may still succeed: it advances at
+    most to the oldest intent not yet succeeded or canceled, so one that is
+    processing or awaiting action is listed again on later runs. Intents
+    older than max_pending_age seconds are taken to be abandoned and no
+    longer hold the mark back.
+
+    Every worker schedules runs, but a run first claims a lease by bumping
+    the sync_state row's updated_at in its own short transaction, which only
+    succeeds if no worker did so within the last 90% of interval; the workers
+    together therefore list PaymentIntents about once per interval, and no
+    connection is held while Stripe is listed. Should a run outlast its
+    lease and overlap the next, the mark only moves forward and re-granting
+    is harmless.
+    """
+
+    def __init__(
+        self,
+        interval: float = 300,
+        batch_size: int = 100,
+        max_pending_age: float = 7 * 24 * 3600,
+        client: Optional[StripeClient] = None,
+    ):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_pending_age = max_pending_age
+        self.client = client
+        self.runs = 0
+        self.granted = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _load_position(self) -> int:
+        async with async_session() as db:
+            position = await db.scalar(select(SyncState.position).where(SyncState.name == SYNC_NAME))
+        if position is None:
+            position = int((datetime.now(timezone.utc) - ENTITLEMENT_PERIOD).timestamp())
+        return position
+
+    async def _save_position(self, position: int) -> None:
+        stmt = pg_insert(SyncState).values(name=SYNC_NAME, position=position)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[SyncState.name],
+            set_={
+                # Never move back, should runs of several workers overlap
+                "position": func.greatest(SyncState.position, stmt.excluded.position),
+                "updated_at": func.now()
+            }
+        )
+        async with async_session() as db:
+            await db.execute(stmt)
+            await db.commit()
+
+    async def _grant(self, entitlements: List[Tuple[str, str, datetime]]) -> None:
+        if not entitlements:
+            return
+        async with async_session() as db:
+            for user_id, product_id, paid_at in entitlements:
+                await db.execute(grant_entitlement(user_id, product_id, paid_at))
+            await db.commit()
+
+        cache = get_entitlement_cache()
+        for user_id, product_id in {(user_id, product_id) for user_id, product_id, _ in entitlements}:
+            await cache.invalidate(user_id, product_id)
+        self.granted += len(entitlements)
+
+    async def _claim(self) -> bool:
+        """Take the lease on this run; False if another worker took it within the last 90% of interval"""
+        start = int((datetime.now(timezone.utc) - ENTITLEMENT_PERIOD).timestamp())
+        stmt = pg_insert(SyncState).values(name=SYNC_NAME, position=start)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[SyncState.name],
+            set_={"updated_at": func.now()},
+            where=SyncState.updated_at < func.now() - timedelta(seconds=self.interval * 0.9),
+        ).returning(SyncState.name)
+        async with async_session() as db:
+            claimed = (await db.execute(stmt)).scalar_one_or_none() is not None
+            await db.commit()
+        return claimed
+
+    async def run(self) -> int:
+        """
+        Reconcile the PaymentIntents created since the high-water mark
+
+        Returns:
+            Number of PaymentIntents that granted an entitlement; 0 if another
+            worker is reconciling or has reconciled recently
+        """
+        if not await self._claim():
+            logger.debug("PaymentIntents were reconciled recently by another worker")
+            return 0
+        return await self._reconcile()
+
+    async def _reconcile(self) -> int:
+        client = self.client or get_stripe_client()
+        position = await self._load_position()
+        newest = position
+        oldest_unfinished: Optional[int] = None
+        abandoned_before = datetime.now(timezone.utc).timestamp() - self.max_pending_age
+        granted = 0
+        pending: List[Tuple[str, str, datetime]] = []
+
+        async for payment_intent in client.iter_payment_intents(created={"gte": position}, limit=self.batch_size):
+            created = payment_intent["created"]
+            newest = max(newest, created)
+            if payment_intent.get("status") not in FINAL_STATUSES and created >= abandoned_before:
+                oldest_unfinished = created if oldest_unfinished is None else min(oldest_unfinished, created)
+            entitlement = payment_intent_entitlement(payment_intent)
+            if entitlement is not None:
+                pending.append(entitlement)
+            if len(pending) >= self.batch_size:
+                await self._grant(pending)
+                granted += len(pending)
+                pending = []
+
+        await self._grant(pending)
+        granted += len(pending)
+        await self._save_position(newest if oldest_unfinished is None else min(newest, oldest_unfinished))
+
+        self.runs += 1
+        logger.info("Reconciled PaymentIntents since %s: %s granted entitlements", position, granted)
+        return granted
+
+    def start(self) -> None:
+        """Reconcile now and then every interval seconds in the background"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run()
+            except Exception as e:
+                # The mark was not advanced; the next run retries
+                logger.warning("PaymentIntent reconciliation failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+    async def aclose(self) -> None:
+        """Stop reconciling"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return run and granted entitlement counters"""
+        return {"runs": self.runs, "granted": self.granted}
+
+
+registry.register(
+    "payment_reconciler",
+    lambda: PaymentReconciler(
+        interval=settings.payment_reconcile_interval,
+        batch_size=settings.payment_reconcile_batch_size,
+        max_pending_age=settings.payment_reconcile_max_pending_age,
+    ),
+    close=lambda reconciler: reconciler.aclose(),
+)
+
+
+def get_payment_reconciler() -> PaymentReconciler:
+    """Return the shared payment reconciler, creating it on first use"""
+    return registry.get("payment_reconciler")
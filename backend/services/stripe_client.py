@@ -0,0 +1,211 @@
+"""
+Non-blocking Stripe API client with pluggable transports
+"""
+import asyncio
+import importlib.util
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlencode
+
+import httpx
+import stripe
+from stripe.api_requestor import APIRequestor
+from stripe.util import convert_to_stripe_object
+
+from config import settings
+from utils.resources import registry
+
+logger = logging.getLogger(__name__)
+
+
+def _encode_params(params: Dict[str, Any], prefix: Optional[str] = None) -> Iterator[Tuple[str, Any]]:
+    """Flatten nested params into Stripe's form encoding (a[b][0]=c)"""
+    for key, value in params.items():
+        if value is None:
+            continue
+        name = f"{prefix}[{key}]" if prefix else key
+        if isinstance(value, dict):
+            yield from _encode_params(value, name)
+        elif isinstance(value, (list, tuple)):
+            for index, item in enumerate(value):
+                if isinstance(item, dict):
+                    yield from _encode_params(item, f"{name}[{index}]")
+                else:
+                    yield f"{name}[{index}]", item
+        elif isinstance(value, bool):
+            yield name, "true" if value else "false"
+        else:
+            yield name, value
+
+
+class StripeTransport(ABC):
+    """Base class for transports that execute Stripe API requests"""
+
+    @abstractmethod
+    async def request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """Execute a request and return the response as a StripeObject"""
+
+    async def aclose(self) -> None:
+        """Release any resources held by the transport"""
+        return None
+
+
+class SdkStripeTransport(StripeTransport):
+    """Runs the synchronous Stripe SDK in a worker thread"""
+
+    def __init__(self, api_key: str, api_base: Optional[str] = None):
+        self.api_key = api_key
+        self._requestor = APIRequestor(key=api_key, api_base=api_base)
+
+    async def request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        response, api_key = await asyncio.to_thread(
+            self._requestor.request, method, path, params
+        )
+        return convert_to_stripe_object(response, api_key)
+
+
+class HttpxStripeTransport(StripeTransport):
+    """Talks to the Stripe REST API through a pooled, keep-alive httpx.AsyncClient"""
+
+    def __init__(
+        self,
+        api_key: str,
+        api_base: str = "https://api.stripe.com",
+        http2: bool = True,
+        max_connections: int = 100,
+        timeout: float = 30.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("h2 package not installed, Stripe client falling back to HTTP/1.1")
+            http2 = False
+
+        self.api_key = api_key
+        # Reused only to turn raw responses into StripeResponse objects and
+        # raise the same stripe.error exceptions as the SDK does
+        self._requestor = APIRequestor(key=api_key, api_base=api_base)
+        self._client = httpx.AsyncClient(
+            base_url=api_base,
+            http2=http2,
+            timeout=timeout,
+            transport=transport,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            headers={
+                "Authorization": f"Bearer {api_key}",
+                "Stripe-Version": stripe.api_version,
+            },
+        )
+
+    async def request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        encoded = list(_encode_params(params or {}))
+        try:
+            if method.lower() in ("get", "delete"):
+                response = await self._client.request(method.upper(), path, params=encoded)
+            else:
+                response = await self._client.request(
+                    method.upper(),
+                    path,
+                    content=urlencode(encoded),
+                    headers={"Content-Type": "application/x-www-form-urlencoded"},
+                )
+        except httpx.HTTPError as e:
+            raise stripe.error.APIConnectionError(f"Error communicating with Stripe: {e}")
+
+        stripe_response = self._requestor.interpret_response(
+            response.text, response.status_code, response.headers
+        )
+        return convert_to_stripe_object(stripe_response, self.api_key)
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+class StripeClient:
+    """Async facade over the Stripe API calls used by the backend"""
+
+    def __init__(self, transport: StripeTransport):
+        self.transport = transport
+
+    async def create_checkout_session(self, **params: Any) -> Any:
+        """Create a Checkout Session"""
+        return await self.transport.request("post", "/v1/checkout/sessions", params)
+
+    async def retrieve_checkout_session(self, session_id: str, expand: Optional[List[str]] = None) -> Any:
+        """Retrieve a Checkout Session, optionally expanding related objects"""
+        return await self.transport.request(
+            "get", f"/v1/checkout/sessions/{session_id}", {"expand": expand}
+        )
+
+    async def list_products(self, **params: Any) -> Any:
+        """List products"""
+        return await self.transport.request("get", "/v1/products", params)
+
+    async def list_prices(self, **params: Any) -> Any:
+        """List prices"""
+        return await self.transport.request("get", "/v1/prices", params)
+
+    async def retrieve_product(self, product_id: str) -> Any:
+        """Retrieve a product"""
+        return await self.transport.request("get", f"/v1/products/{product_id}")
+
+    async def retrieve_price(self, price_id: str) -> Any:
+        """Retrieve a price"""
+        return await self.transport.request("get", f"/v1/prices/{price_id}")
+
+    async def list_payment_intents(self, **params: Any) -> Any:
+        """List PaymentIntents"""
+        return await self.transport.request("get", "/v1/payment_intents", params)
+
+    async def iter_payment_intents(self, **params: Any) -> AsyncIterator[Any]:
+        """Iterate over PaymentIntents across every page, like the SDK's auto_paging_iter"""
+        while True:
+            page = await self.list_payment_intents(**params)
+            for payment_intent in page.data:
+                yield payment_intent
+            if not page.has_more or not page.data:
+                return
+            params = {**params, "starting_after": page.data[-1].id}
+
+    async def aclose(self) -> None:
+        """Close the underlying transport"""
+        await self.transport.aclose()
+
+
+def build_stripe_transport() -> StripeTransport:
+    """Build the transport selected by settings.stripe_transport"""
+    if settings.stripe_transport == "sdk":
+        return SdkStripeTransport(settings.stripe_secret_key, api_base=settings.stripe_api_base)
+    if settings.stripe_transport == "httpx":
+        return HttpxStripeTransport(
+            settings.stripe_secret_key,
+            api_base=settings.stripe_api_base,
+            http2=settings.stripe_http2,
+            max_connections=settings.stripe_max_connections,
+            timeout=settings.stripe_timeout,
+        )
+    raise ValueError(f"Unknown Stripe transport: {settings.stripe_transport}")
+
+
+def _build_stripe_client() -> StripeClient:
+    # For SDK helpers that read the global key
+    stripe.api_key = settings.stripe_secret_key
+    client = StripeClient(build_stripe_transport())
+    logger.info("Stripe client initialised with %s transport", settings.stripe_transport)
+    return client
+
+
+registry.register("stripe_client", _build_stripe_client, close=lambda client: client.aclose())
+
+
+def get_stripe_client() -> StripeClient:
+    """Return the shared Stripe client, creating it on first use"""
+    return registry.get("stripe_client")
+
+
+async def close_stripe_client() -> None:
+    """Close the shared Stripe client and its connection pool"""
+    await registry.close("stripe_client")
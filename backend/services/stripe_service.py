@@ -1,56 +1,80 @@
 """
 Stripe service for payment processing
 """
+import asyncio
+import json
 import stripe
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from fastapi import HTTPException, status
-from config import settings, stripe_configured
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import settings, is_stripe_configured
+from models.orders import Order, Product
+from services.catalog import CatalogProduct, get_product_catalog
+from services.stripe_client import StripeClient, get_stripe_client
+from services.entitlements import grant_entitlement, has_active_entitlement
+from utils.metrics import STRIPE_SECONDS, timed
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
 
 logger = logging.getLogger(__name__)
 
-# Initialize Stripe
-if stripe_configured:
-    stripe.api_key = settings.stripe_secret_key
-else:
-    logger.warning("Stripe not configured - payment functionality disabled")
+def payment_intent_entitlement(payment_intent: Dict[str, Any]) -> Optional[Tuple[str, str, datetime]]:
+    """
+    Return the entitlement a PaymentIntent pays for
+    
+    Args:
+        payment_intent: PaymentIntent from a webhook event or a Stripe list
+        
+    Returns:
+        (user_id, product_id, paid_at) if the payment succeeded and its
+        metadata names a user and an active catalog product, otherwise None
+    """
+    if payment_intent.get('status') != 'succeeded':
+        return None
+    metadata = payment_intent.get('metadata') or {}
+    user_id, product_id = metadata.get('user_id'), metadata.get('product_id')
+    if not user_id or not product_id:
+        return None
+    # The catalog only holds active products
+    if get_product_catalog().get(product_id) is None:
+        logger.warning("PaymentIntent %s is for unknown or inactive product %s", payment_intent.get('id'), product_id)
+        return None
+    created = payment_intent.get('created')
+    paid_at = datetime.fromtimestamp(created, timezone.utc) if created is not None else datetime.now(timezone.utc)
+    return user_id, product_id, paid_at
 
 
 class StripeService:
     """Service class for Stripe payment operations"""
     
-    def __init__(self):
-        if not stripe_configured:
+    def __init__(self, client: Optional[StripeClient] = None):
+        if not is_stripe_configured():
             raise HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                 detail="Stripe not configured"
             )
+        self.client = client or get_stripe_client()
     
-    def get_product_price(self, product_id: str) -> str:
-        """Get the price ID for a product"""
-        if product_id == "1":
-            return settings.stripe_price_1
-        elif product_id == "2":
-            return settings.stripe_price_2
-        else:
+    def get_product(self, product_id: str) -> CatalogProduct:
+        """Get a product from the catalog"""
+        product = get_product_catalog().get(product_id)
+        if product is None:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Invalid product ID: {product_id}"
             )
+        return product
+    
+    def get_product_price(self, product_id: str) -> str:
+        """Get the price ID for a product"""
+        return self.get_product(product_id).stripe_price_id
     
     def get_product_id(self, product_id: str) -> str:
         """Get the Stripe product ID for a product"""
-        if product_id == "1":
-            return settings.stripe_product_1
-        elif product_id == "2":
-            return settings.stripe_product_2
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Invalid product ID: {product_id}"
-            )
+        return self.get_product(product_id).stripe_product_id
     
+    @timed(STRIPE_SECONDS, "create_checkout_session")
     async def create_checkout_session(
         self, 
         product_id: str, 
@@ -61,7 +85,7 @@ class StripeService:
         Create a Stripe checkout session
         
         Args:
-            product_id: Product ID (1 or 2)
+            product_id: Product ID from the catalog
             user_id: User ID from authentication
             quantity: Quantity to purchase
             
@@ -69,12 +93,13 @@ class StripeService:
             Dictionary with checkout session URL
         """
         try:
-            price_id = self.get_product_price(product_id)
-            stripe_product_id = self.get_product_id(product_id)
+            product = self.get_product(product_id)
+            price_id = product.stripe_price_id
+            stripe_product_id = product.stripe_product_id
             
-            logger.info(f"Creating checkout session for user {user_id}, product {product_id}")
+            logger.info("Creating checkout session for user %s, product %s", user_id, product_id)
             
-            session = stripe.checkout.Session.create(
+            session = await self.client.create_checkout_session(
                 line_items=[{
                     'price': price_id,
                     'quantity': quantity,
@@ -90,155 +115,209 @@ class StripeService:
                 }
             )
             
-            logger.info(f"Checkout session created: {session.id}")
+            logger.info("Checkout session created: %s", session.id)
             return {"url": session.url}
             
         except stripe.error.StripeError as e:
-            logger.error(f"Stripe error creating checkout session: {e}")
+            logger.error("Stripe error creating checkout session: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Payment processing error: {str(e)}"
             )
         except Exception as e:
-            logger.error(f"Unexpected error creating checkout session: {e}")
+            logger.error("Unexpected error creating checkout session: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Internal server error"
             )
     
-    async def handle_webhook(self, payload: bytes, signature: str) -> Dict[str, Any]:
+    @timed(STRIPE_SECONDS, "construct_event")
+    def construct_event(self, payload: bytes, signature: str) -> Dict[str, Any]:
         """
-        Handle Stripe webhook events
+        Verify a webhook signature and parse the event
+        
+        The payload is parsed once into a plain dict, which is both stored
+        and processed, instead of being converted to a stripe.Event.
         
         Args:
             payload: Raw webhook payload
             signature: Stripe signature header
             
         Returns:
-            Dictionary indicating webhook was received
+            The verified Stripe event
         """
         try:
-            event = stripe.Webhook.construct_event(
-                payload, 
-                signature, 
-                settings.stripe_webhook_secret
+            stripe.WebhookSignature.verify_header(
+                payload.decode('utf-8'),
+                signature,
+                settings.stripe_webhook_secret,
+                stripe.Webhook.DEFAULT_TOLERANCE
             )
-            
-            logger.info(f"Received Stripe webhook: {event['type']}")
-            
-            # Handle different event types
-            if event['type'] == 'checkout.session.completed':
-                await self._handle_checkout_completed(event['data']['object'])
-            elif event['type'] == 'payment_intent.succeeded':
-                await self._handle_payment_succeeded(event['data']['object'])
-            elif event['type'] == 'customer.subscription.created':
-                await self._handle_subscription_created(event['data']['object'])
-            else:
-                logger.info(f"Unhandled webhook event type: {event['type']}")
-            
-            return {"received": True}
+            return json.loads(payload)
             
         except stripe.error.SignatureVerificationError as e:
-            logger.error(f"Invalid Stripe signature: {e}")
+            logger.error("Invalid Stripe signature: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid webhook signature"
             )
-        except Exception as e:
-            logger.error(f"Webhook processing error: {e}")
+        except ValueError as e:
+            # Also covers UnicodeDecodeError and JSONDecodeError
+            logger.error("Invalid Stripe webhook payload: %s", e)
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Webhook processing failed"
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid webhook payload"
             )
     
-    async def _handle_checkout_completed(self, session: Dict[str, Any]) -> None:
-        """Handle checkout.session.completed webhook"""
+    async def fetch_event_objects(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Retrieve the Stripe objects process_event needs to apply an event
+        
+        Called before the transaction that applies the event is opened, so
+        no connection or row lock is held across Stripe round trips.
+        
+        Args:
+            event: Stripe event, as returned by construct_event or decoded from a payment log
+            
+        Returns:
+            Objects to pass to process_event as `fetched`
+        """
+        if event['type'] == 'checkout.session.completed':
+            session = event['data']['object']
+            if session.get('payment_status') == 'paid':
+                # Line items are only included when expanded
+                return {"checkout_session": await self.client.retrieve_checkout_session(session['id'], expand=['line_items'])}
+        return {}
+    
+    @timed(STRIPE_SECONDS, "process_event")
+    async def process_event(
+        self,
+        db: AsyncSession,
+        event: Dict[str, Any],
+        fetched: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[str, str]]:
+        """
+        Apply a verified Stripe webhook event
+        
+        Changes are made in the caller's session and transaction; the caller
+        commits them.
+        
+        Args:
+            db: Database session of the caller's unit of work
+            event: Stripe event, as returned by construct_event or decoded from a payment log
+            fetched: Result of fetch_event_objects(event); fetched now if omitted
+            
+        Returns:
+            (user_id, product_id) pairs whose entitlement changed, to invalidate after commit
+        """
+        if fetched is None:
+            fetched = await self.fetch_event_objects(event)
+        logger.info("Processing Stripe webhook: %s", event['type'])
+        
+        # Handle different event types
+        if event['type'] == 'checkout.session.completed':
+            return await self._handle_checkout_completed(db, event['data']['object'], fetched.get('checkout_session'))
+        elif event['type'] == 'payment_intent.succeeded':
+            return await self._handle_payment_succeeded(db, event['data']['object'])
+        elif event['type'] == 'customer.subscription.created':
+            await self._handle_subscription_created(event['data']['object'])
+        elif event['type'] in ('product.updated', 'product.deleted'):
+            await self._handle_product_updated(db, event['data']['object'], deleted=event['type'] == 'product.deleted')
+        elif event['type'] == 'price.updated':
+            await self._handle_price_updated(db, event['data']['object'])
+        else:
+            logger.info("Unhandled webhook event type: %s", event['type'])
+        return []
+    
+    async def _handle_checkout_completed(
+        self,
+        db: AsyncSession,
+        session: Dict[str, Any],
+        stripe_session: Any
+    ) -> List[Tuple[str, str]]:
+        """Handle checkout.session.completed webhook; stripe_session is the session with line items expanded"""
         try:
             session_id = session['id']
             user_id = session.get('client_reference_id')
             customer_id = session.get('customer')
             payment_status = session.get('payment_status')
             
-            logger.info(f"Checkout completed for session {session_id}, user {user_id}, status: {payment_status}")
+            logger.info("Checkout completed for session %s, user %s, status: %s", session_id, user_id, payment_status)
             
             # Only process if payment is successful
-            if payment_status == 'paid':
-                # Get session details from Stripe to get line items
-                stripe_session = stripe.checkout.Session.retrieve(
-                    session_id, 
-                    expand=['line_items']
-                )
-                
-                # Extract product information from line items
-                line_items = stripe_session.line_items.data if stripe_session.line_items else []
-                product_id = None
-                stripe_product_id = None
-                
-                if line_items:
-                    price = line_items[0].price
-                    if price and price.product:
-                        stripe_product_id = price.product
-                        # Map Stripe product ID to our product ID
-                        if stripe_product_id == settings.stripe_product_1:
-                            product_id = "1"
-                        elif stripe_product_id == settings.stripe_product_2:
-                            product_id = "2"
-                
-                # Create order in database
-                from database import get_db
-                from models.orders import Order
-                
-                db = next(get_db())
-                try:
-                    # Check if order already exists
-                    existing_order = db.query(Order).filter(Order.session_id == session_id).first()
-                    if existing_order and existing_order.fulfilled:
-                        logger.info(f"Order for session {session_id} already exists and is fulfilled")
-                        return
-                    
-                    # Create new order
-                    order = Order(
-                        session_id=session_id,
-                        user_id=user_id,
-                        customer_id=customer_id,
-                        product_id=product_id or "unknown",
-                        stripe_product_id=stripe_product_id,
-                        items=line_items[0].to_dict() if line_items else None,
-                        fulfilled=True,
-                        payment_status=payment_status,
-                        amount_total=str(stripe_session.amount_total) if stripe_session.amount_total else None,
-                        currency=stripe_session.currency
-                    )
-                    
-                    db.add(order)
-                    db.commit()
-                    db.refresh(order)
-                    
-                    logger.info(f"Order created successfully: {order.id} for user {user_id}, product {product_id}")
-                    
-                except Exception as db_error:
-                    db.rollback()
-                    logger.error(f"Database error creating order: {db_error}")
-                    raise
-                finally:
-                    db.close()
-            else:
-                logger.warning(f"Checkout session {session_id} not paid, status: {payment_status}")
+            if payment_status != 'paid':
+                logger.warning("Checkout session %s not paid, status: %s", session_id, payment_status)
+                return []
+            
+            # Extract product information from line items
+            line_items = stripe_session.line_items.data if stripe_session.line_items else []
+            product_id = None
+            stripe_product_id = None
+            
+            if line_items:
+                price = line_items[0].price
+                if price and price.product:
+                    stripe_product_id = price.product
+                    # Map the Stripe product, or failing that the price, to our product ID
+                    catalog = get_product_catalog()
+                    product = catalog.by_stripe_product_id(stripe_product_id) or catalog.by_stripe_price_id(price.id)
+                    if product is not None:
+                        product_id = product.id
+            
+            # Check if order already exists
+            result = await db.execute(
+                select(Order.fulfilled).where(Order.session_id == session_id)
+            )
+            if result.scalar_one_or_none():
+                logger.info("Order for session %s already exists and is fulfilled", session_id)
+                return []
+            
+            # Create new order
+            order = Order(
+                session_id=session_id,
+                user_id=user_id,
+                customer_id=customer_id,
+                product_id=product_id or "unknown",
+                stripe_product_id=stripe_product_id,
+                items=line_items[0].to_dict() if line_items else None,
+                fulfilled=True,
+                payment_status=payment_status,
+                amount_total=str(stripe_session.amount_total) if stripe_session.amount_total else None,
+                currency=stripe_session.currency
+            )
+            db.add(order)
+            await db.flush()
+            
+            logger.info("Order created: %s for user %s, product %s", order.id, user_id, product_id)
+            
+            # Grant access in the same transaction as the order
+            if product_id and user_id:
+                await db.execute(grant_entitlement(user_id, product_id, datetime.now(timezone.utc)))
+                return [(user_id, product_id)]
+            return []
             
         except Exception as e:
-            logger.error(f"Error handling checkout completed: {e}")
+            logger.error("Error handling checkout completed: %s", e)
             raise
     
-    async def _handle_payment_succeeded(self, payment_intent: Dict[str, Any]) -> None:
+    async def _handle_payment_succeeded(self, db: AsyncSession, payment_intent: Dict[str, Any]) -> List[Tuple[str, str]]:
         """Handle payment_intent.succeeded webhook"""
         try:
             payment_id = payment_intent['id']
             amount = payment_intent['amount']
             
-            logger.info(f"Payment succeeded: {payment_id}, amount: {amount}")
+            logger.info("Payment succeeded: %s, amount: %s", payment_id, amount)
+            
+            entitlement = payment_intent_entitlement(payment_intent)
+            if entitlement is None:
+                return []
+            user_id, product_id, paid_at = entitlement
+            await db.execute(grant_entitlement(user_id, product_id, paid_at))
+            return [(user_id, product_id)]
             
         except Exception as e:
-            logger.error(f"Error handling payment succeeded: {e}")
+            logger.error("Error handling payment succeeded: %s", e)
+            raise
     
     async def _handle_subscription_created(self, subscription: Dict[str, Any]) -> None:
         """Handle customer.subscription.created webhook"""
@@ -246,126 +325,144 @@ class StripeService:
             subscription_id = subscription['id']
             customer_id = subscription['customer']
             
-            logger.info(f"Subscription created: {subscription_id}, customer: {customer_id}")
+            logger.info("Subscription created: %s, customer: %s", subscription_id, customer_id)
             
         except Exception as e:
-            logger.error(f"Error handling subscription created: {e}")
+            logger.error("Error handling subscription created: %s", e)
+    
+    async def _handle_product_updated(self, db: AsyncSession, product: Dict[str, Any], deleted: bool = False) -> None:
+        """Sync a Stripe product's name and status into the products table; the catalog reloads after commit"""
+        values: Dict[str, Any] = {"active": bool(product.get('active', True)) and not deleted}
+        if product.get('name'):
+            values["name"] = product['name']
+        if 'description' in product:
+            values["description"] = product['description']
+        
+        result = await db.execute(
+            update(Product).where(Product.stripe_product_id == product['id']).values(**values)
+        )
+        logger.info("Stripe product %s synced to %s catalog rows", product['id'], result.rowcount)
+    
+    async def _handle_price_updated(self, db: AsyncSession, price: Dict[str, Any]) -> None:
+        """Sync a Stripe price's amount and status into the products table; the catalog reloads after commit"""
+        values: Dict[str, Any] = {"active": bool(price.get('active', True))}
+        if price.get('unit_amount') is not None:
+            values["price_amount"] = str(price['unit_amount'])
+        if price.get('currency'):
+            values["currency"] = price['currency']
+        
+        result = await db.execute(
+            update(Product).where(Product.stripe_price_id == price['id']).values(**values)
+        )
+        logger.info("Stripe price %s synced to %s catalog rows", price['id'], result.rowcount)
     
     async def check_order_status(
         self, 
+        db: AsyncSession,
         product_id: str, 
-        user_id: str,
-        days_back: int = 30
+        user_id: str
     ) -> Dict[str, bool]:
         """
-        Check if user has paid for a product within the specified time period
+        Check if user has paid for a product within the entitlement period
+        
+        Answered from the entitlements table, which webhooks and the payment
+        reconciliation job keep up to date, so no Stripe request is made.
         
         Args:
+            db: Database session
             product_id: Product ID to check
             user_id: User ID to check
-            days_back: Number of days to look back for payment
             
         Returns:
             Dictionary with hasPaid boolean
         """
+        self.get_product(product_id)
+        
         try:
-            stripe_product_id = self.get_product_id(product_id)
-            
-            # Calculate cutoff date
-            cutoff_date = datetime.now() - timedelta(days=days_back)
-            cutoff_timestamp = int(cutoff_date.timestamp())
-            
-            # Search for successful payments
-            payments = stripe.PaymentIntent.list(
-                created={'gte': cutoff_timestamp},
-                limit=100
-            )
-            
-            # Check if any payment matches our criteria
-            has_paid = False
-            for payment in payments.data:
-                if (payment.status == 'succeeded' and 
-                    payment.metadata.get('user_id') == user_id and
-                    payment.metadata.get('product_id') == product_id):
-                    has_paid = True
-                    break
-            
-            logger.info(f"Order status check for user {user_id}, product {product_id}: {has_paid}")
+            has_paid = await has_active_entitlement(db, user_id, product_id)
+            logger.info("Order status check for user %s, product %s: %s", user_id, product_id, has_paid)
             return {"hasPaid": has_paid}
             
-        except stripe.error.StripeError as e:
-            logger.error(f"Stripe error checking order status: {e}")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Payment status check failed: {str(e)}"
-            )
         except Exception as e:
-            logger.error(f"Unexpected error checking order status: {e}")
+            logger.error("Unexpected error checking order status: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Order status check failed"
             )
     
+    @timed(STRIPE_SECONDS, "validate_products")
     async def validate_products(self) -> Dict[str, Any]:
         """
-        Validate that configured products and prices exist in Stripe
+        Validate that the catalog's products and prices exist in Stripe
+        
+        Each configured ID is retrieved directly, at most
+        STRIPE_VALIDATION_CONCURRENCY at a time, so the result does not depend
+        on how many products the account has.
         
         Returns:
             Dictionary with validation results
         """
+        semaphore = asyncio.Semaphore(settings.stripe_validation_concurrency)
+        
+        async def exists(retrieve, object_id: str) -> bool:
+            async with semaphore:
+                try:
+                    await retrieve(object_id)
+                except stripe.error.InvalidRequestError as e:
+                    if e.http_status == 404:
+                        return False
+                    raise
+            return True
+        
         try:
-            # Check products
-            products = stripe.Product.list(limit=100)
-            product_ids = [p.id for p in products.data]
+            catalog_products = get_product_catalog().products
+            product_ids = list({product.stripe_product_id for product in catalog_products})
+            price_ids = list({product.stripe_price_id for product in catalog_products})
             
-            # Check prices
-            prices = stripe.Price.list(limit=100)
-            price_ids = [p.id for p in prices.data]
+            found = await asyncio.gather(
+                *(exists(self.client.retrieve_product, product_id) for product_id in product_ids),
+                *(exists(self.client.retrieve_price, price_id) for price_id in price_ids),
+            )
+            existing_products = {product_id for product_id, ok in zip(product_ids, found) if ok}
+            existing_prices = {price_id for price_id, ok in zip(price_ids, found[len(product_ids):]) if ok}
             
             validation_results = {
                 "products": {
-                    "product_1": {
-                        "id": settings.stripe_product_1,
-                        "exists": settings.stripe_product_1 in product_ids
-                    },
-                    "product_2": {
-                        "id": settings.stripe_product_2,
-                        "exists": settings.stripe_product_2 in product_ids
+                    f"product_{product.id}": {
+                        "id": product.stripe_product_id,
+                        "exists": product.stripe_product_id in existing_products
                     }
+                    for product in catalog_products
                 },
                 "prices": {
-                    "price_1": {
-                        "id": settings.stripe_price_1,
-                        "exists": settings.stripe_price_1 in price_ids
-                    },
-                    "price_2": {
-                        "id": settings.stripe_price_2,
-                        "exists": settings.stripe_price_2 in price_ids
+                    f"price_{product.id}": {
+                        "id": product.stripe_price_id,
+                        "exists": product.stripe_price_id in existing_prices
                     }
+                    for product in catalog_products
                 }
             }
             
             # Check if all are valid
-            all_valid = all([
-                validation_results["products"]["product_1"]["exists"],
-                validation_results["products"]["product_2"]["exists"],
-                validation_results["prices"]["price_1"]["exists"],
-                validation_results["prices"]["price_2"]["exists"]
-            ])
+            all_valid = all(
+                entry["exists"]
+                for group in ("products", "prices")
+                for entry in validation_results[group].values()
+            )
             
             validation_results["all_valid"] = all_valid
             
-            logger.info(f"Product validation completed: {all_valid}")
+            logger.info("Product validation completed: %s", all_valid)
             return validation_results
             
         except stripe.error.StripeError as e:
-            logger.error(f"Stripe error validating products: {e}")
+            logger.error("Stripe error validating products: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Product validation failed: {str(e)}"
             )
         except Exception as e:
-            logger.error(f"Unexpected error validating products: {e}")
+            logger.error("Unexpected error validating products: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Product validation failed"
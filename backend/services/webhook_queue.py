@@ -0,0 +1,334 @@
+"""
+Background processing of Stripe webhook events stored in payment_logs
+"""
+import asyncio
+import json
+import logging
+import zlib
+from typing import Any, Dict, List, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy import select
+
+from config import settings
+from database import async_session
+from models.orders import PaymentLog
+from services.catalog import CATALOG_EVENTS, get_product_catalog
+from services.entitlements import get_entitlement_cache
+from services.payment_log_writer import get_payment_log_writer
+from services.stripe_service import StripeService
+from utils.cache import TTLCache
+from utils.compression import compress, decompress
+from utils.pool_usage import track_connections
+
+logger = logging.getLogger(__name__)
+
+# Fields of data.object kept in "compact" storage mode: everything process_event reads
+COMPACT_OBJECT_FIELDS = (
+    "id", "object", "client_reference_id", "customer", "payment_status", "status",
+    "amount", "amount_total", "currency", "metadata", "payment_intent", "subscription", "created",
+    "active", "name", "description", "unit_amount",
+)
+
+
+def encode_event_payload(event: Dict[str, Any], body: bytes) -> Tuple[Optional[Dict[str, Any]], Optional[bytes]]:
+    """
+    Prepare an event for storage according to settings.webhook_payload_storage
+
+    Args:
+        event: Verified Stripe event
+        body: Raw webhook body the event was parsed from
+
+    Returns:
+        Values for the event_data and raw_payload columns
+    """
+    mode = settings.webhook_payload_storage
+    if mode == "full":
+        return event, None
+    if mode == "compressed":
+        return None, compress(body)
+    if mode == "compact":
+        event_object = event.get("data", {}).get("object", {})
+        return {
+            "id": event.get("id"),
+            "type": event.get("type"),
+            "created": event.get("created"),
+            "data": {"object": {k: event_object[k] for k in COMPACT_OBJECT_FIELDS if k in event_object}},
+        }, None
+    raise ValueError(f"Unknown webhook payload storage mode: {mode}")
+
+
+def decode_event_payload(payment_log: PaymentLog) -> Dict[str, Any]:
+    """Return the stored event of a payment log, whichever mode it was written in"""
+    if payment_log.raw_payload is not None:
+        return json.loads(decompress(payment_log.raw_payload))
+    return payment_log.event_data
+
+
+class WebhookQueue:
+    """
+    Drains payment_logs rows with processed=False through a pool of async workers
+
+    The webhook endpoint stores each verified event durably and submits its
+    row ID here. Events are sharded by ordering key (the Stripe session ID),
+    so events of one session are processed in order by a single worker. A
+    failed event is retried by its worker, with exponential backoff starting
+    at retry_delay, before the worker moves on, so later events of the shard
+    wait for it; after max_attempts it is left unprocessed and the shard
+    continues. A periodic sweep re-submits rows that were never picked up,
+    e.g. after a restart or a full queue, and rows are locked with SKIP
+    LOCKED so several processes can share the table safely. Ordering is only
+    guaranteed within one process.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 4,
+        maxsize: int = 1000,
+        sweep_interval: float = 30,
+        max_attempts: int = 5,
+        retry_delay: float = 1,
+    ):
+        self.concurrency = concurrency
+        self.maxsize = maxsize
+        self.sweep_interval = sweep_interval
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._shards: List[asyncio.Queue] = [asyncio.Queue(maxsize) for _ in range(concurrency)]
+        self._pending: Set[UUID] = set()
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def is_running(self) -> bool:
+        """Whether every worker and the sweeper are alive"""
+        return bool(self._tasks) and not any(task.done() for task in self._tasks)
+
+    def submit(self, log_id: UUID, ordering_key: Optional[str] = None) -> bool:
+        """
+        Queue a stored event for processing
+
+        Args:
+            log_id: PaymentLog row ID
+            ordering_key: Events with the same key are processed in submission order
+
+        Returns:
+            False if the shard is full; the row is then left for the next sweep
+        """
+        if log_id in self._pending:
+            return True
+
+        key = ordering_key or str(log_id)
+        shard = self._shards[zlib.crc32(key.encode("utf-8")) % self.concurrency]
+        try:
+            shard.put_nowait(log_id)
+        except asyncio.QueueFull:
+            logger.warning("Webhook queue full, event %s deferred to the next sweep", log_id)
+            return False
+
+        self._pending.add(log_id)
+        return True
+
+    def start(self) -> None:
+        """Start the workers and the sweeper"""
+        if self._tasks:
+            return
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._worker(shard)) for shard in self._shards]
+        self._tasks.append(loop.create_task(self._sweep_loop()))
+        logger.info("Webhook queue started with %s workers", self.concurrency)
+
+    async def stop(self, timeout: float = 10) -> None:
+        """Let queued events finish for up to timeout seconds, then stop the workers"""
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(shard.join() for shard in self._shards)), timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Webhook queue stopped with events still queued; they will be swept on restart")
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self, shard: asyncio.Queue) -> None:
+        while True:
+            log_id = await shard.get()
+            try:
+                retries = 0
+                while await self._process(log_id):
+                    await asyncio.sleep(self.retry_delay * 2 ** retries)
+                    retries += 1
+            except Exception as e:
+                logger.error("Webhook worker failed on event %s: %s", log_id, e)
+            finally:
+                self._pending.discard(log_id)
+                shard.task_done()
+
+    async def _process(self, log_id: UUID) -> bool:
+        """Apply one stored event; returns True if it failed and should be retried"""
+        service = StripeService()
+        with track_connections("webhook"):
+            async with async_session() as db:
+                result = await db.execute(
+                    select(PaymentLog).where(PaymentLog.id == log_id, PaymentLog.processed.is_(False))
+                )
+                payment_log = result.scalar_one_or_none()
+                if payment_log is None:
+                    return False
+                event = decode_event_payload(payment_log)
+
+            # Stripe is called before the row is claimed, so neither a pooled
+            # connection nor the row lock is held across the round trip
+            fetch_error: Optional[Exception] = None
+            try:
+                fetched = await service.fetch_event_objects(event)
+            except Exception as e:
+                fetched, fetch_error = {}, e
+
+            # The event is applied in the same transaction that marks it processed
+            async with async_session() as db:
+                # Another process may already be working on this row
+                result = await db.execute(
+                    select(PaymentLog).where(
+                        PaymentLog.id == log_id,
+                        PaymentLog.processed.is_(False)
+                    ).with_for_update(skip_locked=True)
+                )
+                payment_log = result.scalar_one_or_none()
+                if payment_log is None:
+                    return False
+
+                payment_log.attempts += 1
+                changed = []
+                try:
+                    if fetch_error is not None:
+                        raise fetch_error
+                    async with db.begin_nested():
+                        changed = await service.process_event(db, event, fetched)
+                    payment_log.processed = True
+                    payment_log.error_message = None
+                except Exception as e:
+                    logger.error("Error processing webhook event %s (attempt %s): %s", payment_log.event_id, payment_log.attempts, e)
+                    payment_log.error_message = str(e)
+
+                await db.commit()
+
+        cache = get_entitlement_cache()
+        for user_id, product_id in changed:
+            await cache.invalidate(user_id, product_id)
+
+        if payment_log.event_type in CATALOG_EVENTS and payment_log.processed:
+            try:
+                await get_product_catalog().reload()
+            except Exception as e:
+                # The catalog's own polling picks the change up later
+                logger.warning("Product catalog reload after %s failed: %s", payment_log.event_id, e)
+
+        return not payment_log.processed and payment_log.attempts < self.max_attempts
+
+    async def sweep(self) -> int:
+        """
+        Submit unprocessed rows that are not queued yet
+
+        Returns:
+            Number of rows submitted
+        """
+        async with async_session() as db:
+            result = await db.execute(
+                select(PaymentLog.id, PaymentLog.session_id).where(
+                    PaymentLog.processed.is_(False),
+                    PaymentLog.attempts < self.max_attempts
+                ).order_by(PaymentLog.created_at).limit(self.maxsize)
+            )
+            rows = result.all()
+
+        submitted = 0
+        for log_id, session_id in rows:
+            if log_id not in self._pending and self.submit(log_id, session_id):
+                submitted += 1
+        return submitted
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            try:
+                submitted = await self.sweep()
+                if submitted:
+                    logger.info("Swept %s pending webhook events", submitted)
+            except Exception as e:
+                logger.error("Webhook sweep failed: %s", e)
+            await asyncio.sleep(self.sweep_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth per worker and the number of in-flight events"""
+        return {
+            "workers": self.concurrency,
+            "pending": len(self._pending),
+            "queued": [shard.qsize() for shard in self._shards],
+        }
+
+
+_webhook_queue: Optional[WebhookQueue] = None
+
+
+def get_webhook_queue() -> WebhookQueue:
+    """Return the shared webhook queue, creating it on first use"""
+    global _webhook_queue
+
+    if _webhook_queue is None:
+        _webhook_queue = WebhookQueue(
+            concurrency=settings.webhook_workers,
+            maxsize=settings.webhook_queue_size,
+            sweep_interval=settings.webhook_sweep_interval,
+            max_attempts=settings.webhook_max_attempts,
+            retry_delay=settings.webhook_retry_delay,
+        )
+    return _webhook_queue
+
+
+# Event IDs this process has already stored, so Stripe retries skip the database
+_recent_event_ids = TTLCache(
+    maxsize=settings.webhook_dedup_cache_size,
+    ttl=settings.webhook_dedup_ttl
+)
+
+
+async def enqueue_event(event: Dict[str, Any], body: bytes) -> bool:
+    """
+    Store a verified webhook event and submit it to the webhook queue
+
+    Duplicate deliveries are detected before any other work: first against the
+    recently seen event IDs, then by the payment log writer's
+    INSERT ... ON CONFLICT DO NOTHING on payment_logs.event_id.
+
+    Args:
+        event: Verified Stripe event
+        body: Raw webhook body the event was parsed from
+
+    Returns:
+        False if the event had already been received
+    """
+    event_id = event.get("id", "")
+    if _recent_event_ids.get(event_id):
+        return False
+
+    event_object = event.get("data", {}).get("object", {})
+    session_id = event_object.get("id")
+    event_data, raw_payload = encode_event_payload(event, body)
+
+    log_id = await get_payment_log_writer().write({
+        "event_type": event.get("type", "unknown"),
+        "event_id": event_id,
+        "session_id": session_id,
+        "user_id": event_object.get("client_reference_id"),
+        "event_data": event_data,
+        "raw_payload": raw_payload,
+        "processed": False,
+    })
+
+    _recent_event_ids.set(event_id, True)
+    if log_id is None:
+        return False
+
+    get_webhook_queue().submit(log_id, session_id)
+    return True
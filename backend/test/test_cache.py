@@ -0,0 +1,40 @@
+import time
+
+from utils.cache import TTLCache
+
+
+def test_get_counts_hits_and_misses():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1, "maxsize": 10}
+
+
+def test_entries_expire_after_their_ttl():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("short", "value", ttl=0.01)
+    time.sleep(0.02)
+
+    assert cache.get("short") is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_falsy_values_are_cached():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("negative", False)
+
+    assert cache.get("negative", default="missing") is False
@@ -0,0 +1,84 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from config import settings
+from models.orders import Product
+from services import catalog
+from services.catalog import CatalogIndex, CatalogProduct, ProductCatalog
+
+
+def test_index_resolves_every_key():
+    product = CatalogProduct(id="3", name="Pro", stripe_product_id="prod_3", stripe_price_id="price_3")
+    catalog = ProductCatalog()
+    catalog.index = CatalogIndex([product], source="database")
+
+    assert catalog.get("3") is product
+    assert catalog.by_stripe_product_id("prod_3") is product
+    assert catalog.by_stripe_price_id("price_3") is product
+    assert catalog.get("1") is None
+
+
+def test_index_is_read_only():
+    index = CatalogIndex([CatalogProduct(id="1", name="A", stripe_product_id="prod_1", stripe_price_id="price_1")])
+
+    try:
+        index.by_id["2"] = index.by_id["1"]
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("index mappings must be immutable")
+
+
+class SyncSession:
+    """Runs the catalog's queries on a sync SQLite session"""
+
+    def __init__(self, engine):
+        self.session = Session(engine)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.session.close()
+        return False
+
+    async def execute(self, statement):
+        return self.session.execute(statement)
+
+
+@pytest.fixture
+def products_table(monkeypatch):
+    engine = create_engine("sqlite://")
+    Product.__table__.create(engine)
+    monkeypatch.setattr(catalog, "async_session", lambda: SyncSession(engine))
+    monkeypatch.setattr(settings, "stripe_product_1", "prod_settings")
+    monkeypatch.setattr(settings, "stripe_price_1", "price_settings")
+    return engine
+
+
+def add_product(engine, id, active):
+    with Session(engine) as session:
+        session.add(Product(id=id, name=id, stripe_product_id=f"prod_{id}", stripe_price_id=f"price_{id}",
+                            price_amount="1000", active=active))
+        session.commit()
+
+
+@pytest.mark.asyncio
+async def test_empty_table_serves_settings_products(products_table):
+    product_catalog = ProductCatalog()
+    await product_catalog.reload()
+
+    assert product_catalog.index.source == "settings"
+    assert product_catalog.get("1").stripe_product_id == "prod_settings"
+
+
+@pytest.mark.asyncio
+async def test_all_rows_inactive_empties_the_catalog(products_table):
+    add_product(products_table, "3", active=False)
+    product_catalog = ProductCatalog()
+    await product_catalog.reload()
+
+    assert product_catalog.index.source == "database"
+    assert product_catalog.products == ()
+    assert product_catalog.get("1") is None
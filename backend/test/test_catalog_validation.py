@@ -0,0 +1,73 @@
+import asyncio
+
+import httpx
+import pytest
+
+from services import catalog_validation, stripe_service
+from services.catalog import CatalogIndex, CatalogProduct, ProductCatalog
+from services.catalog_validation import CatalogValidator
+from services.stripe_client import HttpxStripeTransport, StripeClient
+
+
+def make_catalog(*products):
+    catalog = ProductCatalog()
+    catalog.index = CatalogIndex(
+        [CatalogProduct(id=id, name=id, stripe_product_id=product, stripe_price_id=price) for id, product, price in products],
+        source="database",
+    )
+    return catalog
+
+
+@pytest.mark.asyncio
+async def test_validate_products_retrieves_each_id_once(monkeypatch):
+    catalog = make_catalog(("1", "prod_1", "price_1"), ("2", "prod_1", "price_2"), ("3", "prod_9", "price_9"))
+    monkeypatch.setattr(stripe_service, "get_product_catalog", lambda: catalog)
+    monkeypatch.setattr(stripe_service, "is_stripe_configured", lambda: True)
+    requested = []
+
+    def handler(request):
+        requested.append(request.url.path)
+        if request.url.path.endswith("_9"):
+            return httpx.Response(404, json={"error": {"type": "invalid_request_error", "code": "resource_missing"}})
+        return httpx.Response(200, json={"id": request.url.path.rsplit("/", 1)[1]})
+
+    client = StripeClient(HttpxStripeTransport(
+        "sk_test_123", api_base="https://stripe.test", http2=False, transport=httpx.MockTransport(handler)
+    ))
+    result = await stripe_service.StripeService(client).validate_products()
+
+    assert sorted(requested) == [
+        "/v1/prices/price_1", "/v1/prices/price_2", "/v1/prices/price_9",
+        "/v1/products/prod_1", "/v1/products/prod_9",
+    ]
+    assert result["products"]["product_2"] == {"id": "prod_1", "exists": True}
+    assert result["prices"]["price_3"] == {"id": "price_9", "exists": False}
+    assert result["all_valid"] is False
+
+
+@pytest.mark.asyncio
+async def test_validator_shares_and_caches_results(monkeypatch):
+    catalog = make_catalog(("1", "prod_1", "price_1"))
+    monkeypatch.setattr(catalog_validation, "get_product_catalog", lambda: catalog)
+    calls = []
+
+    class FakeStripeService:
+        async def validate_products(self):
+            calls.append(catalog.products)
+            await asyncio.sleep(0.01)
+            return {"all_valid": True}
+
+    monkeypatch.setattr(catalog_validation, "StripeService", FakeStripeService)
+    validator = CatalogValidator(ttl=60)
+
+    results = await asyncio.gather(*(validator.get() for _ in range(5)))
+    assert len(calls) == 1 and all(result == {"all_valid": True} for result in results)
+
+    await validator.get()
+    assert len(calls) == 1
+
+    # A catalog change invalidates the cached result
+    catalog.index = CatalogIndex([CatalogProduct(id="2", name="2", stripe_product_id="prod_2", stripe_price_id="price_2")])
+    assert validator.cached() is None
+    await validator.get()
+    assert len(calls) == 2
@@ -0,0 +1,90 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from services.entitlements import EntitlementCache
+from services import stripe_service
+from services.catalog import CatalogIndex, CatalogProduct, ProductCatalog
+from services.stripe_service import payment_intent_entitlement
+from utils.cache import MemoryCacheBackend, RedisCacheBackend
+
+
+class FakeRedis:
+    """Minimal stand-in for redis.asyncio.Redis"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        value, expires_at = self.data.get(key, (None, 0))
+        if value is None or expires_at <= time.monotonic():
+            return None
+        return value
+
+    async def mget(self, keys):
+        return [await self.get(key) for key in keys]
+
+    async def set(self, key, value, px):
+        self.data[key] = (value.encode("utf-8"), time.monotonic() + px / 1000)
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+
+@pytest.fixture(params=["memory", "redis"])
+def cache(request):
+    if request.param == "memory":
+        backend = MemoryCacheBackend(maxsize=100, ttl=60)
+    else:
+        backend = RedisCacheBackend(FakeRedis(), prefix="test:")
+    return EntitlementCache(backend, ttl=60, negative_ttl=0.01)
+
+
+@pytest.mark.asyncio
+async def test_positive_answer_is_cached_until_invalidated(cache):
+    paid_until = datetime.now(timezone.utc) + timedelta(days=1)
+    await cache.set("u1", "1", True, paid_until)
+
+    assert await cache.get("u1", "1") is True
+    await cache.invalidate("u1", "1")
+    assert await cache.get("u1", "1") is None
+    assert cache.stats() == {"hits": 1, "misses": 1}
+
+
+@pytest.mark.asyncio
+async def test_negative_answer_uses_shorter_ttl(cache):
+    await cache.set("u1", "2", False)
+    assert await cache.get("u1", "2") is False
+
+    time.sleep(0.02)
+    assert await cache.get("u1", "2") is None
+
+
+@pytest.mark.asyncio
+async def test_positive_answer_never_outlives_paid_until(cache):
+    expired = datetime.now(timezone.utc) - timedelta(seconds=1)
+    await cache.set("u1", "1", True, expired)
+
+    assert await cache.get("u1", "1") is None
+
+
+@pytest.mark.asyncio
+async def test_get_many_reports_hits_and_misses(cache):
+    cache.negative_ttl = 60
+    await cache.set("u1", "2", False)
+
+    assert await cache.get_many("u1", ["1", "2"]) == {"1": None, "2": False}
+    assert cache.stats() == {"hits": 1, "misses": 1}
+
+
+def test_payment_intent_entitlement_requires_success_metadata_and_a_catalog_product(monkeypatch):
+    catalog = ProductCatalog()
+    catalog.index = CatalogIndex([CatalogProduct(id="1", name="A", stripe_product_id="prod_1", stripe_price_id="price_1")])
+    monkeypatch.setattr(stripe_service, "get_product_catalog", lambda: catalog)
+    payment_intent = {"status": "succeeded", "created": 0, "metadata": {"user_id": "u1", "product_id": "1"}}
+
+    assert payment_intent_entitlement(payment_intent) == ("u1", "1", datetime.fromtimestamp(0, timezone.utc))
+    assert payment_intent_entitlement({**payment_intent, "status": "processing"}) is None
+    assert payment_intent_entitlement({**payment_intent, "metadata": {"user_id": "u1"}}) is None
+    assert payment_intent_entitlement({**payment_intent, "metadata": {"user_id": "u1", "product_id": "9"}}) is None
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from services.health import HealthMonitor
+
+
+async def passing():
+    return True, "ok"
+
+
+async def failing():
+    return False, "down"
+
+
+async def raising():
+    raise ConnectionError("connection refused")
+
+
+async def hanging():
+    await asyncio.sleep(10)
+    return True, "ok"
+
+
+@pytest.mark.asyncio
+async def test_not_ready_until_checked():
+    monitor = HealthMonitor({"database": passing})
+
+    ready, checks = monitor.readiness()
+
+    assert not ready
+    assert checks["database"]["detail"] == "not checked yet"
+
+
+@pytest.mark.asyncio
+async def test_readiness_reports_failures_errors_and_timeouts():
+    monitor = HealthMonitor(
+        {"database": passing, "jwks": failing, "stripe": raising, "slow": hanging}, timeout=0.05
+    )
+
+    await monitor.refresh()
+    ready, checks = monitor.readiness()
+
+    assert not ready
+    assert checks["database"]["healthy"]
+    assert checks["jwks"]["detail"] == "down"
+    assert checks["stripe"]["detail"] == "connection refused"
+    assert checks["slow"]["detail"] == "timed out after 0.05s"
+
+
+@pytest.mark.asyncio
+async def test_stale_results_count_as_failed():
+    monitor = HealthMonitor({"database": passing}, interval=0.01)
+
+    await monitor.refresh()
+    assert monitor.readiness()[0]
+
+    await asyncio.sleep(0.05)
+    ready, checks = monitor.readiness()
+    assert not ready
+    assert checks["database"]["detail"].startswith("stale result")
+
+
+def test_health_stays_200_while_a_dependency_is_down(monkeypatch):
+    monkeypatch.setattr(main.get_health_monitor(), "readiness", lambda: (False, {"stripe": "down"}))
+    client = TestClient(main.app, base_url="http://localhost")
+
+    response = client.get("/health")
+    assert (response.status_code, response.json()) == (200, {"status": "healthy", "version": "2.0.0"})
+    assert client.get("/health/ready").status_code == 503
@@ -0,0 +1,44 @@
+from starlette.requests import Request
+
+from utils.http_cache import CachedJSON, ResponseMemo, etag_matches, weak_etag
+
+
+def make_request(if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def test_weak_etag_changes_with_row_versions():
+    assert weak_etag("orders", "u1", ("a", 1)) == weak_etag("orders", "u1", ("a", 1))
+    assert weak_etag("orders", "u1", ("a", 1)) != weak_etag("orders", "u1", ("a", 2))
+
+
+def test_etag_matches_uses_weak_comparison_over_lists():
+    etag = weak_etag("x")
+    opaque = etag.removeprefix("W/")
+
+    assert etag_matches(make_request(f'"other", {opaque}'), etag)
+    assert etag_matches(make_request("*"), etag)
+    assert not etag_matches(make_request('"other"'), etag)
+    assert not etag_matches(make_request(), etag)
+
+
+def test_cached_json_answers_304_without_body():
+    cached = CachedJSON({"status": "alive"})
+
+    full = cached.response(make_request())
+    assert full.status_code == 200
+    assert full.body == b'{"status":"alive"}'
+
+    response = cached.response(make_request(cached.etag))
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["etag"] == cached.etag
+
+
+def test_response_memo_renders_again_when_key_changes():
+    memo = ResponseMemo(ttl=60)
+    first = memo.set(("prod_1",), {"all_valid": True})
+
+    assert memo.get(("prod_1",)) is first
+    assert memo.get(("prod_2",)) is None
@@ -0,0 +1,71 @@
+import asyncio
+
+import httpx
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk
+
+from utils.jwks import JWKSManager
+
+
+def make_jwk(kid):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    key = jwk.construct(public_pem, "RS256").to_dict()
+    key.update({"kid": kid, "alg": "RS256"})
+    return key
+
+
+class FakeJWKSEndpoint:
+    def __init__(self, keys, cache_control="public, max-age=600"):
+        self.keys = keys
+        self.cache_control = cache_control
+        self.calls = 0
+
+    async def __call__(self, request):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"keys": self.keys}, headers={"Cache-Control": self.cache_control})
+
+
+@pytest.mark.asyncio
+async def test_concurrent_first_requests_share_one_fetch():
+    endpoint = FakeJWKSEndpoint([make_jwk("k1")])
+    manager = JWKSManager("https://kinde.test/jwks", transport=httpx.MockTransport(endpoint))
+
+    keys = await asyncio.gather(*(manager.get_key("k1") for _ in range(20)))
+    await manager.aclose()
+
+    assert endpoint.calls == 1
+    assert all(key is keys[0] for key in keys)
+
+
+@pytest.mark.asyncio
+async def test_unknown_kid_refetches_at_most_once_per_interval():
+    endpoint = FakeJWKSEndpoint([make_jwk("k1")])
+    manager = JWKSManager(
+        "https://kinde.test/jwks", min_refetch_interval=0, transport=httpx.MockTransport(endpoint)
+    )
+    await manager.get_jwks()
+
+    endpoint.keys = [make_jwk("k1"), make_jwk("k2")]
+    assert await manager.get_key("k2") is not None
+    assert endpoint.calls == 2
+
+    manager.min_refetch_interval = 60
+    assert await manager.get_key("unknown") is None
+    assert endpoint.calls == 2
+    await manager.aclose()
+
+
+@pytest.mark.asyncio
+async def test_max_age_is_taken_from_cache_control():
+    endpoint = FakeJWKSEndpoint([make_jwk("k1")], cache_control="max-age=120")
+    manager = JWKSManager("https://kinde.test/jwks", transport=httpx.MockTransport(endpoint))
+    await manager.get_jwks()
+
+    assert 110 < manager.stats()["expires_in"] <= 120
+    await manager.aclose()
@@ -0,0 +1,66 @@
+import json
+import logging
+import queue
+import sys
+
+from utils.logger import JsonFormatter, SamplingFilter, _DeferredQueueHandler, parse_sample_rates
+
+
+def make_record(name, level=logging.INFO, msg="Order %s fulfilled", args=(42,), **extra):
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_renders_message_and_extra_fields():
+    entry = json.loads(JsonFormatter().format(make_record("routers.payments", user_id="kp_1")))
+
+    assert entry["message"] == "Order 42 fulfilled"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "routers.payments"
+    assert entry["user_id"] == "kp_1"
+
+
+def test_sampling_filter_applies_to_child_loggers_and_keeps_warnings():
+    sampler = SamplingFilter({"utils.auth": 0.0})
+
+    assert not sampler.filter(make_record("utils.auth.jwks"))
+    assert sampler.filter(make_record("utils.auth", level=logging.WARNING))
+    assert sampler.filter(make_record("routers.payments"))
+
+
+def test_parse_sample_rates():
+    assert parse_sample_rates(" utils.auth=0.01, routers.payments=0.5,") == {
+        "utils.auth": 0.01,
+        "routers.payments": 0.5,
+    }
+    assert parse_sample_rates("") == {}
+
+
+def test_queued_records_keep_immutable_args_unformatted():
+    record = _DeferredQueueHandler(queue.SimpleQueue()).prepare(make_record("routers.payments"))
+
+    assert (record.msg, record.args) == ("Order %s fulfilled", (42,))
+
+
+def test_queued_records_freeze_mutable_args():
+    metadata = {"product_id": "1"}
+    original = make_record("routers.payments", msg="Checkout %s: %s", args=("cs_1", metadata))
+    record = _DeferredQueueHandler(queue.SimpleQueue()).prepare(original)
+    metadata["product_id"] = "2"
+
+    assert (record.msg, record.args) == ("Checkout cs_1: {'product_id': '1'}", None)
+    assert original.args == ("cs_1", metadata)
+
+
+def test_queued_records_carry_the_traceback_as_text():
+    try:
+        raise ValueError("bad payload")
+    except ValueError:
+        record = make_record("routers.payments", level=logging.ERROR)
+        record.exc_info = sys.exc_info()
+    record = _DeferredQueueHandler(queue.SimpleQueue()).prepare(record)
+
+    assert record.exc_info is None
+    assert "ValueError: bad payload" in json.loads(JsonFormatter().format(record))["exception"]
+    assert "ValueError: bad payload" in logging.Formatter().format(record)
@@ -0,0 +1,77 @@
+import asyncio
+import threading
+
+import pytest
+
+from utils.metrics import Counter, Histogram, StatsGauge, timed
+
+
+def test_counter_merges_increments_from_every_thread():
+    counter = Counter("jobs_total", "Jobs", ("queue",), registry=None)
+
+    def work():
+        for _ in range(1000):
+            counter.inc("default")
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.values() == {("default",): 4000.0}
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0), registry=None)
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(5.0, "/a")
+
+    lines = histogram.render()
+
+    assert "# TYPE latency_seconds histogram" in lines
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{route="/a"} 3' in lines
+
+
+def test_label_values_are_escaped():
+    counter = Counter("odd_total", "Odd labels", ("value",), registry=None)
+    counter.inc('say "hi"\n')
+
+    assert counter.render()[-1] == 'odd_total{value="say \\"hi\\"\\n"} 1.0'
+
+
+@pytest.mark.asyncio
+async def test_timed_records_errors_separately():
+    histogram = Histogram("calls_seconds", "Calls", ("operation", "outcome"), registry=None)
+
+    @timed(histogram, "fetch")
+    async def fetch(fail: bool) -> str:
+        await asyncio.sleep(0)
+        if fail:
+            raise ValueError("boom")
+        return "ok"
+
+    assert await fetch(False) == "ok"
+    with pytest.raises(ValueError):
+        await fetch(True)
+
+    assert set(histogram._merged()) == {("fetch", "ok"), ("fetch", "error")}
+
+
+def test_stats_gauge_flattens_numeric_values():
+    gauge = StatsGauge("app_stats", "Stats", lambda: {
+        "cache": {"hits": 3, "misses": 1},
+        "pool": {"pool": "QueuePool", "size": 5},
+        "jwks": None,
+    }, registry=None)
+
+    lines = gauge.render()
+
+    assert "# TYPE app_stats gauge" in lines
+    assert 'app_stats{stat="cache.hits"} 3.0' in lines
+    assert 'app_stats{stat="pool.size"} 5.0' in lines
+    assert not any("QueuePool" in line or "jwks" in line for line in lines)
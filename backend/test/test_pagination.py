@@ -0,0 +1,123 @@
+import base64
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+
+from models.orders import Order
+from models.users import User
+from routers.payments import _orders_query, get_user_orders
+from routers.users import get_all_users
+from utils.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+
+
+def raw_cursor(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode("utf-8")).decode("ascii")
+
+
+class SyncSessionAdapter:
+    """Runs an async route's statements on a sync session"""
+
+    def __init__(self, session):
+        self.session = session
+
+    async def execute(self, statement):
+        return self.session.execute(statement)
+
+
+@pytest.fixture
+def users_db():
+    engine = create_engine("sqlite://")
+    User.__table__.create(engine)
+    with Session(engine) as session:
+        session.add_all(User(id=f"user_{i:02d}") for i in range(5))
+        session.commit()
+        yield SyncSessionAdapter(session)
+
+
+def test_cursor_round_trips():
+    cursor = encode_cursor("2026-10-18T09:00:00+00:00", "0b7c5c1e-1d7a-4c8e-9a55-3f0f4f1f2d11")
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor, 2) == ["2026-10-18T09:00:00+00:00", "0b7c5c1e-1d7a-4c8e-9a55-3f0f4f1f2d11"]
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", raw_cursor({"id": "x"}), raw_cursor(["a", "b"]), "bm90IGpzb24"])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(HTTPException) as excinfo:
+        decode_cursor(cursor, 1)
+    assert excinfo.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_users_are_paged_by_id(users_db):
+    pages, cursor = [], None
+    while True:
+        response = Response()
+        page = await get_all_users(response, limit=2, cursor=cursor, stream=False, db=users_db, user_id="me")
+        pages.append([user["id"] for user in page])
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            break
+
+    assert pages == [["user_00", "user_01"], ["user_02", "user_03"], ["user_04"]]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("value", [{}, 1, None])
+async def test_users_cursor_must_hold_a_string(users_db, value):
+    with pytest.raises(HTTPException) as excinfo:
+        await get_all_users(Response(), limit=2, cursor=raw_cursor([value]), stream=False, db=users_db, user_id="me")
+    assert excinfo.value.status_code == 400
+
+
+@pytest.mark.parametrize("values", [[{}, "x"], ["2026-10-18T09:00:00", {}], ["yesterday", str(uuid.uuid4())]])
+def test_orders_cursor_must_hold_a_timestamp_and_uuid(values):
+    with pytest.raises(HTTPException) as excinfo:
+        _orders_query("user_1", raw_cursor(values))
+    assert excinfo.value.status_code == 400
+
+
+class FakeOrdersSession:
+    """Returns the given orders to the page query and records it"""
+
+    def __init__(self, orders):
+        self.orders = orders
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        orders = self.orders[:statement._limit]
+
+        class Result:
+            def scalars(self):
+                return self
+
+            def all(self):
+                return orders
+        return Result()
+
+
+@pytest.mark.asyncio
+async def test_orders_next_cursor_starts_after_the_last_row():
+    now = datetime.now(timezone.utc)
+    orders = [
+        Order(id=uuid.uuid4(), session_id=f"cs_{i}", user_id="user_1", product_id="1", fulfilled=True,
+              created_at=now - timedelta(minutes=i), updated_at=now)
+        for i in range(3)
+    ]
+    request = Request({"type": "http", "method": "GET", "path": "/", "headers": []})
+
+    response = await get_user_orders(request, limit=2, cursor=None, stream=False, user_id="user_1", db=FakeOrdersSession(orders))
+
+    assert [row["id"] for row in json.loads(response.body)] == [str(order.id) for order in orders[:2]]
+    cursor = response.headers[NEXT_CURSOR_HEADER]
+    assert decode_cursor(cursor, 2) == [orders[1].created_at.isoformat(), str(orders[1].id)]
+
+    params = _orders_query("user_1", cursor).compile().params
+    assert orders[1].created_at in params.values() and orders[1].id in params.values()
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from services.payment_log_writer import PaymentLogWriter
+
+
+class RecordingWriter(PaymentLogWriter):
+    """Records batches instead of inserting them; flushes wait for `release` when set"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.flushed = []
+        self.release = None
+
+    async def _flush(self, batch):
+        if self.release is not None:
+            await self.release.wait()
+        self.flushed.append([values["event_id"] for values, _ in batch])
+        for values, future in batch:
+            future.set_result(values["id"])
+
+
+@pytest.mark.asyncio
+async def test_concurrent_writes_share_one_batch():
+    writer = RecordingWriter(batch_size=10, flush_interval=0.05)
+    writer.start()
+
+    ids = await asyncio.gather(*(writer.write({"event_id": f"evt_{i}"}) for i in range(5)))
+    await writer.stop()
+
+    assert writer.flushed == [[f"evt_{i}" for i in range(5)]]
+    assert len(set(ids)) == 5
+
+
+@pytest.mark.asyncio
+async def test_full_queue_makes_writers_wait():
+    writer = RecordingWriter(batch_size=1, flush_interval=0, maxsize=1)
+    writer.release = asyncio.Event()
+    writer.start()
+
+    first = asyncio.ensure_future(writer.write({"event_id": "evt_1"}))
+    await asyncio.sleep(0.01)  # taken by the flusher, which waits for release
+    second = asyncio.ensure_future(writer.write({"event_id": "evt_2"}))
+    third = asyncio.ensure_future(writer.write({"event_id": "evt_3"}))
+    await asyncio.sleep(0.01)
+
+    assert writer.stats()["queued"] == 1
+    assert not first.done() and not third.done()
+
+    writer.release.set()
+    await asyncio.gather(first, second, third)
+    await writer.stop()
+    assert writer.flushed == [["evt_1"], ["evt_2"], ["evt_3"]]
+
+
+@pytest.mark.asyncio
+async def test_stop_flushes_queued_rows():
+    writer = RecordingWriter(batch_size=100, flush_interval=10)
+    writer.start()
+
+    pending = [asyncio.ensure_future(writer.write({"event_id": f"evt_{i}"})) for i in range(3)]
+    await asyncio.sleep(0.01)
+    await writer.stop()
+
+    assert all(future.done() and future.result() for future in pending)
+    assert writer.flushed == [["evt_0", "evt_1", "evt_2"]]
+
+    with pytest.raises(RuntimeError):
+        await writer.write({"event_id": "evt_late"})
+
+
+@pytest.mark.asyncio
+async def test_writes_left_after_a_stop_timeout_fail_instead_of_hanging():
+    writer = RecordingWriter(batch_size=1, flush_interval=0, maxsize=1)
+    writer.release = asyncio.Event()  # never set: the first flush hangs
+    writer.start()
+
+    first = asyncio.ensure_future(writer.write({"event_id": "evt_1"}))
+    await asyncio.sleep(0.01)
+    second = asyncio.ensure_future(writer.write({"event_id": "evt_2"}))
+    third = asyncio.ensure_future(writer.write({"event_id": "evt_3"}))  # waits for queue space
+    await asyncio.sleep(0.01)
+
+    await writer.stop(timeout=0.05)
+
+    for future in (first, second, third):
+        with pytest.raises(RuntimeError):
+            await asyncio.wait_for(future, 1)
@@ -0,0 +1,128 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from services import payment_reconciliation, stripe_service
+from services.catalog import CatalogIndex, CatalogProduct, ProductCatalog
+from services.payment_reconciliation import PaymentReconciler
+
+
+class LeaseSession:
+    """Answers the lease claim as if `claimed`, recording the statements"""
+
+    def __init__(self, claimed):
+        self.claimed = claimed
+        self.statements = []
+        self.commits = 0
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        return SimpleNamespace(scalar_one_or_none=lambda: payment_reconciliation.SYNC_NAME if self.claimed else None)
+
+    async def commit(self):
+        self.commits += 1
+
+
+class UnusedClient:
+    def iter_payment_intents(self, **params):
+        raise AssertionError("Stripe must not be called without the lease")
+
+
+@pytest.mark.asyncio
+async def test_run_is_skipped_while_another_worker_holds_the_lease(monkeypatch):
+    session = LeaseSession(claimed=False)
+    monkeypatch.setattr(payment_reconciliation, "async_session", session)
+    reconciler = PaymentReconciler(client=UnusedClient())
+
+    assert await reconciler.run() == 0
+    assert reconciler.runs == 0
+
+
+@pytest.mark.asyncio
+async def test_lease_is_claimed_in_a_committed_conditional_upsert(monkeypatch):
+    session = LeaseSession(claimed=True)
+    monkeypatch.setattr(payment_reconciliation, "async_session", session)
+
+    assert await PaymentReconciler(interval=300)._claim()
+    assert session.commits == 1
+    sql = str(session.statements[0].compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (name) DO UPDATE SET updated_at = now() WHERE sync_state.updated_at < now() - " in sql
+    assert "RETURNING sync_state.name" in sql
+
+
+class FakeClient:
+    """Lists the given PaymentIntents created at or after created["gte"]"""
+
+    def __init__(self, payment_intents):
+        self.payment_intents = payment_intents
+        self.listed_since = []
+
+    async def iter_payment_intents(self, created, limit):
+        self.listed_since.append(created["gte"])
+        for payment_intent in self.payment_intents:
+            if payment_intent["created"] >= created["gte"]:
+                yield dict(payment_intent)
+
+
+@pytest.fixture
+def reconciler_state(monkeypatch):
+    """Keeps the high-water mark and granted entitlements in memory"""
+    catalog = ProductCatalog()
+    catalog.index = CatalogIndex([CatalogProduct(id="1", name="A", stripe_product_id="prod_1", stripe_price_id="price_1")])
+    monkeypatch.setattr(stripe_service, "get_product_catalog", lambda: catalog)
+    state = {"position": int(time.time()) - 3600, "granted": []}
+
+    async def load_position(self):
+        return state["position"]
+
+    async def save_position(self, position):
+        state["position"] = max(state["position"], position)
+
+    async def grant(self, entitlements):
+        state["granted"].extend(entitlements)
+
+    monkeypatch.setattr(PaymentReconciler, "_load_position", load_position)
+    monkeypatch.setattr(PaymentReconciler, "_save_position", save_position)
+    monkeypatch.setattr(PaymentReconciler, "_grant", grant)
+    return state
+
+
+def payment_intent(id, created, status):
+    return {"id": id, "created": created, "status": status, "metadata": {"user_id": f"user_{id}", "product_id": "1"}}
+
+
+@pytest.mark.asyncio
+async def test_pending_payment_intent_that_later_succeeds_is_granted(reconciler_state):
+    start = reconciler_state["position"]
+    pending = payment_intent("a", start + 10, "processing")
+    client = FakeClient([pending, payment_intent("b", start + 20, "succeeded")])
+    reconciler = PaymentReconciler(client=client)
+
+    assert await reconciler._reconcile() == 1
+    assert reconciler_state["position"] == start + 10
+
+    pending["status"] = "succeeded"
+    assert await reconciler._reconcile() == 2
+    assert sorted(user_id for user_id, _, _ in reconciler_state["granted"]) == ["user_a", "user_b", "user_b"]
+    assert reconciler_state["position"] == start + 20
+
+
+@pytest.mark.asyncio
+async def test_abandoned_payment_intent_does_not_hold_the_mark(reconciler_state):
+    start = reconciler_state["position"]
+    client = FakeClient([payment_intent("a", start + 10, "requires_payment_method"), payment_intent("b", start + 20, "canceled")])
+    reconciler = PaymentReconciler(max_pending_age=60, client=client)
+
+    assert await reconciler._reconcile() == 0
+    assert reconciler_state["position"] == start + 20
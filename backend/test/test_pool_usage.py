@@ -0,0 +1,60 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+from utils.pool_usage import TimedQueuePool, get_pool_stats, get_pool_usage_stats, instrument_pool, track_connections
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=TimedQueuePool,
+        pool_size=2,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    yield engine
+    engine.dispose()
+
+
+def test_timed_pool_counts_checkouts_waits_and_timeouts(engine):
+    with engine.connect() as conn, engine.connect():
+        conn.execute(text("SELECT 1"))
+        stats = get_pool_stats(engine)
+        assert (stats["pool"], stats["size"], stats["checked_out"]) == ("TimedQueuePool", 2, 2)
+
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+
+    stats = get_pool_stats(engine)
+    assert stats["checkouts"] == 3
+    assert stats["timeouts"] == 1
+    assert stats["checked_in"] == 2
+    assert stats["wait_max_ms"] >= 50
+    assert 0 < stats["wait_avg_ms"] <= stats["wait_max_ms"]
+
+
+def test_track_connections_records_the_peak_held(engine):
+    instrument_pool(engine)
+
+    with track_connections("test_peak") as usage:
+        with engine.connect(), engine.connect():
+            assert usage.held == 2
+        assert usage.held == 0
+        with engine.connect():
+            pass
+    with track_connections("test_peak"):
+        pass
+
+    assert usage.peak == 2
+    assert get_pool_usage_stats()["test_peak"] == {"count": 2, "max_held": 2, "by_peak_held": {"0": 1, "2": 1}}
+
+
+def test_connections_outside_a_tracked_block_are_not_counted(engine):
+    instrument_pool(engine)
+
+    with engine.connect():
+        with track_connections("test_untracked") as usage:
+            pass
+
+    assert usage.peak == 0
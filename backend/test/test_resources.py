@@ -0,0 +1,61 @@
+import threading
+
+import pytest
+
+from utils.resources import ResourceRegistry
+
+
+def test_resources_are_built_once_on_first_use():
+    registry = ResourceRegistry()
+    built = []
+    registry.register("client", lambda: built.append(object()) or built[-1])
+
+    assert not registry.is_built("client")
+    assert not built
+
+    instances = []
+    threads = [threading.Thread(target=lambda: instances.append(registry.get("client"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(built) == 1
+    assert all(instance is built[0] for instance in instances)
+    assert registry.is_built("client")
+
+
+@pytest.mark.asyncio
+async def test_aclose_closes_in_reverse_build_order_and_survives_errors():
+    registry = ResourceRegistry()
+    closed = []
+
+    async def close_async(name):
+        closed.append(name)
+
+    def close_failing(name):
+        closed.append(name)
+        raise RuntimeError("boom")
+
+    registry.register("engine", lambda: "engine", close=close_async)
+    registry.register("client", lambda: "client", close=close_failing)
+    registry.register("unused", lambda: "unused", close=closed.append)
+    registry.get("engine")
+    registry.get("client")
+
+    await registry.aclose()
+
+    assert closed == ["client", "engine"]
+    assert not registry.is_built("engine") and not registry.is_built("client")
+
+
+@pytest.mark.asyncio
+async def test_closed_resource_is_rebuilt_on_next_use():
+    registry = ResourceRegistry()
+    registry.register("cache", dict, close=lambda cache: cache.clear())
+    first = registry.get("cache")
+
+    await registry.close("cache")
+    await registry.close("cache")  # no-op once closed
+
+    assert registry.get("cache") is not first
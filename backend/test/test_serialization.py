@@ -0,0 +1,43 @@
+import json
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+from models.orders import Order, PaymentLog, payment_log_serializer
+from utils import serialization
+from utils.serialization import RowSerializer, dumps
+
+
+def make_order():
+    now = datetime(2026, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc)
+    return Order(
+        id=uuid.uuid4(), session_id="cs_1", user_id="u1", items=None, customer_id=None,
+        product_id="1", stripe_product_id="prod_1", fulfilled=True, payment_status="paid",
+        amount_total="1999", currency="eur", created_at=now, updated_at=now,
+    )
+
+
+def test_row_serializer_matches_to_dict_once_encoded():
+    order = make_order()
+
+    assert json.loads(dumps(RowSerializer(Order)(order))) == order.to_dict()
+
+
+def test_stdlib_fallback_matches_orjson(monkeypatch):
+    pytest.importorskip("orjson")
+    content = RowSerializer(Order)(make_order())
+    fast = dumps(content)
+
+    monkeypatch.setattr(serialization, "orjson", None)
+    assert json.loads(dumps(content)) == json.loads(fast)
+
+
+def test_row_serializer_excludes_columns_and_reads_unloaded_attributes():
+    log = PaymentLog(event_type="checkout.session.completed", event_id="evt_1")
+
+    serialized = payment_log_serializer(log)
+
+    assert "raw_payload" not in serialized
+    assert serialized["event_id"] == "evt_1"
+    assert serialized["created_at"] is None
@@ -0,0 +1,76 @@
+import httpx
+import pytest
+import stripe
+
+from services.stripe_client import HttpxStripeTransport, StripeClient, _encode_params
+
+
+def make_client(handler):
+    transport = HttpxStripeTransport(
+        "sk_test_123",
+        api_base="https://stripe.test",
+        http2=False,
+        transport=httpx.MockTransport(handler),
+    )
+    return StripeClient(transport)
+
+
+def test_encode_params_flattens_nested_values():
+    encoded = list(_encode_params({
+        "line_items": [{"price": "price_1", "quantity": 2}],
+        "metadata": {"user_id": "u1"},
+        "expand": ["line_items"],
+        "customer": None,
+    }))
+    assert encoded == [
+        ("line_items[0][price]", "price_1"),
+        ("line_items[0][quantity]", 2),
+        ("metadata[user_id]", "u1"),
+        ("expand[0]", "line_items"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_create_checkout_session_posts_form_and_returns_stripe_object():
+    def handler(request):
+        assert request.method == "POST"
+        assert request.url.path == "/v1/checkout/sessions"
+        assert request.headers["Authorization"] == "Bearer sk_test_123"
+        assert b"line_items%5B0%5D%5Bprice%5D=price_1" in request.content
+        return httpx.Response(200, json={"id": "cs_1", "object": "checkout.session", "url": "https://pay"})
+
+    client = make_client(handler)
+    session = await client.create_checkout_session(line_items=[{"price": "price_1", "quantity": 1}])
+    await client.aclose()
+
+    assert session.id == "cs_1"
+    assert session["url"] == "https://pay"
+
+
+@pytest.mark.asyncio
+async def test_error_responses_raise_stripe_errors():
+    def handler(request):
+        return httpx.Response(404, json={"error": {"type": "invalid_request_error", "message": "No such session"}})
+
+    client = make_client(handler)
+    with pytest.raises(stripe.error.InvalidRequestError):
+        await client.retrieve_checkout_session("cs_missing", expand=["line_items"])
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_iter_payment_intents_follows_pages():
+    pages = {
+        None: {"object": "list", "has_more": True, "data": [{"id": "pi_3"}, {"id": "pi_2"}]},
+        "pi_2": {"object": "list", "has_more": False, "data": [{"id": "pi_1"}]},
+    }
+
+    def handler(request):
+        assert request.url.params["created[gte]"] == "100"
+        return httpx.Response(200, json=pages[request.url.params.get("starting_after")])
+
+    client = make_client(handler)
+    ids = [payment_intent.id async for payment_intent in client.iter_payment_intents(created={"gte": 100}, limit=2)]
+    await client.aclose()
+
+    assert ids == ["pi_3", "pi_2", "pi_1"]
@@ -0,0 +1,130 @@
+import json
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from config import settings
+from models.orders import PaymentLog
+from services import stripe_service
+from services.webhook_queue import decode_event_payload, encode_event_payload
+
+EVENT = {
+    "id": "evt_1",
+    "type": "checkout.session.completed",
+    "created": 1700000000,
+    "data": {
+        "object": {
+            "id": "cs_1",
+            "client_reference_id": "user_1",
+            "payment_status": "paid",
+            "metadata": {"product_id": "1"},
+            "custom_text": {"submit": None},
+            "shipping_options": [],
+        }
+    },
+}
+BODY = json.dumps(EVENT).encode("utf-8")
+
+
+@pytest.fixture
+def storage_mode(monkeypatch):
+    def set_mode(mode):
+        monkeypatch.setattr(settings, "webhook_payload_storage", mode)
+    return set_mode
+
+
+def test_compact_mode_keeps_only_processed_fields(storage_mode):
+    storage_mode("compact")
+    event_data, raw_payload = encode_event_payload(EVENT, BODY)
+
+    assert raw_payload is None
+    assert event_data["data"]["object"] == {
+        "id": "cs_1",
+        "client_reference_id": "user_1",
+        "payment_status": "paid",
+        "metadata": {"product_id": "1"},
+    }
+    assert event_data["type"] == "checkout.session.completed"
+
+
+def test_compressed_mode_round_trips_the_raw_body(storage_mode):
+    storage_mode("compressed")
+    event_data, raw_payload = encode_event_payload(EVENT, BODY)
+
+    assert event_data is None
+    assert decode_event_payload(PaymentLog(event_data=event_data, raw_payload=raw_payload)) == EVENT
+
+
+@pytest.mark.parametrize("mode", ["compact", "compressed"])
+def test_payloads_are_stored_on_sqlite(storage_mode, mode):
+    storage_mode(mode)
+    engine = create_engine("sqlite://")
+    PaymentLog.__table__.create(engine)
+    event_data, raw_payload = encode_event_payload(EVENT, BODY)
+
+    with Session(engine) as session:
+        session.add(PaymentLog(event_id="evt_1", event_type="checkout.session.completed",
+                               event_data=event_data, raw_payload=raw_payload))
+        session.commit()
+        log = session.query(PaymentLog).one()
+
+        assert decode_event_payload(log)["data"]["object"]["id"] == "cs_1"
+        assert log.event_data == event_data
+
+
+def test_unknown_mode_is_rejected(storage_mode):
+    storage_mode("everything")
+
+    with pytest.raises(ValueError):
+        encode_event_payload(EVENT, BODY)
+
+
+class RecordingSession:
+    """Records the statements process_event executes"""
+
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+
+        class Result:
+            rowcount = 1
+        return Result()
+
+
+async def process_compact(monkeypatch, event):
+    monkeypatch.setattr(stripe_service, "is_stripe_configured", lambda: True)
+    monkeypatch.setattr(settings, "webhook_payload_storage", "compact")
+    event_data, _ = encode_event_payload(event, json.dumps(event).encode("utf-8"))
+    db = RecordingSession()
+    await stripe_service.StripeService(client=object()).process_event(db, event_data)
+    (statement,) = db.statements
+    return statement.compile().params
+
+
+@pytest.mark.asyncio
+async def test_compact_product_updated_event_syncs_status_and_name(monkeypatch):
+    params = await process_compact(monkeypatch, {
+        "id": "evt_2",
+        "type": "product.updated",
+        "data": {"object": {"id": "prod_1", "object": "product", "active": False, "name": "Pro", "description": "New"}},
+    })
+
+    assert params["active"] is False
+    assert params["name"] == "Pro"
+    assert params["description"] == "New"
+
+
+@pytest.mark.asyncio
+async def test_compact_price_updated_event_syncs_amount(monkeypatch):
+    params = await process_compact(monkeypatch, {
+        "id": "evt_3",
+        "type": "price.updated",
+        "data": {"object": {"id": "price_1", "object": "price", "active": True, "unit_amount": 2500, "currency": "eur"}},
+    })
+
+    assert params["price_amount"] == "2500"
+    assert params["currency"] == "eur"
+    assert params["active"] is True
@@ -0,0 +1,279 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from config import settings
+from services import payment_log_writer, webhook_queue
+from services.payment_log_writer import PaymentLogWriter
+from services.webhook_queue import WebhookQueue, enqueue_event
+from utils.cache import TTLCache
+
+
+class FakeDatabase:
+    """payment_logs rows in memory, served through sessions like async_session()'s"""
+
+    def __init__(self):
+        self.rows = {}
+        self.open_sessions = 0
+
+    def add(self, session_id, event_type="checkout.session.completed", attempts=0, processed=False):
+        log_id = uuid.uuid4()
+        self.rows[log_id] = SimpleNamespace(
+            id=log_id,
+            event_id=f"evt_{len(self.rows)}",
+            event_type=event_type,
+            session_id=session_id,
+            event_data={"id": f"evt_{len(self.rows)}", "type": event_type, "log_id": log_id},
+            raw_payload=None,
+            processed=processed,
+            attempts=attempts,
+            error_message=None,
+            order=len(self.rows),
+        )
+        return log_id
+
+    def __call__(self):
+        return FakeSession(self)
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalar_one_or_none(self):
+        return self.rows[0] if self.rows else None
+
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    def __init__(self, database):
+        self.database = database
+
+    async def __aenter__(self):
+        self.database.open_sessions += 1
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.database.open_sessions -= 1
+        return False
+
+    def begin_nested(self):
+        return self
+
+    async def commit(self):
+        pass
+
+    async def execute(self, statement):
+        params = statement.compile().params
+        if len(statement.selected_columns) == 2:
+            # sweep(): (id, session_id) of rows still to process, oldest first
+            rows = sorted(
+                (row for row in self.database.rows.values() if not row.processed and row.attempts < params["attempts_1"]),
+                key=lambda row: row.order,
+            )
+            return FakeResult([(row.id, row.session_id) for row in rows])
+        row = self.database.rows.get(params["id_1"])
+        return FakeResult([row] if row is not None and not row.processed else [])
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr(webhook_queue, "async_session", database)
+    return database
+
+
+@pytest.fixture
+def processed(monkeypatch):
+    """Log IDs in the order process_event saw them; IDs in `failing` raise"""
+    seen = []
+    failing = set()
+    fetches = []
+
+    class FakeStripeService:
+        async def fetch_event_objects(self, event):
+            fetches.append(webhook_queue.async_session.open_sessions)
+            if event["type"] == "fetch.failing":
+                raise ConnectionError("stripe unavailable")
+            return {"log_id": event["log_id"]}
+
+        async def process_event(self, db, event, fetched):
+            assert fetched == {"log_id": event["log_id"]}
+            seen.append(event["log_id"])
+            await asyncio.sleep(0.001)
+            if event["log_id"] in failing:
+                raise RuntimeError("boom")
+            return []
+
+    monkeypatch.setattr(webhook_queue, "StripeService", FakeStripeService)
+    return SimpleNamespace(seen=seen, failing=failing, fetches=fetches)
+
+
+def test_ordering_key_selects_one_shard():
+    queue = WebhookQueue(concurrency=4, maxsize=10)
+
+    for _ in range(3):
+        assert queue.submit(uuid.uuid4(), "cs_1")
+
+    assert sorted(shard.qsize() for shard in queue._shards) == [0, 0, 0, 3]
+
+
+def test_full_shard_and_duplicate_submissions():
+    queue = WebhookQueue(concurrency=1, maxsize=1)
+    log_id = uuid.uuid4()
+
+    assert queue.submit(log_id, "cs_1")
+    assert queue.submit(log_id, "cs_1")  # already queued
+    assert not queue.submit(uuid.uuid4(), "cs_1")
+    assert queue.stats()["queued"] == [1]
+
+
+@pytest.mark.asyncio
+async def test_events_of_one_session_are_processed_in_order(database, processed):
+    queue = WebhookQueue(concurrency=4, maxsize=100)
+    log_ids = [database.add("cs_1") for _ in range(20)]
+    queue.start()
+
+    for log_id in log_ids:
+        queue.submit(log_id, "cs_1")
+    await queue.stop()
+
+    assert processed.seen == log_ids
+    assert all(database.rows[log_id].processed for log_id in log_ids)
+
+
+@pytest.mark.asyncio
+async def test_sweep_submits_unclaimed_rows_below_max_attempts(database):
+    queue = WebhookQueue(concurrency=2, maxsize=100, max_attempts=3)
+    waiting = database.add("cs_1")
+    database.add("cs_2", attempts=3)
+    database.add("cs_3", processed=True)
+    queued = database.add("cs_4")
+    queue.submit(queued, "cs_4")
+
+    assert await queue.sweep() == 1
+    assert waiting in queue._pending
+    assert await queue.sweep() == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_event_is_retried_before_later_events_of_its_session(database, processed):
+    queue = WebhookQueue(concurrency=1, maxsize=100, max_attempts=3, retry_delay=0.001)
+    failing, later = database.add("cs_1"), database.add("cs_1")
+    processed.failing.add(failing)
+    queue.start()
+
+    queue.submit(failing, "cs_1")
+    queue.submit(later, "cs_1")
+    await queue.stop()
+
+    assert processed.seen == [failing, failing, failing, later]
+    row = database.rows[failing]
+    assert (row.processed, row.attempts, row.error_message) == (False, 3, "boom")
+    assert database.rows[later].processed
+    assert await queue.sweep() == 0
+
+
+@pytest.mark.asyncio
+async def test_stripe_is_called_with_no_session_open(database, processed):
+    queue = WebhookQueue(concurrency=1, maxsize=100)
+    log_id = database.add("cs_1")
+
+    assert not await queue._process(log_id)
+    assert processed.fetches == [0]
+    assert database.rows[log_id].processed
+
+
+@pytest.mark.asyncio
+async def test_failed_fetch_counts_as_an_attempt(database, processed):
+    queue = WebhookQueue(concurrency=1, maxsize=100, max_attempts=3)
+    log_id = database.add("cs_1", event_type="fetch.failing")
+
+    assert await queue._process(log_id)
+    row = database.rows[log_id]
+    assert (row.processed, row.attempts, row.error_message) == (False, 1, "stripe unavailable")
+    assert processed.seen == []
+
+
+class FakeWriter:
+    """Stands in for the payment log writer; event IDs in `existing` conflict"""
+
+    def __init__(self, existing=()):
+        self.existing = set(existing)
+        self.writes = []
+
+    async def write(self, values):
+        self.writes.append(values)
+        return None if values["event_id"] in self.existing else uuid.uuid4()
+
+
+@pytest.fixture
+def enqueue(monkeypatch):
+    writer, queue = FakeWriter(), WebhookQueue(concurrency=1)
+    monkeypatch.setattr(webhook_queue, "_recent_event_ids", TTLCache(maxsize=100, ttl=60))
+    monkeypatch.setattr(webhook_queue, "get_payment_log_writer", lambda: writer)
+    monkeypatch.setattr(webhook_queue, "get_webhook_queue", lambda: queue)
+    monkeypatch.setattr(settings, "webhook_payload_storage", "full")
+    return SimpleNamespace(writer=writer, queue=queue)
+
+
+def make_event(event_id):
+    return {"id": event_id, "type": "checkout.session.completed", "data": {"object": {"id": "cs_1"}}}
+
+
+@pytest.mark.asyncio
+async def test_recently_seen_event_skips_the_database(enqueue):
+    assert await enqueue_event(make_event("evt_1"), b"{}")
+    assert not await enqueue_event(make_event("evt_1"), b"{}")
+
+    assert len(enqueue.writer.writes) == 1
+    assert enqueue.queue.stats()["queued"] == [1]
+
+
+@pytest.mark.asyncio
+async def test_event_already_stored_is_not_queued(enqueue):
+    enqueue.writer.existing.add("evt_1")
+
+    assert not await enqueue_event(make_event("evt_1"), b"{}")
+    assert enqueue.queue.stats()["queued"] == [0]
+    # Remembered, so the next retry does not reach the database
+    assert not await enqueue_event(make_event("evt_1"), b"{}")
+    assert len(enqueue.writer.writes) == 1
+
+
+@pytest.mark.asyncio
+async def test_writer_returns_none_for_conflicting_event_ids(monkeypatch):
+    statements = []
+
+    class Session:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc_info):
+            return False
+
+        async def execute(self, statement):
+            statements.append(statement)
+            # ON CONFLICT DO NOTHING returns only the new row
+            return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: [new_id]))
+
+        async def commit(self):
+            pass
+
+    new_id = uuid.uuid4()
+    monkeypatch.setattr(payment_log_writer, "async_session", Session)
+    writer = PaymentLogWriter(batch_size=10, flush_interval=0.05)
+    writer.start()
+
+    new, existing = await asyncio.gather(
+        writer.write({"event_id": "evt_new", "id": new_id}), writer.write({"event_id": "evt_old"})
+    )
+    await writer.stop()
+
+    assert (new, existing) == (new_id, None)
+    assert "ON CONFLICT (event_id) DO NOTHING" in str(statements[0].compile(dialect=postgresql.dialect()))
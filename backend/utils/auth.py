@@ -1,12 +1,18 @@
 """
 Authentication utilities for Kinde integration
 """
-import httpx
+import hashlib
+import time
 from typing import Optional, Dict, Any
 from fastapi import HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
-from config import settings, kinde_configured
+from jose.backends.base import Key
+from config import settings, is_kinde_configured
+from utils.cache import TTLCache
+from utils.jwks import JWKSManager
+from utils.metrics import AUTH_SECONDS, timed
+from utils.resources import registry
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,43 +20,55 @@ logger = logging.getLogger(__name__)
 # Security scheme
 security = HTTPBearer()
 
-# Cache for Kinde public keys
-_kinde_public_keys: Optional[Dict[str, Any]] = None
+# Verified token payloads by token hash, each kept until the token expires
+_token_cache = TTLCache(
+    maxsize=settings.auth_token_cache_size,
+    ttl=settings.auth_token_cache_ttl
+)
+
+# Kinde key set, created on first use
+registry.register(
+    "jwks_manager",
+    lambda: JWKSManager(
+        f"https://{settings.kinde_domain}/.well-known/jwks.json",
+        algorithm=settings.jwt_algorithm,
+        default_max_age=settings.jwks_default_max_age,
+        min_refetch_interval=settings.jwks_min_refetch_interval
+    ),
+    close=lambda manager: manager.aclose()
+)
+
+
+def get_jwks_manager() -> JWKSManager:
+    """Get the shared Kinde JWKS manager"""
+    return registry.get("jwks_manager")
+
+
+async def close_jwks_manager() -> None:
+    """Stop background JWKS refreshes and close the HTTP client"""
+    await registry.close("jwks_manager")
 
 
 async def get_kinde_public_keys() -> Dict[str, Any]:
     """Fetch Kinde public keys for JWT verification"""
-    global _kinde_public_keys
-    
-    if _kinde_public_keys is not None:
-        return _kinde_public_keys
-    
-    if not kinde_configured:
+    if not is_kinde_configured():
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Kinde authentication not configured"
         )
     
     try:
-        jwks_url = f"https://{settings.kinde_domain}/.well-known/jwks.json"
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(jwks_url)
-            response.raise_for_status()
-            _kinde_public_keys = response.json()
-            
-        logger.info("Successfully fetched Kinde public keys")
-        return _kinde_public_keys
+        return await get_jwks_manager().get_jwks()
         
     except Exception as e:
-        logger.error(f"Failed to fetch Kinde public keys: {e}")
+        logger.error("Failed to fetch Kinde public keys: %s", e)
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Unable to verify authentication token"
         )
 
 
-def get_public_key(token: str) -> str:
+async def get_public_key(token: str) -> Key:
     """Get the appropriate public key for token verification"""
     try:
         # Decode header to get key ID
@@ -63,34 +81,25 @@ def get_public_key(token: str) -> str:
                 detail="Token missing key ID"
             )
         
-        # Get public keys
-        public_keys = _kinde_public_keys
-        if not public_keys:
+        # Unknown key IDs trigger a rate-limited JWKS refetch
+        public_key = await get_jwks_manager().get_key(kid)
+        if public_key is None:
             raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail="Public keys not available"
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="No matching public key found"
             )
         
-        # Find the matching key
-        for key in public_keys.get("keys", []):
-            if key.get("kid") == kid:
-                # Convert JWK to PEM format
-                from jose import jwk
-                return jwk.construct(key).to_pem().decode('utf-8')
-        
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="No matching public key found"
-        )
+        return public_key
         
     except Exception as e:
-        logger.error(f"Error getting public key: {e}")
+        logger.error("Error getting public key: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token format"
         )
 
 
+@timed(AUTH_SECONDS, "verify_kinde_token")
 async def verify_kinde_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dict[str, Any]:
     """
     Verify and decode Kinde JWT token
@@ -104,20 +113,25 @@ async def verify_kinde_token(credentials: HTTPAuthorizationCredentials = Depends
     Raises:
         HTTPException: If token is invalid or authentication fails
     """
-    if not kinde_configured:
+    if not is_kinde_configured():
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Kinde authentication not configured"
         )
     
     token = credentials.credentials
+    cache_key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    
+    cached_payload = _token_cache.get(cache_key)
+    if cached_payload is not None:
+        return cached_payload
     
     try:
         # Get public keys
         await get_kinde_public_keys()
         
         # Get the appropriate public key
-        public_key = get_public_key(token)
+        public_key = await get_public_key(token)
         
         # Verify and decode the token (no audience check like b4f)
         payload = jwt.decode(
@@ -134,23 +148,43 @@ async def verify_kinde_token(credentials: HTTPAuthorizationCredentials = Depends
                 detail="Token missing subject claim"
             )
         
-        logger.info(f"Successfully verified token for user: {payload.get('sub')}")
+        # Cache the verified payload until the token expires
+        expires_at = payload.get("exp")
+        if expires_at:
+            ttl = min(float(expires_at) - time.time(), settings.auth_token_cache_ttl)
+            _token_cache.set(cache_key, payload, ttl)
+        
+        logger.info("Successfully verified token for user: %s", payload.get('sub'))
         return payload
         
     except JWTError as e:
-        logger.error(f"JWT verification failed: {e}")
+        logger.error("JWT verification failed: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication token"
         )
     except Exception as e:
-        logger.error(f"Token verification error: {e}")
+        logger.error("Token verification error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Authentication failed"
         )
 
 
+def get_auth_cache_stats() -> Dict[str, Any]:
+    """
+    Get hit/miss counters for the verified-token cache and JWKS state
+    
+    Returns:
+        Token cache counters and JWKS fetch statistics
+    """
+    jwks_stats = get_jwks_manager().stats() if registry.is_built("jwks_manager") else None
+    return {
+        "token_cache": _token_cache.stats(),
+        "jwks": jwks_stats
+    }
+
+
 async def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
     """
     Get the current user ID from the token
@@ -0,0 +1,140 @@
+"""
+Caching utilities: an in-process TTL/LRU cache and pluggable async backends
+"""
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire after a per-entry TTL"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default if missing or expired"""
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store value under key, evicting the least recently used entry when full"""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        """Remove key from the cache if present"""
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove every entry and reset the counters"""
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and current size"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+        }
+
+
+class CacheBackend(ABC):
+    """Async key/value store used by shared caches"""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        """Return the stored value, or None if missing or expired"""
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        """Store value under key for ttl seconds"""
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Remove key if present"""
+
+    async def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        """Return the stored values of keys, in order; backends may override with one round trip"""
+        return [await self.get(key) for key in keys]
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Per-process backend built on TTLCache"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, key: str) -> Optional[str]:
+        return self.cache.get(key)
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        self.cache.set(key, value, ttl)
+
+    async def delete(self, key: str) -> None:
+        self.cache.delete(key)
+
+
+class RedisCacheBackend(CacheBackend):
+    """Backend shared across workers, for any Redis-compatible client"""
+
+    def __init__(self, client: Any, prefix: str = ""):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, prefix: str = "") -> "RedisCacheBackend":
+        """Create a backend from a redis:// URL (requires the redis package)"""
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError as e:
+            raise RuntimeError("The redis package is required for the Redis cache backend") from e
+        return cls(redis_asyncio.from_url(url, decode_responses=True), prefix)
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self.client.get(self.prefix + key)
+        if isinstance(value, bytes):
+            value = value.decode("utf-8")
+        return value
+
+    async def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        values = await self.client.mget([self.prefix + key for key in keys])
+        return [value.decode("utf-8") if isinstance(value, bytes) else value for value in values]
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        if ttl > 0:
+            await self.client.set(self.prefix + key, value, px=int(ttl * 1000))
+
+    async def delete(self, key: str) -> None:
+        await self.client.delete(self.prefix + key)
@@ -0,0 +1,33 @@
+"""
+Compression for stored payloads: zstd when available, zlib otherwise
+"""
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Every zstd frame starts with this magic number; zlib streams never do
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def compress(data: bytes) -> bytes:
+    """Compress data with zstd if the zstandard package is installed, else zlib"""
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return zlib.compress(data, 6)
+
+
+def decompress(data: bytes) -> bytes:
+    """
+    Decompress data produced by compress, whichever codec wrote it
+
+    Raises:
+        RuntimeError: If the data is zstd-compressed and zstandard is not installed
+    """
+    if data[:4] == _ZSTD_MAGIC:
+        if zstandard is None:
+            raise RuntimeError("The zstandard package is required to read zstd-compressed payloads")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
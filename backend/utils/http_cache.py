@@ -0,0 +1,111 @@
+"""
+Conditional GET helpers: weak ETags, 304 responses and memoized JSON bodies
+"""
+import hashlib
+import time
+from typing import Any, Dict, Hashable, Optional
+
+from fastapi import Request, Response
+
+from utils.serialization import dumps
+
+# Clients may store responses but must revalidate them before reuse
+CACHE_CONTROL = "private, no-cache"
+
+
+def weak_etag(*parts: Any) -> str:
+    """
+    Build a weak ETag from the values a representation is derived from
+
+    Args:
+        parts: Values such as row IDs and updated_at timestamps; bytes are hashed as is
+
+    Returns:
+        ETag header value, e.g. W/"3f2a..."
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else repr(part).encode("utf-8"))
+        digest.update(b"\x00")
+    return f'W/"{digest.hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match header matches etag, using weak comparison"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+
+def not_modified(etag: str, headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Return an empty 304 response
+
+    Args:
+        etag: Current ETag of the resource
+        headers: Other headers the full response would have carried
+    """
+    response = Response(status_code=304, headers=headers)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return response
+
+
+def set_etag(response: Response, etag: str) -> None:
+    """Set the validator headers on a full response"""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+
+class CachedJSON:
+    """A JSON body rendered once, served with its ETag or as a 304"""
+
+    __slots__ = ("body", "etag")
+
+    def __init__(self, content: Any):
+        self.body = dumps(content)
+        self.etag = weak_etag(self.body)
+
+    def response(self, request: Request) -> Response:
+        """Return the body, or a 304 if the client already has it"""
+        if etag_matches(request, self.etag):
+            return not_modified(self.etag)
+        return Response(
+            content=self.body,
+            media_type="application/json",
+            headers={"ETag": self.etag, "Cache-Control": CACHE_CONTROL},
+        )
+
+
+class ResponseMemo:
+    """
+    Memoizes one rendered JSON response per key for up to ttl seconds
+
+    Used for responses that only change with configuration: the key captures
+    that configuration, so a change renders a fresh response immediately.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[Hashable, tuple] = {}
+
+    def get(self, key: Hashable) -> Optional[CachedJSON]:
+        """Return the memoized response for key, if still fresh"""
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        return entry[0]
+
+    def set(self, key: Hashable, content: Any) -> CachedJSON:
+        """Render content and memoize it under key, replacing other keys"""
+        cached = CachedJSON(content)
+        self._entries = {key: (cached, time.monotonic() + self.ttl)}
+        return cached
+
+    def clear(self) -> None:
+        """Forget every memoized response"""
+        self._entries = {}
@@ -0,0 +1,151 @@
+"""
+JWKS fetching and rotation for JWT verification
+"""
+import asyncio
+import logging
+import re
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from jose import jwk
+from jose.backends.base import Key
+
+logger = logging.getLogger(__name__)
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+class JWKSManager:
+    """
+    Keeps a JSON Web Key Set fresh for token verification
+
+    Only one fetch is ever in flight: concurrent callers await the same request.
+    A background task refreshes the set when the Cache-Control max-age runs out,
+    and an unknown key ID triggers an immediate refetch, at most once every
+    min_refetch_interval seconds.
+    """
+
+    def __init__(
+        self,
+        jwks_url: str,
+        algorithm: str = "RS256",
+        default_max_age: float = 3600,
+        min_refetch_interval: float = 30,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.jwks_url = jwks_url
+        self.algorithm = algorithm
+        self.default_max_age = default_max_age
+        self.min_refetch_interval = min_refetch_interval
+        self.jwks: Optional[Dict[str, Any]] = None
+        self.fetch_count = 0
+        self.fetched_at: Optional[float] = None
+        self.expires_at = 0.0
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._keys: Dict[str, Key] = {}
+        self._last_fetch_started = 0.0
+        self._inflight: Optional[asyncio.Task] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        """Whether a key set has been fetched successfully"""
+        return self.jwks is not None
+
+    async def get_jwks(self) -> Dict[str, Any]:
+        """Return the current key set, fetching it on first use"""
+        if self.jwks is None:
+            await self.refresh()
+        return self.jwks
+
+    async def get_key(self, kid: str) -> Optional[Key]:
+        """Return the constructed key for kid, refetching once if it is unknown"""
+        if self.jwks is None:
+            await self.refresh()
+
+        key = self._keys.get(kid)
+        if key is None and time.monotonic() - self._last_fetch_started >= self.min_refetch_interval:
+            logger.info("Unknown key ID %s, refetching JWKS", kid)
+            await self.refresh()
+            key = self._keys.get(kid)
+        return key
+
+    async def refresh(self) -> None:
+        """Fetch the key set, joining the in-flight fetch if there is one"""
+        if self._inflight is None:
+            self._last_fetch_started = time.monotonic()
+            self._inflight = asyncio.get_running_loop().create_task(self._fetch())
+            self._inflight.add_done_callback(self._clear_inflight)
+        await asyncio.shield(self._inflight)
+
+    def _clear_inflight(self, task: asyncio.Task) -> None:
+        self._inflight = None
+
+    async def _fetch(self) -> None:
+        if self._client is None:
+            self._client = httpx.AsyncClient(transport=self._transport, timeout=10.0)
+
+        response = await self._client.get(self.jwks_url)
+        response.raise_for_status()
+        jwks = response.json()
+
+        keys = {}
+        for key_data in jwks.get("keys", []):
+            kid = key_data.get("kid")
+            if kid:
+                keys[kid] = jwk.construct(key_data, key_data.get("alg", self.algorithm))
+
+        # Swap in the new set in one step so readers never see a partial set
+        self.jwks, self._keys = jwks, keys
+        self.fetch_count += 1
+        self.fetched_at = time.time()
+        self.expires_at = time.monotonic() + self._max_age(response.headers.get("cache-control"))
+        logger.info("Fetched JWKS with %s keys", len(keys))
+
+    def _max_age(self, cache_control: Optional[str]) -> float:
+        if cache_control:
+            match = _MAX_AGE_RE.search(cache_control)
+            if match:
+                return max(float(match.group(1)), self.min_refetch_interval)
+        return self.default_max_age
+
+    def start(self) -> None:
+        """Start the background refresh task"""
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.get_running_loop().create_task(self._refresh_loop())
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            delay = self.expires_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                await self.refresh()
+            except Exception as e:
+                # Keep serving the previous key set and try again shortly
+                logger.warning("Background JWKS refresh failed: %s", e)
+                await asyncio.sleep(self.min_refetch_interval)
+
+    async def aclose(self) -> None:
+        """Stop the background task and close the HTTP client"""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return fetch counters and key set freshness"""
+        return {
+            "keys": len(self._keys),
+            "fetch_count": self.fetch_count,
+            "fetched_at": self.fetched_at,
+            "expires_in": max(self.expires_at - time.monotonic(), 0.0) if self.jwks is not None else None,
+        }
@@ -1,12 +1,181 @@
+"""
+Logging pipeline: records are queued on the calling thread and formatted and
+written by a background listener
+
+Formatting the message on the calling thread is what the queue is there to
+avoid, so records whose arguments are plain strings and numbers are queued
+unformatted. Anything the listener could see change, or that keeps objects
+alive while queued, is rendered before queueing instead: arguments of other
+types are merged into the message, and exception tracebacks are rendered to
+text, which also releases their frames. Values passed through `extra` are
+queued as they are and should not be mutated after logging.
+"""
+import copy
+import json
 import logging
+import logging.handlers
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Mapping, Optional
+
+from config import settings
 
 logger = logging.getLogger("YOUR_PROJECT_BE")
-logger.setLevel(logging.DEBUG)
-console_handler = logging.StreamHandler()
 
-# console_handler.setLevel(logging.INFO) # use this in production
-console_handler.setLevel(logging.DEBUG) # use this in dev
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+# Message arguments that cannot change between logging and formatting
+_IMMUTABLE_ARGS = (str, int, float, type(None))
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as one JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps only a fraction of INFO and lower records from selected loggers
+
+    Rates apply to a logger and its children, e.g. {"utils.auth": 0.01} keeps
+    about one in a hundred INFO lines from utils.auth. Warnings and errors are
+    never dropped.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO or not self.rates:
+            return True
+        name = record.name
+        while True:
+            rate = self.rates.get(name)
+            if rate is not None:
+                return random.random() < rate
+            if "." not in name:
+                return True
+            name = name.rsplit(".", 1)[0]
+
+
+def _immutable_args(args: Any) -> bool:
+    values = args.values() if isinstance(args, Mapping) else args
+    return all(isinstance(value, _IMMUTABLE_ARGS) for value in values)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves message formatting to the listener thread where it is safe to"""
+
+    _formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # A copy, so handlers added alongside this one still see the original
+        record = copy.copy(record)
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self._formatter.formatException(record.exc_info)
+            record.exc_info = None
+        if not isinstance(record.msg, str) or (record.args and not _immutable_args(record.args)):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """Parse "logger=rate,logger=rate" into a dict"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, rate = item.partition("=")
+        rates[name.strip()] = float(rate)
+    return rates
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.Handler] = None
+
+# Loggers uvicorn configures with handlers of its own, access log included
+UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+
+def configure_logging(
+    level: Optional[str] = None,
+    log_format: Optional[str] = None,
+    sample_rates: Optional[Dict[str, float]] = None,
+) -> None:
+    """
+    Route every log record through a queue to a background writer thread
+
+    Args:
+        level: Root log level, defaults to settings.log_level
+        log_format: "json" or "text", defaults to settings.log_format
+        sample_rates: Per-logger INFO sampling rates, defaults to settings.log_sample_rates
+    """
+    global _listener, _queue_handler
+
+    stop_logging()
+
+    if (log_format or settings.log_format) == "json":
+        formatter: logging.Formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(name)s - %(message)s")
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(formatter)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = _DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(
+        sample_rates if sample_rates is not None else parse_sample_rates(settings.log_sample_rates)
+    ))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel((level or settings.log_level).upper())
+
+    for name in UVICORN_LOGGERS:
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    _queue_handler = queue_handler
+
+
+def stop_logging() -> None:
+    """Write out queued records and stop the writer thread; later records are written directly"""
+    global _listener, _queue_handler
+
+    if _listener is None:
+        return
 
-console_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-console_handler.setFormatter(console_formatter)
-logger.addHandler(console_handler)
+    root = logging.getLogger()
+    root.removeHandler(_queue_handler)
+    _listener.stop()
+    for handler in _listener.handlers:
+        root.addHandler(handler)
+    _listener = None
+    _queue_handler = None
@@ -0,0 +1,323 @@
+"""
+In-process metrics exposed in the Prometheus text format
+"""
+import functools
+import inspect
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Prometheus client defaults, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Metrics rendered by render_metrics()
+REGISTRY: List["Metric"] = []
+
+
+class _Shards:
+    """
+    One dict per thread, so recording never takes a lock
+
+    Only the owning thread writes to its dict; scrapes read every shard and
+    merge them. Copying a dict is atomic under the GIL, so a scrape sees each
+    shard in a consistent state.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._all: List[Dict] = []
+
+    def local(self) -> Dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            self._all.append(shard)
+        return shard
+
+    def snapshot(self) -> List[Dict]:
+        return [shard.copy() for shard in list(self._all)]
+
+
+class Metric(ABC):
+    """Base class for a named metric with a fixed set of label names"""
+
+    type = ""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        registry: Optional[List["Metric"]] = REGISTRY,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._shards = _Shards()
+        if registry is not None:
+            registry.append(self)
+
+    def _labels(self, labelvalues: Tuple[str, ...]) -> str:
+        if not labelvalues:
+            return ""
+        pairs = ",".join(
+            f'{name}="{_escape(str(value))}"' for name, value in zip(self.labelnames, labelvalues)
+        )
+        return "{" + pairs + "}"
+
+    def render(self) -> List[str]:
+        """Return the metric's lines in the Prometheus text format"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self._samples())
+        return lines
+
+    @abstractmethod
+    def _samples(self) -> List[str]:
+        """Return the metric's sample lines"""
+
+
+class Counter(Metric):
+    """Monotonically increasing count per label set"""
+
+    type = "counter"
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        shard = self._shards.local()
+        shard[labelvalues] = shard.get(labelvalues, 0.0) + amount
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        """Return the merged count per label set"""
+        merged: Dict[Tuple[str, ...], float] = {}
+        for shard in self._shards.snapshot():
+            for labelvalues, value in shard.items():
+                merged[labelvalues] = merged.get(labelvalues, 0.0) + value
+        return merged
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{self._labels(labelvalues)} {value}"
+            for labelvalues, value in sorted(self.values().items())
+        ]
+
+
+class Histogram(Metric):
+    """Distribution of observed values per label set, in cumulative buckets"""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        registry: Optional[List[Metric]] = REGISTRY,
+    ):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        shard = self._shards.local()
+        state = shard.get(labelvalues)
+        if state is None:
+            # Per-bucket counts (last one is +Inf), then sum
+            state = shard[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def _merged(self) -> Dict[Tuple[str, ...], Tuple[List[int], float]]:
+        merged: Dict[Tuple[str, ...], Tuple[List[int], float]] = {}
+        for shard in self._shards.snapshot():
+            for labelvalues, (counts, total) in shard.items():
+                counts = list(counts)
+                if labelvalues in merged:
+                    previous, previous_total = merged[labelvalues]
+                    counts = [a + b for a, b in zip(previous, counts)]
+                    total += previous_total
+                merged[labelvalues] = (counts, total)
+        return merged
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for labelvalues, (counts, total) in sorted(self._merged().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{self._bucket_labels(labelvalues, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(labelvalues)} {total}")
+            lines.append(f"{self.name}_count{self._labels(labelvalues)} {cumulative}")
+        return lines
+
+    def _bucket_labels(self, labelvalues: Tuple[str, ...], le: str) -> str:
+        pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(self.labelnames, labelvalues)]
+        pairs.append(f'le="{le}"')
+        return "{" + ",".join(pairs) + "}"
+
+
+class StatsGauge(Metric):
+    """
+    Numeric values of a stats dict, read when metrics are rendered
+
+    Nested keys are joined with dots into the "stat" label, e.g.
+    stat="token_cache.hits". Strings and None are skipped.
+    """
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        collect: Callable[[], Dict[str, Any]],
+        registry: Optional[List[Metric]] = REGISTRY,
+    ):
+        super().__init__(name, documentation, ("stat",), registry)
+        self.collect = collect
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{self._labels((key,))} {float(value)}"
+            for key, value in _flatten(self.collect())
+        ]
+
+
+def _flatten(stats: Dict[str, Any], prefix: str = "") -> List[Tuple[str, float]]:
+    values = []
+    for key, value in stats.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            values.extend(_flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)):
+            values.append((name, value))
+    return values
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_metrics() -> str:
+    """Return every registered metric in the Prometheus text format"""
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def timed(histogram: Histogram, operation: str) -> Callable:
+    """
+    Decorator recording a function's duration under (operation, outcome)
+
+    outcome is "ok", or "error" if the call raised. Works for sync and async
+    functions and keeps their signature, so it can wrap FastAPI dependencies.
+    """
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                start = time.perf_counter()
+                outcome = "error"
+                try:
+                    result = await func(*args, **kwargs)
+                    outcome = "ok"
+                    return result
+                finally:
+                    histogram.observe(time.perf_counter() - start, operation, outcome)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                result = func(*args, **kwargs)
+                outcome = "ok"
+                return result
+            finally:
+                histogram.observe(time.perf_counter() - start, operation, outcome)
+        return wrapper
+
+    return decorator
+
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route and status code", ("method", "route", "status")
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route")
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "Database statement latency by statement type", ("operation",),
+    buckets=QUERY_BUCKETS
+)
+STRIPE_SECONDS = Histogram(
+    "stripe_service_duration_seconds", "StripeService call latency", ("operation", "outcome")
+)
+AUTH_SECONDS = Histogram(
+    "auth_verify_duration_seconds", "Kinde token verification latency", ("operation", "outcome"),
+    buckets=QUERY_BUCKETS
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and status codes per route template"""
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Dict[str, Any]) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the scope; using its
+            # template keeps path parameters out of the labels
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, method, route_path)
+            HTTP_REQUESTS.inc(method, route_path, str(status_code))
+
+
+_STATEMENT_TYPE = re.compile(r"\s*(\w+)")
+
+
+def _before_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+    context._metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+    start = getattr(context, "_metrics_start", None)
+    if start is None:
+        return
+    match = _STATEMENT_TYPE.match(statement)
+    DB_QUERY_SECONDS.observe(time.perf_counter() - start, match.group(1).upper() if match else "OTHER")
+
+
+def instrument_queries(engine: Engine) -> None:
+    """Time every statement executed through engine"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,68 @@
+"""
+Keyset pagination and streaming helpers
+"""
+import base64
+import json
+from typing import Any, AsyncIterator, Callable, Dict, List
+
+from fastapi import HTTPException, status
+from sqlalchemy import Select
+
+from database import async_session
+from utils.serialization import dumps
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Rows fetched per round trip when streaming
+STREAM_BATCH_SIZE = 500
+
+
+def encode_cursor(*values: Any) -> str:
+    """Encode the sort key of the last returned row into an opaque cursor"""
+    raw = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """
+    Decode a cursor produced by encode_cursor
+
+    Args:
+        cursor: Opaque cursor from a previous page
+        size: Number of values the cursor must contain
+
+    Returns:
+        The sort key values
+
+    Raises:
+        HTTPException: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        values = None
+
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    return values
+
+
+async def stream_ndjson(query: Select, serialize: Callable[[Any], Dict[str, Any]]) -> AsyncIterator[bytes]:
+    """
+    Yield the rows of query as NDJSON lines from a server-side cursor
+
+    The request-scoped session is closed before a streaming body is sent, so
+    the stream owns its own session.
+
+    Args:
+        query: Select returning a single entity or column per row
+        serialize: Converts each row into a dict dumps() can encode
+    """
+    async with async_session() as session:
+        rows = await session.stream_scalars(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+        async for row in rows:
+            yield dumps(serialize(row)) + b"\n"
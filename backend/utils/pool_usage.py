@@ -0,0 +1,149 @@
+"""
+Connection pool instrumentation: pool wait times and connections held per request
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class _TimedCheckoutMixin:
+    """Measures how long checkouts wait for a connection, including connecting"""
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self) -> Any:
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except sa_exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+
+class TimedQueuePool(_TimedCheckoutMixin, QueuePool):
+    """QueuePool recording checkout wait times"""
+
+
+class TimedAsyncAdaptedQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool recording checkout wait times"""
+
+
+def get_pool_stats(engine: Engine) -> Dict[str, Any]:
+    """Return live occupancy of engine's pool, plus wait times for timed pools"""
+    pool = engine.pool
+    stats: Dict[str, Any] = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+        })
+    if isinstance(pool, _TimedCheckoutMixin):
+        stats.update({
+            "checkouts": pool.checkouts,
+            "timeouts": pool.timeouts,
+            "wait_avg_ms": round(pool.wait_total / pool.checkouts * 1000, 3) if pool.checkouts else 0.0,
+            "wait_max_ms": round(pool.wait_max * 1000, 3),
+        })
+    return stats
+
+
+class ConnectionUsage:
+    """Connections currently and at most held by one unit of work"""
+
+    __slots__ = ("held", "peak")
+
+    def __init__(self):
+        self.held = 0
+        self.peak = 0
+
+
+# SQLAlchemy's async greenlets run with the caller's context, so pool events
+# see the usage object of the request or worker task that checked out
+_current_usage: ContextVar[Optional[ConnectionUsage]] = ContextVar("connection_usage", default=None)
+
+# Per scope: number of units of work by the peak connections they held
+_peaks: Dict[str, Dict[int, int]] = {}
+
+
+def _on_checkout(dbapi_connection: Any, connection_record: Any, connection_proxy: Any) -> None:
+    usage = _current_usage.get()
+    connection_record.info["connection_usage"] = usage
+    if usage is not None:
+        usage.held += 1
+        usage.peak = max(usage.peak, usage.held)
+
+
+def _on_checkin(dbapi_connection: Any, connection_record: Any) -> None:
+    # Checkin can run outside the request's context, e.g. on garbage collection
+    usage = connection_record.info.pop("connection_usage", None)
+    if usage is not None:
+        usage.held -= 1
+
+
+def instrument_pool(engine: Engine) -> None:
+    """Count checkouts of engine's pool against the current unit of work"""
+    if not event.contains(engine.pool, "checkout", _on_checkout):
+        event.listen(engine.pool, "checkout", _on_checkout)
+        event.listen(engine.pool, "checkin", _on_checkin)
+
+
+@contextmanager
+def track_connections(scope: str) -> Iterator[ConnectionUsage]:
+    """
+    Record the peak number of pooled connections held inside the block
+
+    Args:
+        scope: Name the peak is recorded under, e.g. "http" or "webhook"
+    """
+    usage = ConnectionUsage()
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+        peaks = _peaks.setdefault(scope, {})
+        peaks[usage.peak] = peaks.get(usage.peak, 0) + 1
+
+
+class PoolUsageMiddleware:
+    """ASGI middleware tracking connections held per HTTP request"""
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with track_connections("http"):
+            await self.app(scope, receive, send)
+
+
+def get_pool_usage_stats() -> Dict[str, Any]:
+    """Return, per scope, how many units of work held 0, 1, 2, ... connections at most"""
+    return {
+        scope: {
+            "count": sum(peaks.values()),
+            "max_held": max(peaks),
+            "by_peak_held": {str(peak): count for peak, count in sorted(peaks.items())},
+        }
+        for scope, peaks in _peaks.items()
+    }
@@ -0,0 +1,84 @@
+"""
+Lazily built, shared application resources
+"""
+import inspect
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ResourceRegistry:
+    """
+    Builds shared resources (engines, API clients) on first use
+
+    Importing a module only registers a factory, so test collection, Alembic
+    runs and forked workers pay for nothing they do not use. Resources are
+    closed in reverse build order by aclose(), called from the app lifespan.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._closers: Dict[str, Optional[Callable[[Any], Any]]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._build_order: List[str] = []
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Callable[[], Any], close: Optional[Callable[[Any], Any]] = None) -> None:
+        """
+        Register how to build and close a resource
+
+        Args:
+            name: Resource name
+            factory: Builds the resource
+            close: Releases the resource; may return an awaitable
+        """
+        self._factories[name] = factory
+        self._closers[name] = close
+
+    def get(self, name: str) -> Any:
+        """Return the resource, building it on first use"""
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        # Sync routes run in a thread pool, so two threads may race here
+        with self._lock:
+            instance = self._instances.get(name)
+            if instance is None:
+                instance = self._factories[name]()
+                self._instances[name] = instance
+                self._build_order.append(name)
+                logger.debug("Built resource %s", name)
+            return instance
+
+    def is_built(self, name: str) -> bool:
+        """Whether the resource has been built"""
+        return name in self._instances
+
+    async def close(self, name: str) -> None:
+        """Close one resource if it was built; the next get() builds it again"""
+        with self._lock:
+            instance = self._instances.pop(name, None)
+            if name in self._build_order:
+                self._build_order.remove(name)
+        if instance is None:
+            return
+
+        close = self._closers.get(name)
+        if close is not None:
+            result = close(instance)
+            if inspect.isawaitable(result):
+                await result
+
+    async def aclose(self) -> None:
+        """Close every built resource, most recently built first"""
+        for name in reversed(list(self._build_order)):
+            try:
+                await self.close(name)
+            except Exception as e:
+                logger.error("Error closing resource %s: %s", name, e)
+
+
+registry = ResourceRegistry()
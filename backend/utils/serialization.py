@@ -0,0 +1,99 @@
+"""
+Fast JSON responses: orjson when available, stdlib json otherwise
+"""
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from operator import attrgetter, itemgetter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from fastapi.responses import JSONResponse
+from sqlalchemy import inspect
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    """
+    Encode UUIDs, datetimes and decimals
+
+    Covers the stdlib fallback, and for orjson the subclasses it does not
+    write natively, such as asyncpg's UUID.
+    """
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (UUID, Decimal)):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode content as compact UTF-8 JSON; UUIDs and datetimes are written natively"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with orjson when it is installed
+
+    Used as the app's default response class. Routes returning trusted ORM
+    output can build it directly from RowSerializer dicts, which skips
+    FastAPI's response_model validation and jsonable_encoder pass.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class RowSerializer:
+    """
+    Converts ORM instances of one model into dicts of their column values
+
+    Column keys are resolved once, on first use, so instances can be created
+    next to the model before mappers are configured. Values are read from the
+    instance's loaded state in one itemgetter call, falling back to attribute
+    access for expired or deferred columns. UUIDs and datetimes are left as
+    is for dumps() to write.
+    """
+
+    def __init__(self, model: type, exclude: Sequence[str] = ()):
+        self.model = model
+        self.exclude = frozenset(exclude)
+        self.keys: Tuple[str, ...] = ()
+        self._from_state: Optional[Callable[[Dict[str, Any]], Tuple[Any, ...]]] = None
+        self._from_attributes: Optional[Callable[[Any], Tuple[Any, ...]]] = None
+
+    def _compile(self) -> None:
+        keys = tuple(
+            attribute.key for attribute in inspect(self.model).column_attrs
+            if attribute.key not in self.exclude
+        )
+        self.keys = keys
+        # itemgetter/attrgetter return a bare value for a single key
+        from_state, from_attributes = itemgetter(*keys), attrgetter(*keys)
+        if len(keys) == 1:
+            self._from_state = lambda state: (from_state(state),)
+            self._from_attributes = lambda row: (from_attributes(row),)
+        else:
+            self._from_state, self._from_attributes = from_state, from_attributes
+
+    def __call__(self, row: Any) -> Dict[str, Any]:
+        if self._from_state is None:
+            self._compile()
+        try:
+            values = self._from_state(row.__dict__)
+        except KeyError:
+            values = self._from_attributes(row)
+        return dict(zip(self.keys, values))
+
+    def many(self, rows: Iterable[Any]) -> List[Dict[str, Any]]:
+        """Serialize every row"""
+        return [self(row) for row in rows]